@@ -7,10 +7,21 @@ from openai.types.responses import ResponseTextDeltaEvent
 import asyncio
 import json
 from typing_extensions import TypedDict, Any
-from agents import set_default_openai_key
+from agents import set_default_openai_api, set_default_openai_client, set_default_openai_key, set_tracing_disabled
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.backend import create_openai_client, get_backend
 
 load_dotenv()
-set_default_openai_key(os.getenv("OPENAI_API_KEY"))
+if get_backend() == "openai":
+    set_default_openai_key(os.getenv("OPENAI_API_KEY"))
+else:
+    # Azure deployments and the mock server speak Chat Completions, and traces would go nowhere
+    set_default_openai_client(create_openai_client(async_client=True))
+    set_default_openai_api("chat_completions")
+    set_tracing_disabled(True)
 
 # # Set the OpenAI API Key
 # os.environ["OPENAI_API_KEY"] =
@@ -1,35 +1,25 @@
 import asyncio
 from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.tools import AgentTool
 from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from agent_tools import PooledAgentTool, format_pool_stats
+from model_clients import create_model_client
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common import batch_runner
+
 load_dotenv()
 
-# Create Azure OpenAI model client - IMPORTANT: Disable parallel tool calls for AgentTool
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-    parallel_tool_calls=False  # CRITICAL: Must disable for AgentTool to work properly
-)
+# Create Azure OpenAI model client. Each expert call runs on its own expert
+# instance (see agent_tools.py), so the coordinator may call several at once.
+az_model_client = create_model_client(parallel_tool_calls=True)
 
-async def agent_as_tool_demo():
-    """
-    Demonstrate the Agent as a Tool pattern where specialized agents 
-    are used as tools by a coordinator agent.
-    """
-    print("=== AGENT AS A TOOL DEMO ===")
-    print("Showing how to use specialized agents as tools in AutoGen\n")
-    
-    # Create specialized expert agents
-    
-    # Math Expert Agent
-    math_expert = AssistantAgent(
+
+def math_expert():
+    return AssistantAgent(
         name="math_expert",
         model_client=az_model_client,
         system_message="""You are a mathematics expert.
@@ -39,9 +29,10 @@ async def agent_as_tool_demo():
         description="A specialized agent for solving mathematical problems and calculations.",
         model_client_stream=True
     )
-    
-    # Chemistry Expert Agent  
-    chemistry_expert = AssistantAgent(
+
+
+def chemistry_expert():
+    return AssistantAgent(
         name="chemistry_expert", 
         model_client=az_model_client,
         system_message="""You are a chemistry expert.
@@ -51,9 +42,10 @@ async def agent_as_tool_demo():
         description="A specialized agent for chemistry questions and chemical analysis.",
         model_client_stream=True
     )
-    
-    # Writing Expert Agent
-    writing_expert = AssistantAgent(
+
+
+def writing_expert():
+    return AssistantAgent(
         name="writing_expert",
         model_client=az_model_client, 
         system_message="""You are a writing and language expert.
@@ -63,26 +55,34 @@ async def agent_as_tool_demo():
         description="A specialized agent for writing, editing, and language assistance.",
         model_client_stream=True
     )
-    
-    # Convert agents to tools using AgentTool
-    math_tool = AgentTool(
-        agent=math_expert,
-        description="Use this tool for mathematical calculations and problem solving",
-        return_value_as_last_message=True  # Return the agent's final response
-    )
-    
-    chemistry_tool = AgentTool(
-        agent=chemistry_expert,
-        description="Use this tool for chemistry questions and chemical analysis", 
-        return_value_as_last_message=True
-    )
-    
-    writing_tool = AgentTool(
-        agent=writing_expert,
-        description="Use this tool for writing help and language assistance",
-        return_value_as_last_message=True
-    )
-    
+
+
+# Convert expert factories to tools (each tool is described by its agent's description).
+# Every tool keeps a pool of warm expert instances shared by all coordinators, so
+# concurrent users (and parallel calls from one coordinator) each lease their own.
+math_tool = PooledAgentTool(
+    math_expert,
+    return_value_as_last_message=True  # Return the agent's final response
+)
+
+chemistry_tool = PooledAgentTool(
+    chemistry_expert,
+    return_value_as_last_message=True
+)
+
+writing_tool = PooledAgentTool(
+    writing_expert,
+    return_value_as_last_message=True
+)
+
+
+def create_coordinator():
+    """Build a coordinator that uses the expert tools.
+
+    The coordinator keeps its conversation in memory, so every independent
+    conversation (for example each line of a batch) gets a fresh one. Experts
+    are leased from the shared pools and reset after every call.
+    """
     # Create coordinator agent that uses specialist agents as tools
     coordinator = AssistantAgent(
         name="coordinator",
@@ -94,22 +94,36 @@ async def agent_as_tool_demo():
         - writing_expert: For writing and language assistance
         
         When you receive a question:
-        1. Determine which expert would be most appropriate
-        2. Use the corresponding tool to get expert assistance
-        3. Relay the expert's response to the user
+        1. Determine which experts would be most appropriate
+        2. Use the corresponding tools to get expert assistance; when a question
+           needs several experts, call all of them at once
+        3. Combine the experts' responses into one answer for the user
         
         Use the expert tools when the question requires specialized knowledge.""",
         tools=[math_tool, chemistry_tool, writing_tool],
         model_client_stream=True,
         max_tool_iterations=3  # Allow multiple tool calls if needed
     )
+    return coordinator
+
+
+async def agent_as_tool_demo():
+    """
+    Demonstrate the Agent as a Tool pattern where specialized agents 
+    are used as tools by a coordinator agent.
+    """
+    print("=== AGENT AS A TOOL DEMO ===")
+    print("Showing how to use specialized agents as tools in AutoGen\n")
     
+    coordinator = create_coordinator()
+
     # Test different types of questions
     test_questions = [
         "What is the integral of x^2 from 0 to 3?",
         "What is the molecular formula for caffeine and explain its structure?", 
         "Can you help me improve this sentence: 'The dog was walked by me'?",
-        "If I have a triangle with sides 3, 4, and 5, what is its area?"
+        "If I have a triangle with sides 3, 4, and 5, what is its area?",
+        "What is the molar mass of caffeine, and how many moles are in a 200 mg tablet?"
     ]
     
     print("Testing different questions that require specialized expertise:\n")
@@ -145,16 +159,38 @@ async def main():
     finally:
         # Close the model client
         await az_model_client.close()
+
+    print_pool_stats()
     
     print("\n" + "=" * 60)
     print("AGENT AS A TOOL PATTERN BENEFITS:")
     print("✓ Modular Design: Specialized agents for specific domains")
     print("✓ Reusable Experts: Same agents can be used across workflows") 
     print("✓ Dynamic Routing: Coordinator intelligently selects appropriate expert")
+    print("✓ Parallel Fan-out: Several experts answer one question at the same time")
     print("✓ Tool Integration: Agents become callable tools with schemas")
     print("✓ Scalable Architecture: Easy to add new expert agents")
     print("✓ Maintainable Code: Clear separation of concerns")
     print("\nAgent as a Tool enables powerful multi-agent orchestration!")
 
+def print_pool_stats():
+    for tool in (math_tool, chemistry_tool, writing_tool):
+        print(f"{tool.name} pool: {format_pool_stats(tool.pool)}")
+
+
+async def run_conversation(record):
+    """Batch target: answer each question in ``record["turns"]`` with a fresh coordinator."""
+    coordinator = create_coordinator()
+    replies = []
+    for question in record["turns"]:
+        result = await coordinator.run(task=question)
+        replies.append(result.messages[-1].to_text())
+    return {"replies": replies}
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if sys.argv[1:2] == ["--batch"]:
+        # python agent_as_tool_demo.py --batch questions.jsonl results.jsonl --concurrency 16
+        batch_runner.main(run_conversation, description="Run agent-as-tool conversations from JSONL.", argv=sys.argv[2:])
+    else:
+        asyncio.run(main())
\ No newline at end of file
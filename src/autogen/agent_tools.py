@@ -0,0 +1,298 @@
+"""
+``AgentTool`` variants that are safe to call concurrently.
+
+AutoGen's ``AgentTool`` runs every call on the one agent it wraps. Two calls
+in flight at once (``parallel_tool_calls=True``, or two users sharing a
+coordinator) interleave their messages in that agent's model context, so it
+has to be used with parallel tool calls disabled, and a question needing two
+experts pays for them one after the other.
+
+``IsolatedAgentTool`` takes a factory instead of an agent:
+
+    math_tool = IsolatedAgentTool(lambda: AssistantAgent("math_expert", model_client=client, ...))
+
+Every call runs on a fresh agent from the factory, loaded with the expert's
+memory as it was when the call started, so concurrent calls never see each
+other's messages. When a call finishes, what it added to the context is merged
+back into the expert's memory. Merges happen in the order the calls were made,
+not the order they finished, so the memory comes out the same on every run.
+The coordinator can fan a question out to several experts in one step and wait
+for the slowest one rather than all of them in turn. AutoGen returns the tool
+results in call order.
+
+Agents whose state has no ``llm_context`` (anything but ``AssistantAgent``-like
+agents) keep the state of the last call made instead of a merge.
+
+``PooledAgentTool`` is for experts that need no memory between calls, shared
+by many coordinators (one per user) under load. It leases a warm instance
+from an ``AgentPool`` for each call and resets it when the call returns:
+
+    math_tool = PooledAgentTool(math_expert, min_size=2)
+
+The pool starts with ``min_size`` instances and builds another whenever a
+call would otherwise wait. Pass ``max_size`` to cap it; past that, calls queue
+for the next free instance. Instances idle for ``idle_timeout`` seconds are retired while
+no call is waiting, down to ``min_size``. ``pool.stats()`` reports the size
+and the time calls spent waiting; each call's wait is also recorded on the
+current span as ``agent_pool.wait_ms``.
+
+A pool only saves the cost of building an instance. A plain
+``AssistantAgent`` takes tens of microseconds to build, so a fresh agent per
+call is just as fast; pool experts whose factory does real work (loading
+tools, indexes or clients).
+"""
+import asyncio
+import contextlib
+import copy
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Callable, Mapping, Optional
+
+from autogen_agentchat.agents import BaseChatAgent
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+from autogen_agentchat.tools import AgentTool
+from autogen_core import CancellationToken
+from opentelemetry import trace
+from pydantic import BaseModel
+
+
+def _context_messages(state: Optional[Mapping[str, Any]]) -> Optional[list]:
+    if state is None:
+        return []
+    context = state.get("llm_context")
+    return context.get("messages") if isinstance(context, Mapping) else None
+
+
+def merge_state(state: Optional[Mapping[str, Any]], base: Optional[Mapping[str, Any]], new: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Fold ``new`` (a call's final state, started from ``base``) into ``state``: the messages it added go at the end."""
+    if state is None:
+        return new
+    current, started, finished = _context_messages(state), _context_messages(base), _context_messages(new)
+    if current is None or started is None or finished is None:
+        return new
+    merged = copy.deepcopy(state)
+    merged["llm_context"]["messages"] = current + finished[len(started):]
+    return merged
+
+
+class IsolatedAgentTool(AgentTool):
+    """An ``AgentTool`` that runs each call on its own copy of the agent ``factory`` builds.
+
+    ``factory`` must return an identically configured agent every time (name,
+    description, model client, tools); it is called once here for the tool's
+    name and description, then once per call.
+    """
+
+    def __init__(self, factory: Callable[[], BaseChatAgent], return_value_as_last_message: bool = False) -> None:
+        prototype = factory()
+        self._factory = factory
+        self._state: Optional[Mapping[str, Any]] = None  # the expert's memory; None until a call finishes
+        self._issued = 0
+        self._merged = 0
+        self._finished: dict = {}  # call number -> (base state, final state) or None if the call failed
+        super().__init__(prototype, return_value_as_last_message=return_value_as_last_message)
+
+    def _checkout(self):
+        number, base = self._issued, self._state
+        self._issued += 1
+        return number, base
+
+    async def _clone(self, base):
+        agent = self._factory()
+        if base is not None:
+            await agent.load_state(base)
+        return agent
+
+    def _finish(self, number, outcome):
+        self._finished[number] = outcome
+        # merge every finished call up to the first one still running
+        while self._merged in self._finished:
+            outcome = self._finished.pop(self._merged)
+            if outcome is not None:
+                self._state = merge_state(self._state, *outcome)
+            self._merged += 1
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> TaskResult:
+        number, base = self._checkout()
+        try:
+            agent = await self._clone(base)
+            result = await agent.run(task=args.task, cancellation_token=cancellation_token)
+            final = await agent.save_state()
+        except BaseException:
+            self._finish(number, None)
+            raise
+        self._finish(number, (base, final))
+        return result
+
+    async def run_stream(
+        self, args: BaseModel, cancellation_token: CancellationToken
+    ) -> AsyncGenerator[BaseAgentEvent | BaseChatMessage | TaskResult, None]:
+        number, base = self._checkout()
+        try:
+            agent = await self._clone(base)
+            async for event in agent.run_stream(task=args.task, cancellation_token=cancellation_token):
+                yield event
+            final = await agent.save_state()
+        except BaseException:
+            self._finish(number, None)
+            raise
+        self._finish(number, (base, final))
+
+    async def save_state_json(self) -> Mapping[str, Any]:
+        return copy.deepcopy(self._state) if self._state is not None else await self._task_runner.save_state()
+
+    async def load_state_json(self, state: Mapping[str, Any]) -> None:
+        self._state = copy.deepcopy(state)
+
+
+class AgentPool:
+    """Warm, identically configured instances of one agent, leased one per call."""
+
+    def __init__(
+        self, factory: Callable[[], BaseChatAgent], min_size: int = 1, max_size: Optional[int] = None, idle_timeout: float = 30.0
+    ) -> None:
+        if min_size < 0 or (max_size is not None and max_size < max(min_size, 1)):
+            raise ValueError(f"AgentPool needs 0 <= min_size <= max_size and max_size >= 1, got {min_size}, {max_size}")
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: deque = deque()  # (agent, released at); the most recently used on the right
+        self._waiters: deque = deque()  # futures of calls waiting for an instance
+        self._size = 0
+        self._waits: deque = deque(maxlen=4096)  # recent waits in seconds
+        self.counters = {"leases": 0, "waited": 0, "created": 0, "retired": 0, "peak_size": 0, "peak_waiting": 0}
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+
+    def _create(self) -> BaseChatAgent:
+        self._size += 1
+        self.counters["created"] += 1
+        self.counters["peak_size"] = max(self.counters["peak_size"], self._size)
+        return self.factory()
+
+    def _retire_idle(self) -> None:
+        # the least recently used instances are on the left
+        cutoff = time.monotonic() - self.idle_timeout
+        while not self._waiters and self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            self._idle.popleft()
+            self._size -= 1
+            self.counters["retired"] += 1
+
+    async def acquire(self) -> BaseChatAgent:
+        arrival = time.monotonic()
+        self._retire_idle()
+        if self._idle:
+            agent = self._idle.pop()[0]  # the warmest one
+        elif self.max_size is None or self._size < self.max_size:
+            agent = self._create()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.counters["peak_waiting"] = max(self.counters["peak_waiting"], len(self._waiters))
+            try:
+                agent = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._return(waiter.result())  # handed over just as the call was cancelled
+                else:
+                    with contextlib.suppress(ValueError):  # _return may have dropped it already
+                        self._waiters.remove(waiter)
+                raise
+            self.counters["waited"] += 1
+        waited = time.monotonic() - arrival
+        self._waits.append(waited)
+        self.counters["leases"] += 1
+        trace.get_current_span().set_attribute("agent_pool.wait_ms", waited * 1000)
+        return agent
+
+    def _return(self, agent: BaseChatAgent) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(agent)
+                return
+        self._idle.append((agent, time.monotonic()))
+        self._retire_idle()
+
+    async def release(self, agent: BaseChatAgent) -> None:
+        """Reset ``agent`` and hand it to the next waiting call, or keep it idle."""
+        try:
+            await agent.on_reset(CancellationToken())
+        except Exception:
+            # an instance that cannot be reset is dropped; a waiting call gets a new one
+            self._size -= 1
+            self.counters["retired"] += 1
+            if self._waiters:
+                self._return(self._create())
+            return
+        self._return(agent)
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        agent = await self.acquire()
+        try:
+            yield agent
+        finally:
+            await self.release(agent)
+
+    def stats(self) -> dict:
+        """Current size, idle and waiting counts, counters, and wait percentiles (ms) of recent leases."""
+        waits = sorted(self._waits)
+        percentile = lambda q: waits[min(len(waits) - 1, int(len(waits) * q))] * 1000 if waits else 0.0
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "waiting": len(self._waiters),
+            **self.counters,
+            "wait_p50_ms": percentile(0.5),
+            "wait_p99_ms": percentile(0.99),
+            "wait_max_ms": waits[-1] * 1000 if waits else 0.0,
+        }
+
+
+def format_pool_stats(pool: AgentPool) -> str:
+    """A one-line summary of a pool's ``stats()``, for demos and benchmarks."""
+    stats = pool.stats()
+    return (
+        f"size={stats['size']} (peak {stats['peak_size']}) leases={stats['leases']} waited={stats['waited']} "
+        f"wait p50={stats['wait_p50_ms']:.1f}ms p99={stats['wait_p99_ms']:.1f}ms max={stats['wait_max_ms']:.1f}ms "
+        f"created={stats['created']} retired={stats['retired']}"
+    )
+
+
+class PooledAgentTool(AgentTool):
+    """An ``AgentTool`` that runs each call on an instance leased from an ``AgentPool`` of ``factory``'s agents.
+
+    Instances are reset after every call, so the expert keeps no memory
+    between calls; use ``IsolatedAgentTool`` for one that should.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], BaseChatAgent],
+        min_size: int = 1,
+        max_size: Optional[int] = None,
+        idle_timeout: float = 30.0,
+        return_value_as_last_message: bool = False,
+    ) -> None:
+        self.pool = AgentPool(factory, min_size, max_size, idle_timeout)
+        super().__init__(factory(), return_value_as_last_message=return_value_as_last_message)
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> TaskResult:
+        async with self.pool.lease() as agent:
+            return await agent.run(task=args.task, cancellation_token=cancellation_token)
+
+    async def run_stream(
+        self, args: BaseModel, cancellation_token: CancellationToken
+    ) -> AsyncGenerator[BaseAgentEvent | BaseChatMessage | TaskResult, None]:
+        async with self.pool.lease() as agent:
+            async for event in agent.run_stream(task=args.task, cancellation_token=cancellation_token):
+                yield event
+
+    async def save_state_json(self) -> Mapping[str, Any]:
+        return {}  # instances are reset after every call
+
+    async def load_state_json(self, state: Mapping[str, Any]) -> None:
+        pass
@@ -1,27 +1,34 @@
 from typing import Callable, Sequence, AsyncGenerator, List
-import asyncio, os
+import asyncio, math, os, sys
 from dotenv import load_dotenv
-from autogen_agentchat.agents import BaseChatAgent
 from autogen_agentchat.base import Response
 from autogen_agentchat.conditions import MaxMessageTermination
 from autogen_agentchat.messages import AgentEvent, ChatMessage, TextMessage
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core import CancellationToken
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from bounded_state import BoundedStateAgent, KeepLast
+from fast_selector import RuleBasedSelector, last_message
+from model_clients import create_model_client
+from operator_planner import operators_of, plan, plan_selector
 
 load_dotenv()
-model_client = OpenAIChatCompletionClient(
-    model="gpt-4o",
-    api_key=os.getenv("OPENAI_API_KEY")
+model_client = create_model_client("openai", model="gpt-4o")
+
+TARGET = 25
+START = 10
+SELECTOR_PROMPT = (
+    "Available roles:\n{roles}\nTheir job descriptions:\n{participants}\n"
+    "Current conversation history:\n{history}\n"
+    "Please select the most appropriate role for the next message, and only return the role name."
 )
 
 
-class ArithmeticAgent(BaseChatAgent):
+class ArithmeticAgent(BoundedStateAgent):
     def __init__(self, name: str, description: str, operator_func: Callable[[int], int]) -> None:
-        super().__init__(name, description=description)
+        # Only the latest message matters, so keep just that instead of the whole broadcast history.
+        super().__init__(name, description, KeepLast(1))
         self._operator_func = operator_func
-        self._message_history: List[ChatMessage] = []
 
     @property
     def produced_message_types(self) -> Sequence[type[ChatMessage]]:
@@ -30,55 +37,129 @@ class ArithmeticAgent(BaseChatAgent):
     async def on_messages(self, messages: Sequence[ChatMessage], cancellation_token: CancellationToken) -> Response:
         # Update the message history.
         # NOTE: it is possible the messages is an empty list, which means the agent was selected previously.
-        self._message_history.extend(messages)
+        self._message_state.update(messages)
         # Parse the number in the last message.
-        assert isinstance(self._message_history[-1], TextMessage)
-        number = int(self._message_history[-1].content)
+        latest = self._message_state.last
+        assert isinstance(latest, TextMessage)
+        number = int(latest.content)
         # Apply the operator function to the number.
         result = self._operator_func(number)
         # Create a new message with the result.
         response_message = TextMessage(content=str(result), source=self.name)
         # Update the message history.
-        self._message_history.append(response_message)
+        self._message_state.update([response_message])
         # Return the response.
         return Response(chat_message=response_message)
 
-    async def on_reset(self, cancellation_token: CancellationToken) -> None:
-        pass
+    def apply(self, number: int) -> int:
+        """The agent's operator, exposed to the planner in operator_planner.py."""
+        return self._operator_func(number)
+
+
+def make_number_agents() -> List[ArithmeticAgent]:
+    return [
+        ArithmeticAgent("add_agent", "Adds 1 to the number.", lambda x: x + 1),
+        ArithmeticAgent("multiply_agent", "Multiplies the number by 2.", lambda x: x * 2),
+        ArithmeticAgent("subtract_agent", "Subtracts 1 from the number.", lambda x: x - 1),
+        ArithmeticAgent("divide_agent", "Divides the number by 2 and rounds down.", lambda x: x // 2),
+        ArithmeticAgent("identity_agent", "Returns the number as is.", lambda x: x),
+    ]
+
+
+def steps_lower_bound(target: int) -> Callable[[int], int]:
+    """Admissible A* heuristic for the operators above.
+
+    Below the target, one step at most doubles a positive number. Above it, one
+    step at most halves ``number + 1``. Either way, at least
+    ``ceil(log2(ratio))`` steps remain.
+    """
+
+    def heuristic(number: int) -> int:
+        if 0 < number < target:
+            return math.ceil(math.log2(target / number))
+        if number > target >= 0:
+            return math.ceil(math.log2((number + 1) / (target + 1)))
+        return 0
+
+    return heuristic
+
+
+def make_selector_rules(agents: List[ArithmeticAgent], target: int = TARGET):
+    """Rules that settle the selector's choice without the model where the arithmetic is obvious."""
 
+    def current_number(thread):
+        message = last_message(thread)
+        try:
+            return int(message.content) if isinstance(message, TextMessage) else None
+        except ValueError:
+            return None
 
-async def run_number_agents() -> None:
+    def one_step_to_target(thread):
+        # an agent that lands exactly on the target (identity first, so the number stays there)
+        number = current_number(thread)
+        if number is None:
+            return None
+        for agent in sorted(agents, key=lambda a: a.name != "identity_agent"):
+            if agent.apply(number) == target:
+                return agent.name
+        return None
+
+    def toward_target(thread):
+        # only the operators moving in the right direction; the model picks among them
+        number = current_number(thread)
+        if number is None or number == target:
+            return None
+        return ["add_agent", "multiply_agent"] if number < target else ["subtract_agent", "divide_agent"]
+
+    return [one_step_to_target, toward_target]
+
+
+async def run_number_agents(plan_first: bool = False) -> None:
     # Create agents for number operations.
-    add_agent = ArithmeticAgent("add_agent", "Adds 1 to the number.", lambda x: x + 1)
-    multiply_agent = ArithmeticAgent("multiply_agent", "Multiplies the number by 2.", lambda x: x * 2)
-    subtract_agent = ArithmeticAgent("subtract_agent", "Subtracts 1 from the number.", lambda x: x - 1)
-    divide_agent = ArithmeticAgent("divide_agent", "Divides the number by 2 and rounds down.", lambda x: x // 2)
-    identity_agent = ArithmeticAgent("identity_agent", "Returns the number as is.", lambda x: x)
+    agents = make_number_agents()
+    task: List[ChatMessage] = [
+        TextMessage(content=f"Apply the operations to turn the given number into {TARGET}.", source="user"),
+        TextMessage(content=str(START), source="user"),
+    ]
+
+    if plan_first:
+        # The agents are deterministic, so search for the shortest agent sequence
+        # locally and have the team follow it without any selector model calls.
+        steps = plan(operators_of(agents), START, TARGET, heuristic=steps_lower_bound(TARGET))
+        print(f"Plan ({len(steps)} steps): {' -> '.join(steps)}")
+        selector_group_chat = SelectorGroupChat(
+            agents,
+            model_client=model_client,
+            termination_condition=MaxMessageTermination(len(task) + len(steps)),
+            allow_repeated_speaker=True,
+            selector_func=plan_selector(steps),
+        )
+        await Console(selector_group_chat.run_stream(task=task))
+        return
 
-    # The termination condition is to stop after 10 messages.
+    # The termination condition is to stop after 50 messages.
     termination_condition = MaxMessageTermination(50)
 
+    # Try deterministic rules before asking the model to pick the next agent.
+    selector = RuleBasedSelector(agents, make_selector_rules(agents), allow_repeated_speaker=True)
+
     # Create a selector group chat.
     selector_group_chat = SelectorGroupChat(
-        [add_agent, multiply_agent, subtract_agent, divide_agent, identity_agent],
+        agents,
         model_client=model_client,
         termination_condition=termination_condition,
         allow_repeated_speaker=True,  # Allow the same agent to speak multiple times, necessary for this task.
-        selector_prompt=(
-            "Available roles:\n{roles}\nTheir job descriptions:\n{participants}\n"
-            "Current conversation history:\n{history}\n"
-            "Please select the most appropriate role for the next message, and only return the role name."
-        ),
+        selector_func=selector.select,
+        candidate_func=selector.candidates,
+        selector_prompt=SELECTOR_PROMPT,
     )
 
     # Run the selector group chat with a given task and stream the response.
-    task: List[ChatMessage] = [
-        TextMessage(content="Apply the operations to turn the given number into 25.", source="user"),
-        TextMessage(content="10", source="user"),
-    ]
     stream = selector_group_chat.run_stream(task=task)
     await Console(stream)
+    print(selector.format_stats())
 
 
-# Use asyncio.run(run_number_agents()) when running in a script.
-asyncio.run(run_number_agents())
+# Pass --plan to compute the agent order with operator_planner.py instead of the selector model.
+if __name__ == "__main__":
+    asyncio.run(run_number_agents(plan_first="--plan" in sys.argv[1:]))
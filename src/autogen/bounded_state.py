@@ -0,0 +1,107 @@
+"""
+Memory-bounded conversation state for custom ``BaseChatAgent``s.
+
+In a group chat every agent is handed every message broadcast since it last
+spoke. A custom agent that appends them all to a list grows by one message
+per team turn, and it does so forever, for every agent in the team. Most
+deterministic agents only need a window or a running summary:
+
+    KeepLast(1)                           # only the latest message
+    KeepLast(10, TextMessage)             # the last ten text messages
+    Reduce(lambda total, m: total + 1, 0) # any fold over the messages, O(1) per message
+
+``BoundedStateAgent`` owns one of these. It clears it in ``on_reset`` and
+carries it through ``save_state``/``load_state``:
+
+    class MyAgent(BoundedStateAgent):
+        def __init__(self, name):
+            super().__init__(name, "Does something with the last message.", KeepLast(1))
+
+        async def on_messages(self, messages, cancellation_token):
+            self._message_state.update(messages)
+            last = self._message_state.last
+            ...
+"""
+from collections import deque
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence, Tuple, Type
+
+from autogen_agentchat.agents import BaseChatAgent
+from autogen_agentchat.messages import BaseChatMessage, MessageFactory
+from autogen_core import CancellationToken
+
+
+class KeepLast:
+    """The last ``k`` messages (optionally only of ``message_types``)."""
+
+    def __init__(self, k: int, message_types: Optional[Tuple[Type[BaseChatMessage], ...]] = None) -> None:
+        if k < 1:
+            raise ValueError(f"KeepLast needs k >= 1, got {k}")
+        self.k = k
+        self.message_types = message_types
+        self._messages = deque(maxlen=k)
+
+    def update(self, messages: Iterable[BaseChatMessage]) -> None:
+        for message in messages:
+            if self.message_types is None or isinstance(message, self.message_types):
+                self._messages.append(message)
+
+    @property
+    def messages(self) -> Sequence[BaseChatMessage]:
+        return list(self._messages)
+
+    @property
+    def last(self) -> Optional[BaseChatMessage]:
+        return self._messages[-1] if self._messages else None
+
+    def reset(self) -> None:
+        self._messages.clear()
+
+    def dump(self) -> Mapping[str, Any]:
+        return {"messages": [message.dump() for message in self._messages]}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        factory = MessageFactory()
+        self.reset()
+        self.update(factory.create(message) for message in state.get("messages", []))
+
+
+class Reduce:
+    """A running ``value = reducer(value, message)`` over every message seen.
+
+    The value must be JSON-serializable for ``save_state``.
+    """
+
+    def __init__(self, reducer: Callable[[Any, BaseChatMessage], Any], initial: Any = None) -> None:
+        self.reducer = reducer
+        self.initial = initial
+        self.value = initial
+
+    def update(self, messages: Iterable[BaseChatMessage]) -> None:
+        for message in messages:
+            self.value = self.reducer(self.value, message)
+
+    def reset(self) -> None:
+        self.value = self.initial
+
+    def dump(self) -> Mapping[str, Any]:
+        return {"value": self.value}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.value = state.get("value", self.initial)
+
+
+class BoundedStateAgent(BaseChatAgent):
+    """A ``BaseChatAgent`` whose conversation memory is a ``KeepLast`` or ``Reduce``."""
+
+    def __init__(self, name: str, description: str, message_state) -> None:
+        super().__init__(name, description=description)
+        self._message_state = message_state
+
+    async def on_reset(self, cancellation_token: CancellationToken) -> None:
+        self._message_state.reset()
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {"type": "BoundedAgentState", "version": "1.0.0", "message_state": self._message_state.dump()}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self._message_state.load(state.get("message_state", {}))
@@ -0,0 +1,166 @@
+"""
+Deterministic fast path for ``SelectorGroupChat`` speaker selection.
+
+Every turn of a ``SelectorGroupChat`` normally costs one model call to pick the
+next speaker. ``RuleBasedSelector`` tries ordered rules first and only leaves
+the choice to the model when they don't settle it:
+
+    selector = RuleBasedSelector(
+        [user_proxy, assistant],
+        [
+            after("assistant", "user_proxy"),               # transition on the last speaker
+            when(r"\\d+", "assistant", source="user_proxy"),  # regex on the last message
+            mentions(["refund", "broken"], "support"),       # keywords, case-insensitive
+            my_candidate_func,                               # any thread -> name | [names] | None
+        ],
+    )
+    team = SelectorGroupChat(..., selector_func=selector.select, candidate_func=selector.candidates)
+    ...
+    print(selector.format_stats())
+
+A rule gets the thread and returns a speaker name, a list of candidate names or
+None (no opinion). The first rule with an opinion wins. A single name is used
+without calling the model. A list narrows the model's choice to those
+candidates. If no rule matches, the model chooses among all participants,
+honouring ``allow_repeated_speaker`` (which ``SelectorGroupChat`` itself ignores
+once a ``candidate_func`` is set).
+"""
+import re
+from collections import Counter
+from typing import Callable, List, Optional, Sequence, Union
+
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+
+Thread = Sequence[Union[BaseAgentEvent, BaseChatMessage]]
+Rule = Callable[[Thread], Union[str, Sequence[str], None]]
+
+
+def last_message(thread: Thread) -> Optional[BaseChatMessage]:
+    """The last chat message in the thread, skipping tool call and other events."""
+    for message in reversed(thread):
+        if isinstance(message, BaseChatMessage):
+            return message
+    return None
+
+
+def after(speaker: str, next_speaker: Union[str, Sequence[str]]) -> Rule:
+    """Rule: once ``speaker`` has spoken, ``next_speaker`` (or one of several) goes next."""
+
+    def rule(thread: Thread):
+        message = last_message(thread)
+        return next_speaker if message is not None and message.source == speaker else None
+
+    rule.__name__ = f"after({speaker})"
+    return rule
+
+
+def when(pattern: str, next_speaker: Union[str, Sequence[str]], source: Optional[str] = None, flags: int = 0) -> Rule:
+    """Rule: pick ``next_speaker`` if the last message (from ``source``, if given) matches ``pattern``."""
+    regex = re.compile(pattern, flags)
+
+    def rule(thread: Thread):
+        message = last_message(thread)
+        if message is None or (source is not None and message.source != source):
+            return None
+        return next_speaker if regex.search(message.to_text()) else None
+
+    rule.__name__ = f"when({pattern})"
+    return rule
+
+
+def mentions(keywords: Sequence[str], next_speaker: Union[str, Sequence[str]], source: Optional[str] = None) -> Rule:
+    """Rule: pick ``next_speaker`` if the last message contains any of ``keywords`` as whole words."""
+    rule = when(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b", next_speaker, source, re.IGNORECASE)
+    rule.__name__ = f"mentions({', '.join(keywords)})"
+    return rule
+
+
+class RuleBasedSelector:
+    """``selector_func`` and ``candidate_func`` for ``SelectorGroupChat`` driven by ordered rules.
+
+    ``participants`` are the team's agents (or their names). Statistics
+    accumulate across runs until ``reset_stats()``.
+    """
+
+    def __init__(self, participants, rules: Sequence[Rule], allow_repeated_speaker: bool = False) -> None:
+        self.participants = [p if isinstance(p, str) else p.name for p in participants]
+        self.rules = list(rules)
+        self.allow_repeated_speaker = allow_repeated_speaker
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.turns = 0
+        self.resolved = 0  # turns settled by a rule
+        self.saved = 0  # resolved turns on which SelectorGroupChat would have called the model
+        self.narrowed = 0  # turns a rule narrowed to several candidates for the model
+        self.fallbacks = 0  # turns no rule matched
+        self.by_rule = Counter()
+
+    def _previous_speaker(self, thread: Thread) -> Optional[str]:
+        for message in reversed(thread):
+            if isinstance(message, BaseChatMessage) and message.source in self.participants:
+                return message.source
+        return None
+
+    def _default_candidates(self, thread: Thread) -> List[str]:
+        previous = self._previous_speaker(thread)
+        if self.allow_repeated_speaker or previous is None:
+            return list(self.participants)
+        return [name for name in self.participants if name != previous]
+
+    def _apply_rules(self, thread: Thread):
+        """Return ``(rule, candidates)`` for the first rule with an opinion, or ``(None, None)``."""
+        for rule in self.rules:
+            choice = rule(thread)
+            if choice is None:
+                continue
+            candidates = [choice] if isinstance(choice, str) else list(choice)
+            unknown = [name for name in candidates if name not in self.participants]
+            if not candidates or unknown:
+                raise ValueError(
+                    f"Selector rule {getattr(rule, '__name__', rule)!r} returned {choice!r}; "
+                    f"expected names from {self.participants}."
+                )
+            return rule, candidates
+        return None, None
+
+    def select(self, thread: Thread) -> Optional[str]:
+        """``selector_func``: the speaker if a rule settles it, else None to let the model choose."""
+        self.turns += 1
+        rule, candidates = self._apply_rules(thread)
+        if rule is None:
+            self.fallbacks += 1
+            return None
+        self.by_rule[getattr(rule, "__name__", repr(rule))] += 1
+        if len(candidates) > 1:
+            self.narrowed += 1
+            return None
+        self.resolved += 1
+        # with one candidate left (two agents, no repeats) SelectorGroupChat skips the model anyway
+        if len(self._default_candidates(thread)) > 1:
+            self.saved += 1
+        return candidates[0]
+
+    def candidates(self, thread: Thread) -> List[str]:
+        """``candidate_func``: who the model may choose from when ``select`` returned None."""
+        _, candidates = self._apply_rules(thread)
+        return candidates or self._default_candidates(thread)
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "resolved": self.resolved,
+            "saved": self.saved,
+            "narrowed": self.narrowed,
+            "fallbacks": self.fallbacks,
+            "by_rule": dict(self.by_rule),
+        }
+
+    def format_stats(self) -> str:
+        lines = [
+            f"Speaker selection: {self.resolved}/{self.turns} turns settled by rules, "
+            f"{self.saved} selector model calls saved, {self.narrowed} narrowed, {self.fallbacks} left to the model"
+        ]
+        for name, count in self.by_rule.most_common():
+            lines.append(f"  {name:<40} {count:>5}")
+        return "\n".join(lines)
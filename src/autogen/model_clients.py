@@ -0,0 +1,64 @@
+"""
+One place to build the AutoGen model client every demo uses.
+
+``MODEL_BACKEND`` (openai | azure | mock, see ``common/backend.py``) overrides
+the backend a demo was written for, so any demo can run against the local mock
+server:
+
+    MODEL_BACKEND=mock python src/autogen/swarm_agents_demo.py
+
+All clients share the pooled HTTP transport from ``common/http_pool.py``, and
+``COMPLETION_CACHE`` applies here too (see ``common/completion_cache.py``).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from autogen_core.models import ModelFamily, ModelInfo
+from autogen_ext.models.openai import AzureOpenAIChatCompletionClient, OpenAIChatCompletionClient
+
+from common.backend import get_backend, mock_server_url
+from common.http_pool import shared_http_client
+from common.rate_limiter import PRIORITY_HEADER, priority_of
+
+# the mock server accepts any model name, so describe it as a capable chat model
+MOCK_MODEL_INFO = ModelInfo(
+    vision=False,
+    function_calling=True,
+    json_output=True,
+    family=ModelFamily.UNKNOWN,
+    structured_output=True,
+)
+
+
+def create_model_client(default_backend="azure", model=None, model_env="MODEL", priority=None, **kwargs):
+    """Return a ``ChatCompletionClient`` for ``MODEL_BACKEND`` (or ``default_backend``).
+
+    The model name is ``model`` if given, else the ``model_env`` environment
+    variable, else gpt-4o. ``priority`` ("selector", "background"...) is the
+    class its calls get from the rate limiter in ``common/rate_limiter.py``. It
+    is also recorded on their trace spans and usage ledger entries.
+    Extra keyword arguments (``parallel_tool_calls``, ``temperature``...) go to
+    the client constructor.
+    """
+    backend = get_backend(default_backend)
+    model = model or os.getenv(model_env) or "gpt-4o"
+    if priority is not None:
+        priority_of(priority)  # fail here rather than on the first request
+        kwargs["default_headers"] = {**kwargs.get("default_headers", {}), PRIORITY_HEADER: priority}
+    if "http_client" not in kwargs:
+        kwargs["http_client"] = shared_http_client(async_client=True)
+    if backend == "azure":
+        return AzureOpenAIChatCompletionClient(
+            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
+            model=model,
+            api_version=os.getenv("API_VERSION"),
+            azure_endpoint=os.getenv("ENDPOINT"),
+            api_key=os.getenv("API_KEY"),
+            **kwargs,
+        )
+    if backend == "mock":
+        kwargs.setdefault("model_info", MOCK_MODEL_INFO)
+        return OpenAIChatCompletionClient(model=model, api_key="mock", base_url=mock_server_url(), **kwargs)
+    return OpenAIChatCompletionClient(model=model, api_key=os.getenv("OPENAI_API_KEY"), **kwargs)
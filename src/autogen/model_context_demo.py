@@ -1,24 +1,18 @@
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 from autogen_core.tools import FunctionTool
 from autogen_core.model_context import (
     BufferedChatCompletionContext,
-    TokenLimitedChatCompletionContext,
     UnboundedChatCompletionContext
 )
+from model_contexts import IncrementalTokenLimitedChatCompletionContext, SummarizingChatCompletionContext
 import asyncio, os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client()
 
 # Simple tools for demonstration
 async def get_current_time() -> str:
@@ -113,18 +107,56 @@ async def demonstrate_buffered_context():
         context_messages = await buffered_agent.model_context.get_messages()
         print(f"Messages in context: {len(context_messages)}")
 
+async def demonstrate_summarizing_context():
+    """Demonstrate SummarizingChatCompletionContext (recent messages plus a rolling summary)."""
+    print("\n\n=== SUMMARIZING CONTEXT DEMO ===")
+    print("This agent keeps the last 3 messages and summarizes older ones in the background\n")
+
+    # Same window as the buffered agent, but evicted messages go into a summary
+    summarizing_context = SummarizingChatCompletionContext(az_model_client, buffer_size=3, segment_size=2)
+    summarizing_agent = AssistantAgent(
+        name="summarizing_assistant",
+        model_client=az_model_client,
+        tools=[time_tool, math_tool, fact_tool],
+        system_message="You are a helpful assistant.",
+        model_context=summarizing_context,
+        reflect_on_tool_use=True,
+    )
+
+    # Have the same conversation
+    tasks = [
+        "What's the current time?",
+        "Add 25 and 17 together",
+        "Tell me a random fact",
+        "What was the first thing I asked you?",  # Answered from the summary
+        "What numbers did I ask you to add?",    # Answered from the summary
+    ]
+
+    for i, task in enumerate(tasks, 1):
+        print(f"\n--- Turn {i}: {task} ---")
+        result = await summarizing_agent.run(task=task)
+        print(f"Response: {result.messages[-1].content}")
+
+        # The summary is written between turns; the agent never waits for it
+        context_messages = await summarizing_agent.model_context.get_messages()
+        print(f"Messages in context: {len(context_messages)} (summaries so far: {summarizing_context.summaries})")
+
+    await summarizing_context.wait_for_summary()
+    print(f"\nRolling summary:\n{summarizing_context.summary}")
+
 async def demonstrate_token_limited_context():
-    """Demonstrate TokenLimitedChatCompletionContext (limited by token count)."""
+    """Demonstrate a token-limited context (limited by token count)."""
     print("\n\n=== TOKEN LIMITED CONTEXT DEMO ===")
     print("This agent is limited by token count (500 tokens)\n")
     
-    # Token-limited context
+    # Token-limited context; unlike the built-in TokenLimitedChatCompletionContext,
+    # it counts each message once instead of recounting the history on every call
     token_limited_agent = AssistantAgent(
         name="token_limited_assistant", 
         model_client=az_model_client,
         tools=[time_tool, math_tool, fact_tool],
         system_message="You are a helpful assistant that provides detailed explanations.",
-        model_context=TokenLimitedChatCompletionContext(max_tokens=500),  # 500 token limit
+        model_context=IncrementalTokenLimitedChatCompletionContext(az_model_client, token_limit=500),  # 500 token limit
         reflect_on_tool_use=True,
     )
     
@@ -154,14 +186,16 @@ async def main():
     # Run all demonstrations
     # await demonstrate_unbounded_context()
     await demonstrate_buffered_context() 
+    await demonstrate_summarizing_context()
     # await demonstrate_token_limited_context()
     
     print("\n" + "=" * 50)
     print("SUMMARY:")
     print("1. UnboundedChatCompletionContext: Remembers entire conversation history")
     print("2. BufferedChatCompletionContext: Limits memory to last N messages")  
-    print("3. TokenLimitedChatCompletionContext: Limits memory by token count")
-    print("4. Choose the right context strategy based on your use case!")
+    print("3. SummarizingChatCompletionContext: Last N messages plus a background summary of the rest")
+    print("4. IncrementalTokenLimitedChatCompletionContext: Limits memory by token count")
+    print("5. Choose the right context strategy based on your use case!")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
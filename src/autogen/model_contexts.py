@@ -0,0 +1,383 @@
+"""
+Model contexts (``ChatCompletionContext``) for long-running AutoGen agents.
+
+``IncrementalTokenLimitedChatCompletionContext`` is a drop-in for
+``TokenLimitedChatCompletionContext``. The built-in one recounts the tokens of
+the whole history every time an agent fetches its messages. It then drops
+messages from the middle one at a time, recounting after each drop, so a fetch
+costs O(n) token counts per dropped message. This one counts each message once
+when it is added and keeps a running total. It evicts the oldest messages as
+soon as the limit is exceeded (amortized O(1) per message), so ``get_messages()``
+only copies the current window:
+
+    model_context=IncrementalTokenLimitedChatCompletionContext(model_client, token_limit=500)
+
+``SummarizingChatCompletionContext`` keeps the last ``buffer_size`` messages
+verbatim, like ``BufferedChatCompletionContext``. Instead of forgetting older
+messages, it folds them into a rolling summary. The summary comes from a model
+call that runs as a background task, so no user turn waits for it. Until the
+summary lands, the messages being summarized stay in the prompt verbatim:
+
+    model_context=SummarizingChatCompletionContext(model_client, buffer_size=3)
+
+``PersistentChatCompletionContext`` stores the messages on disk in a
+``common/conversation_log.py`` session, addressed by ID. An agent rebuilt after
+a restart carries on where it left off, and only the window sent to the model
+(the last ``buffer_size`` messages and/or ``token_limit`` tokens) is read back
+into memory:
+
+    model_context=PersistentChatCompletionContext(".conversations", "customer-42", buffer_size=20)
+"""
+import asyncio
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, List, Mapping, Optional
+
+from pydantic import TypeAdapter
+
+from autogen_core.model_context import (
+    ChatCompletionContext,
+    ChatCompletionContextState,
+    TokenLimitedChatCompletionContext,
+)
+from autogen_core.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+from autogen_core.tools import ToolSchema
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.conversation_log import ConversationLog, CumulativeTokens, open_log
+from common.rate_limiter import BACKGROUND, request_priority
+
+
+class IncrementalTokenLimitedChatCompletionContext(TokenLimitedChatCompletionContext):
+    """The most recent messages that fit in ``token_limit`` tokens, counted once per message.
+
+    Counts come from ``model_client.count_tokens``, so they match the built-in
+    context. Prompt overhead and ``tool_schema`` tokens are counted once. With
+    ``token_limit=None`` the limit is the model's context window, taken from
+    ``model_client.remaining_tokens``. Evicted messages are gone for good (also
+    from ``save_state``). Use ``UnboundedChatCompletionContext`` to keep all of them.
+    """
+
+    component_provider_override = None
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        *,
+        token_limit: int | None = None,
+        tool_schema: List[ToolSchema] | None = None,
+        initial_messages: List[LLMMessage] | None = None,
+    ) -> None:
+        super().__init__(model_client, token_limit=token_limit, tool_schema=tool_schema)
+        self._initial_messages = initial_messages
+        self._messages = deque()  # (message, tokens), oldest first
+        self._total_tokens = 0
+        self._overhead = None  # tokens of an empty prompt with the tool schema
+        self._limit = None
+        for message in initial_messages or []:
+            self._append(message)
+
+    def _ensure_limits(self) -> None:
+        if self._overhead is not None:
+            return
+        self._overhead = self._model_client.count_tokens([], tools=self._tool_schema)
+        if self._token_limit is not None:
+            self._limit = self._token_limit
+        else:
+            self._limit = self._overhead + self._model_client.remaining_tokens([], tools=self._tool_schema)
+
+    def _append(self, message: LLMMessage) -> None:
+        self._ensure_limits()
+        tokens = self._model_client.count_tokens([message]) - self._model_client.count_tokens([])
+        self._messages.append((message, tokens))
+        self._total_tokens += tokens
+        while self._messages and self._overhead + self._total_tokens > self._limit:
+            self._total_tokens -= self._messages.popleft()[1]
+        # a tool result whose call was evicted is meaningless to the model
+        while self._messages and isinstance(self._messages[0][0], FunctionExecutionResultMessage):
+            self._total_tokens -= self._messages.popleft()[1]
+
+    @property
+    def token_count(self) -> int:
+        """Tokens of the current window, as ``count_tokens(await get_messages(), tools=...)`` would report."""
+        self._ensure_limits()
+        return self._overhead + self._total_tokens
+
+    async def add_message(self, message: LLMMessage) -> None:
+        self._append(message)
+
+    async def get_messages(self) -> List[LLMMessage]:
+        return [message for message, _ in self._messages]
+
+    async def clear(self) -> None:
+        self._messages.clear()
+        self._total_tokens = 0
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return ChatCompletionContextState(messages=await self.get_messages()).model_dump()
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await self.clear()
+        for message in ChatCompletionContextState.model_validate(state).messages:
+            self._append(message)
+
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new messages into the existing summary. Keep every question the user asked, "
+    "facts, numbers, names, decisions and tool results that later turns may refer to. "
+    "Reply with the updated summary only."
+)
+
+
+def transcript(messages: List[LLMMessage]) -> str:
+    """Render LLM messages (including tool calls and results) as plain text for the summarizer."""
+    lines = []
+    for message in messages:
+        if isinstance(message, FunctionExecutionResultMessage):
+            lines.extend(f"tool {result.name} returned: {result.content}" for result in message.content)
+        elif isinstance(message, AssistantMessage) and isinstance(message.content, list):
+            calls = ", ".join(f"{call.name}({call.arguments})" for call in message.content)
+            lines.append(f"{message.source} called tools: {calls}")
+        elif isinstance(message, SystemMessage):
+            lines.append(f"system: {message.content}")
+        else:
+            lines.append(f"{message.source}: {message.content}")
+    return "\n".join(lines)
+
+
+class SummarizingChatCompletionContext(ChatCompletionContext):
+    """Recent messages verbatim, with everything older folded into a summary in the background.
+
+    Once ``segment_size`` messages have fallen out of the last ``buffer_size``,
+    a task asks ``model_client`` to merge them into the summary. ``get_messages``
+    never waits for it. It returns ``[SystemMessage(summary)]`` plus every
+    message the summary doesn't cover yet. A failed summarization leaves the
+    messages verbatim and is retried with the next message. After
+    ``max_failures`` failures in a row the segment is dropped unsummarized, so
+    the context stays bounded while the summarizer is down; ``dropped``
+    counts those messages and ``last_error`` holds the latest failure. ``await
+    context.wait_for_summary()`` waits for the summarizer, e.g. before
+    ``save_state`` or in tests.
+    """
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        buffer_size: int = 6,
+        segment_size: int = 4,
+        summary_prompt: str = SUMMARY_PROMPT,
+        initial_messages: List[LLMMessage] | None = None,
+        max_failures: int = 3,
+    ) -> None:
+        super().__init__(initial_messages)
+        if buffer_size <= 0 or segment_size <= 0 or max_failures <= 0:
+            raise ValueError("buffer_size, segment_size and max_failures must be greater than 0.")
+        self._model_client = model_client
+        self._buffer_size = buffer_size
+        self._segment_size = segment_size
+        self._summary_prompt = summary_prompt
+        self._max_failures = max_failures
+        self._failures_in_row = 0
+        self._summary: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._generation = 0  # bumped by clear()/load_state() so stale summaries are dropped
+        self.summaries = 0
+        self.failures = 0
+        self.dropped = 0  # messages given up on after max_failures failed summaries in a row
+        self.last_error: Optional[BaseException] = None
+        self.summary_seconds = 0.0
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self._summary
+
+    def _segment_end(self) -> int:
+        """How many leading messages are ready to be summarized (0 if not enough yet)."""
+        end = len(self._messages) - self._buffer_size
+        # never separate a tool call from its results
+        while 0 < end < len(self._messages) and isinstance(self._messages[end], FunctionExecutionResultMessage):
+            end += 1
+        return end if end >= self._segment_size else 0
+
+    def _maybe_summarize(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        end = self._segment_end()
+        if end:
+            self._task = asyncio.get_running_loop().create_task(self._summarize(end, self._generation))
+
+    async def _summarize(self, end: int, generation: int) -> None:
+        segment = self._messages[:end]
+        previous = self._summary or "(empty)"
+        start = time.perf_counter()
+        try:
+            # nobody is waiting on a summary, so it yields to every other model call
+            with request_priority(BACKGROUND):
+                result = await self._model_client.create(
+                    [
+                        SystemMessage(content=self._summary_prompt),
+                        UserMessage(
+                            content=f"Current summary:\n{previous}\n\nNew messages:\n{transcript(segment)}",
+                            source="summarizer",
+                        ),
+                    ]
+                )
+        except Exception as e:
+            self.failures += 1
+            self.last_error = e
+            self._task = None
+            if generation != self._generation:
+                return
+            self._failures_in_row += 1
+            if self._failures_in_row >= self._max_failures:
+                # the summary goes without them rather than the context growing without bound
+                del self._messages[:end]
+                self.dropped += end
+                self._failures_in_row = 0
+            return
+        self._task = None
+        if generation != self._generation or not isinstance(result.content, str):
+            return
+        self._summary = result.content
+        del self._messages[:end]
+        self._failures_in_row = 0
+        self.summaries += 1
+        self.summary_seconds += time.perf_counter() - start
+        self._maybe_summarize()  # more may have piled up while the model was busy
+
+    async def add_message(self, message: LLMMessage) -> None:
+        self._messages.append(message)
+        self._maybe_summarize()
+
+    async def get_messages(self) -> List[LLMMessage]:
+        messages = list(self._messages)
+        if messages and isinstance(messages[0], FunctionExecutionResultMessage):
+            messages = messages[1:]
+        if self._summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{self._summary}"))
+        return messages
+
+    async def wait_for_summary(self) -> None:
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def clear(self) -> None:
+        self._generation += 1
+        self._failures_in_row = 0
+        self._messages = []
+        self._summary = None
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {**ChatCompletionContextState(messages=self._messages).model_dump(), "summary": self._summary}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self._generation += 1
+        self._failures_in_row = 0
+        self._messages = ChatCompletionContextState.model_validate(state).messages
+        self._summary = state.get("summary")
+
+
+MESSAGE_TYPES = ("UserMessage", "AssistantMessage", "SystemMessage", "FunctionExecutionResultMessage")
+MESSAGE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+FUNCTION_RESULT = MESSAGE_CODES["FunctionExecutionResultMessage"]
+
+
+class PersistentChatCompletionContext(ChatCompletionContext):
+    """Messages kept in a ``ConversationLog`` session instead of process memory.
+
+    ``log`` is a ``ConversationLog`` or its root directory. ``get_messages``
+    returns the last ``buffer_size`` messages, trimmed further to
+    ``token_limit`` tokens by ``token_counter`` (~4 characters per token by
+    default), or the whole session if neither is set. ``clear()`` (which
+    ``AssistantAgent.on_reset`` calls) hides the messages so far from the
+    model but keeps them on disk; ``delete()`` removes the session. State
+    only records the session ID and where the last clear left the view,
+    since the messages are already on disk.
+    """
+
+    def __init__(
+        self,
+        log,
+        session_id: str,
+        buffer_size: Optional[int] = None,
+        token_limit: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        initial_messages: List[LLMMessage] | None = None,
+    ) -> None:
+        super().__init__()
+        self._log = log if isinstance(log, ConversationLog) else open_log(log)
+        self._session_id = session_id
+        self._session = self._log.session(session_id)
+        self._start = 0  # messages before this were cleared from the view
+        self._buffer_size = buffer_size
+        self._token_limit = token_limit
+        self._token_counter = token_counter or (lambda text: len(text) // 4 + 1)
+        self._adapter = TypeAdapter(LLMMessage)
+        self._initial_messages = initial_messages
+        if initial_messages and not len(self._session):
+            for message in initial_messages:
+                self._append(message)
+
+    @property
+    def session_id(self) -> str:
+        return self._session_id
+
+    def __len__(self) -> int:
+        return len(self._session) - self._start
+
+    def _append(self, message: LLMMessage) -> None:
+        encoded = message.model_dump_json()
+        self._session.append(encoded.encode(), MESSAGE_CODES.get(message.type, 0), self._token_counter(encoded))
+
+    def _window_start(self) -> int:
+        count = len(self._session)
+        start = self._start if self._buffer_size is None else max(self._start, count - self._buffer_size)
+        if self._token_limit is not None:
+            floor = self._session.cumulative_tokens(count - 1) - self._token_limit if count else 0
+            start = max(start, bisect_left(CumulativeTokens(self._session), floor, self._start, count))
+        # a tool result whose call falls outside the window is meaningless to the model
+        while start < count and self._session.role(start) == FUNCTION_RESULT:
+            start += 1
+        return start
+
+    async def add_message(self, message: LLMMessage) -> None:
+        self._append(message)
+
+    async def get_messages(self) -> List[LLMMessage]:
+        records = self._session.read_range(self._window_start(), len(self._session))
+        return [self._adapter.validate_json(record) for record in records]
+
+    async def clear(self) -> None:
+        """Start the model's view afresh; the messages so far stay in the session."""
+        self._start = len(self._session)
+
+    async def delete(self) -> None:
+        """Remove the session and every message in it."""
+        self._log.delete(self._session_id)
+        self._session = self._log.session(self._session_id)
+        self._start = 0
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {"type": "PersistentChatCompletionContextState", "session_id": self._session_id, "start": self._start}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        if "session_id" in state:
+            self._session_id = state["session_id"]
+            self._session = self._log.session(self._session_id)
+            self._start = min(state.get("start", 0), len(self._session))
+        else:  # state saved by an in-memory context: import its messages
+            await self.clear()
+            for message in ChatCompletionContextState.model_validate(state).messages:
+                self._append(message)
@@ -0,0 +1,127 @@
+"""
+Plan the speaker order of a team of deterministic agents instead of asking a model.
+
+When every agent in a team is a pure function of the current state (like the
+``ArithmeticAgent``s in ``arithmetic_agent.py``), choosing who speaks next is a
+shortest-path problem. An agent takes part by exposing ``apply(state) -> state``.
+``plan`` searches the state space locally, breadth-first or with A* when given
+an admissible heuristic. ``plan_selector`` then makes a ``SelectorGroupChat``
+follow the plan without a single selector model call:
+
+    steps = plan(operators_of(agents), start=10, goal=25)
+    team = SelectorGroupChat(
+        agents,
+        model_client=model_client,
+        selector_func=plan_selector(steps),
+        termination_condition=MaxMessageTermination(len(task) + len(steps)),
+    )
+"""
+import heapq
+import itertools
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Union
+
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+
+Operator = Callable[[Any], Any]
+
+
+class NoPlanFound(ValueError):
+    """The goal is unreachable from the start state within the search budget."""
+
+
+def operators_of(agents) -> Dict[str, Operator]:
+    """``{agent name: agent.apply}`` for every agent that exposes ``apply``."""
+    return {agent.name: agent.apply for agent in agents if callable(getattr(agent, "apply", None))}
+
+
+def _goal_test(goal) -> Callable[[Any], bool]:
+    return goal if callable(goal) else (lambda state: state == goal)
+
+
+def _successors(operators: Mapping[str, Operator], state):
+    for name, apply in operators.items():
+        try:
+            following = apply(state)
+        except (ArithmeticError, ValueError):
+            continue
+        if following != state:  # no-ops (an identity agent) never shorten a path
+            yield name, following
+
+
+def _path(parents, state) -> List[str]:
+    steps = []
+    while parents[state] is not None:
+        state, name = parents[state]
+        steps.append(name)
+    return steps[::-1]
+
+
+def plan(
+    operators: Mapping[str, Operator],
+    start: Hashable,
+    goal: Union[Hashable, Callable[[Any], bool]],
+    heuristic: Optional[Callable[[Any], float]] = None,
+    max_states: int = 100_000,
+) -> List[str]:
+    """Return the shortest sequence of operator (agent) names turning ``start`` into ``goal``.
+
+    ``goal`` is a state or a predicate. Without a ``heuristic`` the search is
+    breadth-first. With one it is A*, which stays optimal as long as the
+    heuristic never overestimates the remaining steps. Raises ``NoPlanFound``
+    once ``max_states`` states have been visited without reaching the goal.
+    """
+    is_goal = _goal_test(goal)
+    parents = {start: None}
+    if is_goal(start):
+        return []
+
+    if heuristic is None:
+        frontier = deque([start])
+        while frontier:
+            state = frontier.popleft()
+            for name, following in _successors(operators, state):
+                if following in parents:
+                    continue
+                parents[following] = (state, name)
+                if is_goal(following):
+                    return _path(parents, following)
+                if len(parents) >= max_states:
+                    raise NoPlanFound(f"No plan from {start!r} within {max_states} states")
+                frontier.append(following)
+        raise NoPlanFound(f"Goal is unreachable from {start!r}")
+
+    tie = itertools.count()  # states need not be comparable
+    cost = {start: 0}
+    frontier = [(heuristic(start), next(tie), start)]
+    while frontier:
+        _, _, state = heapq.heappop(frontier)
+        if is_goal(state):
+            return _path(parents, state)
+        for name, following in _successors(operators, state):
+            g = cost[state] + 1
+            if g >= cost.get(following, float("inf")):
+                continue
+            cost[following] = g
+            parents[following] = (state, name)
+            if len(parents) >= max_states:
+                raise NoPlanFound(f"No plan from {start!r} within {max_states} states")
+            heapq.heappush(frontier, (g + heuristic(following), next(tie), following))
+    raise NoPlanFound(f"Goal is unreachable from {start!r}")
+
+
+def plan_selector(steps: Sequence[str]):
+    """A ``selector_func`` that picks the planned speakers in order.
+
+    The position in the plan is the number of messages the planned agents have
+    already produced in the thread, so the selector holds no state of its own.
+    Once the plan is done it returns None. Stop the team with a termination
+    condition before that happens.
+    """
+    names = set(steps)
+
+    def select(thread: Sequence[Union[BaseAgentEvent, BaseChatMessage]]) -> Optional[str]:
+        done = sum(1 for message in thread if isinstance(message, BaseChatMessage) and message.source in names)
+        return steps[done] if done < len(steps) else None
+
+    return select
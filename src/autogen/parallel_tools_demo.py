@@ -1,11 +1,17 @@
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 from autogen_core.tools import FunctionTool
-import asyncio, os, time
+import asyncio, os, sys, time
 from dotenv import load_dotenv
+from opentelemetry import trace
 from pydantic import BaseModel
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.tool_cache import cached_function_tool, format_cache_stats
+from common.tracing import get_collector
+
 class TravelResponse(BaseModel):
     weather_info: str
     flight_info: str
@@ -13,14 +19,9 @@ class TravelResponse(BaseModel):
     summary: str
 
 load_dotenv()
+tracer = trace.get_tracer(__name__)  # see common/tracing.py
 
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client()
 
 # Multiple tools that can be called in parallel
 async def get_weather(city: str) -> str:
@@ -54,9 +55,10 @@ async def get_restaurant_recommendations(city: str) -> str:
     return f"Best restaurants in {city}: Italian bistro (4.8★), Local steakhouse (4.6★), Farm-to-table cafe (4.7★)"
 
 # Create strict function tools for parallel execution
-weather_tool = FunctionTool(get_weather, description="Get weather information for a city", strict=True)
+# weather and hotel lookups repeat across trips and travellers, so their results are cached
+weather_tool = cached_function_tool(get_weather, description="Get weather information for a city", ttl=600, strict=True)
 flight_tool = FunctionTool(get_flight_info, description="Get flight information between cities", strict=True)
-hotel_tool = FunctionTool(get_hotel_info, description="Get hotel information for a city", strict=True)
+hotel_tool = cached_function_tool(get_hotel_info, description="Get hotel information for a city", ttl=3600, strict=True)
 attractions_tool = FunctionTool(get_local_attractions, description="Get local attractions for a city", strict=True)
 restaurant_tool = FunctionTool(get_restaurant_recommendations, description="Get restaurant recommendations for a city", strict=True)
 
@@ -86,12 +88,13 @@ async def demonstrate_parallel_tools():
     print(f"Task: {task}\n")
     print("Starting travel planning (this will call multiple tools in parallel)...\n")
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # The agent will automatically determine which tools to call and can execute them in parallel
-    response = await travel_agent.run(task=task)
+    with tracer.start_as_current_span("travel_agent.run"):
+        response = await travel_agent.run(task=task)
     
-    end_time = time.time()
+    end_time = time.perf_counter()
     
     print("=== RESPONSE ===")
     print(response)
@@ -121,7 +124,8 @@ async def demonstrate_streaming_with_parallel_tools():
         model_client_stream=True,
     )
     
-    await Console(travel_agent_streaming.run_stream(task=task))
+    with tracer.start_as_current_span("travel_agent_streaming.run"):
+        await Console(travel_agent_streaming.run_stream(task=task))
 
 async def main():
     """Main function to run both demonstrations."""
@@ -132,5 +136,14 @@ async def main():
     # Run streaming parallel tools demo
     await demonstrate_streaming_with_parallel_tools()
 
+    print("\nTool cache:")
+    print(format_cache_stats())
+
+    collector = get_collector()
+    if collector is not None:  # TRACE=memory: where the time went
+        print("\nTrace of the last run:")
+        print(collector.format_tree())
+        print(collector.format_summary())
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -5,23 +5,22 @@ from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermi
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core.tools import FunctionTool
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 import os
+import sys
 from dotenv import load_dotenv
 from typing import List
 import random
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.tool_cache import cached_function_tool
+
 load_dotenv()
 
 # Create Azure OpenAI model client - Using o3-mini for reasoning model capabilities
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL_REASONING"),  # Should be o3-mini or similar reasoning model
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client(model_env="MODEL_REASONING")  # Should be o3-mini or similar reasoning model
 
 # Mock tools for demonstration purposes
 async def search_tool(query: str) -> str:
@@ -103,7 +102,7 @@ async def data_analysis_tool(data_points: str) -> str:
         return f"Error: Could not analyze data '{data_points}'. {str(e)}"
 
 # Create function tools
-search_function_tool = FunctionTool(search_tool, description="Search for information on various topics")
+search_function_tool = cached_function_tool(search_tool, description="Search for information on various topics", ttl=300)
 calculate_function_tool = FunctionTool(calculate_tool, description="Perform mathematical calculations")
 analysis_function_tool = FunctionTool(data_analysis_tool, description="Analyze numerical data")
 
@@ -5,20 +5,14 @@ from autogen_agentchat.conditions import ExternalTermination, TextMentionTermina
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core import CancellationToken
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Create Azure OpenAI model client
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client()
 
 async def basic_round_robin_example():
     """Demonstrate basic Round Robin Group Chat with reflection pattern."""
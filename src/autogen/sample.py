@@ -6,13 +6,13 @@ from autogen_agentchat.base import Handoff
 from autogen_agentchat.conditions import HandoffTermination, TextMentionTermination
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from model_clients import create_model_client
+from usage_budget import BudgetTermination
+
+from common.usage_ledger import get_ledger, ledger_enabled, usage_scope
 
 load_dotenv()
-model_client = OpenAIChatCompletionClient(
-    model="gpt-4o",
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+model_client = create_model_client("openai", model="gpt-4o")
 
 # Create a lazy assistant agent that always hands off to the user.
 lazy_agent = AssistantAgent(
@@ -27,9 +27,17 @@ handoff_termination = HandoffTermination(target="user")
 # Define a termination condition that checks for a specific text mention.
 text_termination = TextMentionTermination("TERMINATE")
 
-# Create a single-agent team with the lazy assistant and both termination conditions.
-lazy_agent_team = RoundRobinGroupChat([lazy_agent], termination_condition=handoff_termination | text_termination)
+# Stop early if the conversation runs over its budget (USAGE_HARD_USD etc., see common/usage_ledger.py).
+budget_termination = BudgetTermination()
+
+# Create a single-agent team with the lazy assistant and all three termination conditions.
+lazy_agent_team = RoundRobinGroupChat(
+    [lazy_agent], termination_condition=handoff_termination | text_termination | budget_termination
+)
 
-# Run the team and stream to the console.
+# Run the team and stream to the console, charging its model calls to one conversation.
 task = "What is the weather in New York?"
-asyncio.run(Console(lazy_agent_team.run_stream(task=task), output_stats=True))
\ No newline at end of file
+with usage_scope(conversation="weather"):
+    asyncio.run(Console(lazy_agent_team.run_stream(task=task), output_stats=True))
+if ledger_enabled():
+    print(get_ledger().format_report("agent", "model"))
\ No newline at end of file
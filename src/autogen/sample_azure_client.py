@@ -1,6 +1,6 @@
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 from autogen_core.tools import FunctionTool
 import asyncio, os
 from dotenv import load_dotenv
@@ -15,13 +15,7 @@ class WeatherResponse(BaseModel):
 load_dotenv()
 print("API Key:", os.getenv("API_KEY"))  # For debugging, remove this in production
 
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client()
 
 async def get_weather(city: str) -> str:
     """Get the weather for a given city."""
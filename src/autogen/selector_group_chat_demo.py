@@ -5,7 +5,8 @@ from autogen_agentchat.conditions import TextMentionTermination
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core.tools import FunctionTool
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from fast_selector import RuleBasedSelector, after, when
+from model_clients import create_model_client
 import os
 from dotenv import load_dotenv
 from typing import List
@@ -13,13 +14,10 @@ from typing import List
 load_dotenv()
 
 # Create Azure OpenAI model client
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
-)
+az_model_client = create_model_client()
+# Picking the next speaker is a short call that gates the whole turn; with
+# RATE_LIMIT=on it is scheduled ahead of the agents' own model calls
+selector_model_client = create_model_client(priority="selector")
 
 # Function for counting down
 async def countdown(start_number: int) -> str:
@@ -91,12 +89,25 @@ Selection Guidelines:
 
 Always select the most appropriate agent based on the current conversation context and what action is needed next."""
 
+    # The guidelines above are mostly deterministic, so encode them as rules
+    # and only ask the model when the user says something without a number
+    selector = RuleBasedSelector(
+        [user_proxy, assistant_agent],
+        [
+            after("user", "user_proxy"),
+            after("assistant", "user_proxy"),
+            when(r"\d+", "assistant", source="user_proxy"),
+        ],
+    )
+
     # Create selector team with custom prompt
     team = SelectorGroupChat(
         [user_proxy, assistant_agent],
-        model_client=az_model_client, 
+        model_client=selector_model_client,
         termination_condition=termination,
-        selector_prompt=selector_prompt
+        selector_prompt=selector_prompt,
+        selector_func=selector.select,
+        candidate_func=selector.candidates,
     )
 
     # Stream the conversation
@@ -105,6 +116,7 @@ Always select the most appropriate agent based on the current conversation conte
             task="Let's do some countdowns! Give me a number between 1-15 to count down from."
         )
     )
+    print(selector.format_stats())
     
     return team
 
@@ -123,13 +135,15 @@ async def main():
         import traceback
         traceback.print_exc()
     finally:
-        # Close the model client
+        # Close the model clients
         await az_model_client.close()
+        await selector_model_client.close()
     
     print("\n" + "=" * 60)
     print("SUMMARY:")
     print("✓ Streaming SelectorGroupChat: Real-time agent selection and countdown")
     print("✓ Custom Selector Prompt: Intelligent agent selection guidance")
+    print("✓ RuleBasedSelector: Deterministic turns skip the selector model call")
     print("✓ UserProxyAgent: Provides input numbers for countdown")
     print("✓ AssistantAgent: Uses countdown function tool for counting")
     print("✓ Function Tools: countdown() function for counting down to 0")
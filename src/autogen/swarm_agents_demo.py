@@ -6,20 +6,22 @@ from autogen_agentchat.messages import HandoffMessage
 from autogen_agentchat.teams import Swarm
 from autogen_agentchat.ui import Console
 from autogen_core.tools import FunctionTool
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from model_clients import create_model_client
 import os
+import sys
 from dotenv import load_dotenv
 import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.tool_cache import cached_function_tool, format_cache_stats
+from team_checkpoint import ParkedTeams
 
 load_dotenv()
 
 # Create Azure OpenAI model client with parallel tool calls disabled for better handoff behavior
-az_model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-    model=os.getenv("MODEL"),
-    api_version=os.getenv("API_VERSION"),
-    azure_endpoint=os.getenv("ENDPOINT"),
-    api_key=os.getenv("API_KEY"),
+az_model_client = create_model_client(
     parallel_tool_calls=False  # Important: Disable parallel tool calls for better handoff control
 )
 
@@ -77,18 +79,18 @@ async def generate_report(data_type: str) -> str:
 
 # Create function tools
 order_tool = FunctionTool(process_order, description="Process customer orders (cancel, modify, track, expedite)")
-inventory_tool = FunctionTool(check_inventory, description="Check product inventory status")
-shipping_tool = FunctionTool(calculate_shipping, description="Calculate shipping costs and delivery times")
+# stock levels may change, so inventory answers are only reused briefly; shipping quotes are stable
+inventory_tool = cached_function_tool(
+    check_inventory,
+    description="Check product inventory status",
+    ttl=30,
+    key=lambda product_name: product_name.lower(),  # check_inventory looks products up lowercased
+)
+shipping_tool = cached_function_tool(calculate_shipping, description="Calculate shipping costs and delivery times", ttl=3600)
 report_tool = FunctionTool(generate_report, description="Generate business reports (sales, inventory, customer, financial)")
 
-async def customer_service_swarm_demo():
-    """
-    Demonstrate Swarm with a customer service team that can hand off between agents.
-    Shows human-in-the-loop handoffs and specialized agent interactions.
-    """
-    print("=== CUSTOMER SERVICE SWARM DEMO ===")
-    print("Multi-agent customer service with intelligent handoffs\n")
-    
+def build_customer_service_team():
+    """Create the customer service Swarm; its state can be parked and restored into a new one."""
     # Customer Service Representative - Main entry point
     customer_service_rep = AssistantAgent(
         "customer_service_rep",
@@ -165,10 +167,25 @@ async def customer_service_swarm_demo():
     termination = HandoffTermination(target="user") | TextMentionTermination("TERMINATE")
     
     # Create Swarm team
-    customer_service_team = Swarm(
+    return Swarm(
         participants=[customer_service_rep, order_specialist, inventory_specialist, shipping_specialist],
         termination_condition=termination
     )
+
+async def customer_service_swarm_demo(conversation_id="demo-customer"):
+    """
+    Demonstrate Swarm with a customer service team that can hand off between agents.
+    Shows human-in-the-loop handoffs and specialized agent interactions.
+
+    While the team waits for the customer it is parked on disk and dropped, the
+    way a server would hold thousands of idle conversations, then restored from
+    its checkpoint when the reply arrives.
+    """
+    print("=== CUSTOMER SERVICE SWARM DEMO ===")
+    print("Multi-agent customer service with intelligent handoffs\n")
+
+    parked_teams = ParkedTeams(build_customer_service_team, ".checkpoints")
+    customer_service_team = build_customer_service_team()
     
     # Example customer inquiry
     task = "Hi, I want to cancel my order and also check if you have any laptops in stock."
@@ -182,8 +199,16 @@ async def customer_service_swarm_demo():
     
     # Handle user handoffs (human-in-the-loop)
     while isinstance(last_message, HandoffMessage) and last_message.target == "user":
-        print(f"\n🤖 Agent {last_message.source} is requesting information from you...")
+        # nothing needs the team while we wait, so keep only its checkpoint
+        size = await parked_teams.park(conversation_id, customer_service_team, task_result)
+        customer_service_team = None
+        print(f"\n(team parked: {size} bytes)")
+        print(f"🤖 Agent {last_message.source} is requesting information from you...")
         user_input = input("Your response: ")
+
+        start = time.perf_counter()
+        customer_service_team, last_message = await parked_teams.resume(conversation_id)
+        print(f"(team restored in {(time.perf_counter() - start) * 1000:.1f} ms)")
         
         # Continue the conversation with user input
         task_result = await Console(
@@ -193,6 +218,7 @@ async def customer_service_swarm_demo():
         )
         last_message = task_result.messages[-1]
     
+    parked_teams.discard(conversation_id)
     print(f"\n✅ Customer service interaction completed!")
     print(f"Final status: {task_result.stop_reason}")
     
@@ -215,6 +241,9 @@ async def main():
     finally:
         # Close the model client
         await az_model_client.close()
+
+    print("\nTool cache:")
+    print(format_cache_stats())
     
     print("\n" + "=" * 50)
     print("SWARM PATTERN BENEFITS:")
@@ -222,6 +251,7 @@ async def main():
     print("✓ Specialized Expertise: Each agent focuses on specific capabilities") 
     print("✓ Dynamic Workflow: Flexible handoff patterns based on context")
     print("✓ Human-in-the-Loop: Seamless user interaction when needed")
+    print("✓ Checkpointing: Waiting conversations are parked on disk, not in memory")
     print("✓ Shared Context: All agents have access to conversation history")
     print("✓ Tool Integration: Agents use specialized tools for their domain")
     print("\nSwarm enables natural, flexible multi-agent collaboration!")
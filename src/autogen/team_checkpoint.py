@@ -0,0 +1,164 @@
+"""
+Checkpoint and restore AutoGen teams between runs, so a conversation waiting
+on a human does not keep its team in memory.
+
+A checkpoint is ``team.save_state()`` plus the run's stop reason and the
+message the team stopped on (e.g. ``HandoffMessage(target="user")``). That
+covers the Swarm's current speaker and turn counter, the shared message
+thread, every agent's model context and its unread message buffer. The
+termination conditions need nothing: a group chat resets them whenever a run
+stops, so between runs they always start over.
+
+The state is mostly the same few strings repeated: each message appears in
+the thread and again in every agent's context. ``dumps`` interns equal
+strings to one object, so ``marshal`` writes every repeat as a back-reference.
+The result is then zlib-compressed. Checkpoints come out slightly smaller than
+zlib-compressed JSON, and they decode faster. Apart from one interning pass
+over the state, all of the work is done by ``marshal`` and zlib in C. Most of
+the cost of a checkpoint is AutoGen itself: ``save_state`` dumps every message,
+and ``load_state`` validates them again.
+
+    parked = ParkedTeams(build_team, ".checkpoints")
+    result = await team.run(task=task)
+    await parked.park("customer-42", team, result)     # drop ``team`` afterwards
+    ...
+    team, waiting_on = await parked.resume("customer-42")
+    result = await team.run(task=HandoffMessage(source="user", target=waiting_on.source, content=reply))
+
+``marshal`` is not safe against crafted input, so only load checkpoints that
+this service wrote. Its format may change between Python versions, so
+checkpoints are for parking conversations, not for archiving them.
+"""
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+from typing import Any, Awaitable, Callable, Mapping, Optional, Tuple
+
+from autogen_agentchat.base import TaskResult, Team
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, MessageFactory
+from pydantic_core import to_jsonable_python
+
+MAGIC = b"TCKP"
+FORMAT_VERSION = 1
+MARSHAL_VERSION = 4  # the first version that writes back-references
+MAX_HEX_ID_BYTES = 100  # hex doubles the length, and file names stop at 255 bytes
+
+
+def _interned(value: Any, strings: dict) -> Any:
+    # exact type checks first: this walks every node of the state
+    kind = type(value)
+    if kind is str:
+        return strings.setdefault(value, value)
+    if kind is dict:
+        return {strings.setdefault(key, key): _interned(item, strings) for key, item in value.items()}
+    if kind is list or kind is tuple:
+        return [_interned(item, strings) for item in value]
+    if value is None or kind is bool or kind is int or kind is float:
+        return value
+    if isinstance(value, Mapping):
+        return _interned(dict(value), strings)
+    # datetimes, pydantic models and the like: store their JSON form
+    return _interned(to_jsonable_python(value), strings)
+
+
+def dumps(checkpoint: Mapping[str, Any], level: int = 1) -> bytes:
+    """Encode a checkpoint (any JSON-like mapping) into the compact binary format."""
+    body = marshal.dumps(_interned(checkpoint, {}), MARSHAL_VERSION)
+    return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(body, level)
+
+
+def loads(data: bytes) -> dict:
+    if data[:4] != MAGIC or data[4:5] != bytes([FORMAT_VERSION]):
+        raise ValueError("not a team checkpoint (or written by an incompatible version)")
+    return marshal.loads(zlib.decompress(data[5:]))
+
+
+async def checkpoint(team: Team, result: Optional[TaskResult] = None) -> bytes:
+    """Serialize ``team`` after a run; ``result`` adds the stop reason and the last message."""
+    last = result.messages[-1] if result is not None and result.messages else None
+    return dumps(
+        {
+            "team": await team.save_state(),
+            "stop_reason": result.stop_reason if result is not None else None,
+            "last_message": last.dump() if last is not None else None,
+        }
+    )
+
+
+async def restore(
+    team: Team, data: bytes, message_factory: Optional[MessageFactory] = None
+) -> Tuple[Optional[str], Optional[BaseAgentEvent | BaseChatMessage]]:
+    """Load a checkpoint into a freshly built ``team``; returns ``(stop_reason, last_message)``."""
+    state = loads(data)
+    await team.load_state(state["team"])
+    last = state["last_message"]
+    if last is not None:
+        last = (message_factory or MessageFactory()).create(last)
+    return state["stop_reason"], last
+
+
+class CheckpointStore:
+    """Checkpoints on disk, one file per conversation ID, each replaced atomically."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, conversation_id: str) -> str:
+        encoded = conversation_id.encode()
+        if len(encoded) <= MAX_HEX_ID_BYTES:
+            name = encoded.hex()
+        else:  # "-" never occurs in hex, so a hashed name cannot clash with a short id's
+            name = "sha256-" + hashlib.sha256(encoded).hexdigest()
+        return os.path.join(self.directory, name + ".ckpt")
+
+    def save(self, conversation_id: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(conversation_id))
+
+    def load(self, conversation_id: str) -> bytes:
+        with open(self._path(conversation_id), "rb") as f:
+            return f.read()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return os.path.exists(self._path(conversation_id))
+
+    def delete(self, conversation_id: str) -> None:
+        try:
+            os.remove(self._path(conversation_id))
+        except FileNotFoundError:
+            pass
+
+
+class ParkedTeams:
+    """Park teams on disk while they wait for a reply, and rebuild them on demand.
+
+    ``build_team`` must return a new team with the same participant names (and
+    may share model clients and tools between teams). Parking does not touch
+    the team; the caller drops its reference so it can be collected.
+    """
+
+    def __init__(self, build_team: Callable[[], Team | Awaitable[Team]], directory: str = ".checkpoints") -> None:
+        self.build_team = build_team
+        self.store = CheckpointStore(directory)
+
+    async def park(self, conversation_id: str, team: Team, result: Optional[TaskResult] = None) -> int:
+        """Checkpoint ``team``; returns the checkpoint size in bytes."""
+        data = await checkpoint(team, result)
+        self.store.save(conversation_id, data)
+        return len(data)
+
+    async def resume(self, conversation_id: str) -> Tuple[Team, Optional[BaseAgentEvent | BaseChatMessage]]:
+        """Rebuild the parked team; returns it with the message it stopped on."""
+        team = self.build_team()
+        if not isinstance(team, Team):
+            team = await team
+        _, last = await restore(team, self.store.load(conversation_id))
+        return team, last
+
+    def discard(self, conversation_id: str) -> None:
+        self.store.delete(conversation_id)
@@ -0,0 +1,59 @@
+"""
+Stop an AutoGen team when its conversation runs out of budget.
+
+The usage ledger (``common/usage_ledger.py``, ``USAGE_LEDGER=on``) refuses
+model requests from a conversation over its hard budget. An agent then fails
+mid-turn. ``BudgetTermination`` ends the run cleanly after the message that
+crossed the limit instead. It combines with other conditions as usual:
+
+    with usage_scope(conversation="ticket-42"):
+        team = RoundRobinGroupChat(agents, termination_condition=text_termination | BudgetTermination())
+        await Console(team.run_stream(task=task))
+
+Past the soft budget, requests are sent to cheaper models (``DOWNGRADES``)
+and the run goes on. Pass ``at="soft"`` to stop there instead. With the
+ledger off, the condition never fires.
+"""
+import os
+import sys
+from typing import Optional, Sequence
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage
+
+from common.usage_ledger import current_conversation, get_ledger, ledger_enabled
+
+
+class BudgetTermination(TerminationCondition):
+    """Terminate once ``conversation`` (default: the one of the current ``usage_scope``) is over its budget."""
+
+    def __init__(self, conversation: Optional[str] = None, at: str = "hard") -> None:
+        if at not in ("soft", "hard"):
+            raise ValueError(f"BudgetTermination stops at 'soft' or 'hard', got {at!r}")
+        self._conversation = conversation
+        self._states = ("soft", "hard") if at == "soft" else ("hard",)
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> StopMessage | None:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        if not ledger_enabled():
+            return None  # get_ledger() would install the ledger (and its span processor) as a side effect
+        conversation = self._conversation or current_conversation()
+        ledger = get_ledger()
+        if ledger.state(conversation) not in self._states:
+            return None
+        self._terminated = True
+        tokens, cost = ledger.spent(conversation)
+        return StopMessage(
+            content=f"Usage budget reached: {tokens} tokens, ${cost:.4f} spent.", source="BudgetTermination"
+        )
+
+    async def reset(self) -> None:
+        self._terminated = False
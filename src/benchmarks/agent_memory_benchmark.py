@@ -0,0 +1,113 @@
+"""
+Memory of custom ``BaseChatAgent``s over long selector-team runs: the original
+``ArithmeticAgent``, which keeps every message it is handed, against the
+bounded version (``KeepLast(1)`` from ``autogen/bounded_state.py``).
+
+Agents are driven the way ``SelectorGroupChat`` drives them. Each turn one
+agent is picked, and it receives every message broadcast since it last
+spoke. The team's own message thread is not measured; only what the agents
+retain is.
+
+    python src/benchmarks/agent_memory_benchmark.py --turns 10000 --agents 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Sequence
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from autogen_agentchat.agents import BaseChatAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import ChatMessage, TextMessage
+from autogen_core import CancellationToken
+
+from arithmetic_agent import ArithmeticAgent
+
+OPERATORS = [
+    ("add_agent", lambda x: x + 1),
+    ("multiply_agent", lambda x: x * 2),
+    ("subtract_agent", lambda x: x - 1),
+    ("divide_agent", lambda x: x // 2),
+    ("identity_agent", lambda x: x),
+]
+
+
+class UnboundedArithmeticAgent(BaseChatAgent):
+    """The ArithmeticAgent before bounded_state.py: its history only ever grows."""
+
+    def __init__(self, name, description, operator_func):
+        super().__init__(name, description=description)
+        self._operator_func = operator_func
+        self._message_history: List[ChatMessage] = []
+
+    @property
+    def produced_message_types(self):
+        return (TextMessage,)
+
+    async def on_messages(self, messages: Sequence[ChatMessage], cancellation_token: CancellationToken) -> Response:
+        self._message_history.extend(messages)
+        number = int(self._message_history[-1].content)
+        response_message = TextMessage(content=str(self._operator_func(number)), source=self.name)
+        self._message_history.append(response_message)
+        return Response(chat_message=response_message)
+
+    async def on_reset(self, cancellation_token: CancellationToken) -> None:
+        pass
+
+
+async def drive(agent_cls, agents, turns, checkpoints, seed):
+    """Run ``turns`` selector-style turns; return ``{turn: traced bytes}`` and seconds per turn."""
+    rng = random.Random(seed)
+    team = [agent_cls(f"{name}_{i}", "", func) for i, (name, func) in enumerate((OPERATORS * agents)[:agents])]
+    pending = {agent.name: [TextMessage(content="10", source="user")] for agent in team}
+    token = CancellationToken()
+    memory = {}
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for turn in range(1, turns + 1):
+        agent = rng.choice(team)
+        response = await agent.on_messages(pending[agent.name], token)
+        pending[agent.name] = []
+        # keep the number in a sane range, whichever operator ran
+        number = int(response.chat_message.content)
+        message = response.chat_message if -1000 < number < 1000 else TextMessage(content="10", source="user")
+        for other in team:
+            if other is not agent:
+                pending[other.name].append(message)
+        if turn in checkpoints:
+            memory[turn] = tracemalloc.get_traced_memory()[0] - baseline
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return memory, elapsed / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--agents", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    checkpoints = sorted({max(1, args.turns // 10), args.turns // 2, args.turns})
+    print("=== AGENT MEMORY BENCHMARK ===")
+    print(f"{args.agents} arithmetic agents, {args.turns} selector turns (traced memory held by the agents)\n")
+    header = "".join(f"{f'@{turn} turns':>14}" for turn in checkpoints)
+    print(f"{'agent':<28}{header} {'per turn':>10}")
+    for label, agent_cls in (("unbounded history", UnboundedArithmeticAgent), ("KeepLast(1)", ArithmeticAgent)):
+        memory, per_turn = asyncio.run(drive(agent_cls, args.agents, args.turns, checkpoints, args.seed))
+        row = "".join(f"{memory[turn] / 1024:11.1f} KB" for turn in checkpoints)
+        print(f"{label:<28}{row} {per_turn * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
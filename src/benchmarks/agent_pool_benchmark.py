@@ -0,0 +1,135 @@
+"""
+One expert tool shared by ``--users`` concurrent users, each asking it
+``--calls`` questions, against a mock model in its own process:
+
+* shared + lock   one ``AgentTool`` on one agent, calls serialized by a lock
+                  (the only safe way to share a single stateful agent)
+* fresh per call  a new ``AgentTool`` and agent for every call
+* pooled          ``agent_tools.PooledAgentTool`` leasing from a pool of
+                  warm instances, ``--min-size`` and up (``--max-size`` caps it)
+
+All three run twice: with the expert as it is (an ``AssistantAgent`` builds in
+tens of microseconds) and with ``--build-ms`` of blocking work in its factory,
+standing in for an expert that loads tools, an index or a client. A pool only
+saves that build, so without it a fresh agent per call is as fast.
+
+Reported are throughput and per-call latency, plus the pool's size and wait
+times. The pool is then left idle past its ``--idle-timeout`` and called once
+more, to show it shrinking back to ``--min-size``.
+
+    python src/benchmarks/agent_pool_benchmark.py --users 32 --build-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.tools import AgentTool
+from autogen_core import CancellationToken
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from agent_tools import PooledAgentTool, format_pool_stats
+from common.mock_server import MockCompletionServer
+from model_clients import MOCK_MODEL_INFO
+
+
+def make_expert(model_client, build_ms=0.0):
+    def factory():
+        done = time.perf_counter() + build_ms / 1000
+        while time.perf_counter() < done:  # setup work blocks the event loop, as real construction would
+            pass
+        return AssistantAgent(
+            "math_expert", model_client=model_client, system_message="You are a mathematics expert.",
+            description="Solves mathematical problems.",
+        )
+    return factory
+
+
+async def drive(url, mode, build_ms, args):
+    model_client = OpenAIChatCompletionClient(model="gpt-4o", api_key="mock", base_url=url, model_info=MOCK_MODEL_INFO)
+    factory = make_expert(model_client, build_ms)
+    lock = asyncio.Lock()
+    shared = AgentTool(factory())
+    pooled = PooledAgentTool(factory, args.min_size, args.max_size, args.idle_timeout)
+    latencies = []
+
+    async def call(user, i):
+        start = time.perf_counter()
+        task = {"task": f"user {user}, question {i}"}
+        if mode == "shared + lock":
+            async with lock:
+                await shared.run_json(task, CancellationToken())
+        elif mode == "fresh per call":
+            await AgentTool(factory()).run_json(task, CancellationToken())
+        else:
+            await pooled.run_json(task, CancellationToken())
+        latencies.append(time.perf_counter() - start)
+
+    async def user(n):
+        for i in range(args.calls):
+            await call(n, i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(args.users)))
+    elapsed = time.perf_counter() - start
+    pool_line = format_pool_stats(pooled.pool) if mode == "pooled" else None
+    if mode == "pooled":
+        await asyncio.sleep(args.idle_timeout * 1.5)
+        await pooled.run_json({"task": "one more"}, CancellationToken())
+        pool_line += f"\n{'':<16} after {args.idle_timeout * 1.5:.1f}s idle and one call: {format_pool_stats(pooled.pool)}"
+    await model_client.close()
+    return elapsed, latencies, pool_line
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=5, help="Questions per user, asked one after another.")
+    parser.add_argument("--min-size", type=int, default=2)
+    parser.add_argument("--max-size", type=int, default=None, help="Pool cap; unbounded by default.")
+    parser.add_argument("--idle-timeout", type=float, default=1.0)
+    parser.add_argument("--build-ms", type=float, default=5.0, help="Blocking setup work per expert instance, second run.")
+    parser.add_argument("--latency", default="normal:0.1,0.02", help="Mock model latency: seconds or e.g. 'normal:0.1,0.02'.")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="Resolved model mismatch")
+
+    server = MockCompletionServer(latency=args.latency)
+    url = server.start_in_subprocess()
+    print("=== AGENT POOL BENCHMARK ===")
+    print(
+        f"{args.users} users x {args.calls} calls on one expert tool, pool {args.min_size}..{args.max_size or 'unbounded'}, "
+        f"mock latency {args.latency}"
+    )
+    try:
+        for build_ms in (0.0, args.build_ms):
+            print(f"\n{'build ' + (f'+{build_ms:g} ms' if build_ms else 'as is'):<16} {'calls/s':>8} {'p50':>9} {'p99':>9}")
+            for mode in ("shared + lock", "fresh per call", "pooled"):
+                elapsed, latencies, pool_line = asyncio.run(drive(url, mode, build_ms, args))
+                ordered = sorted(latencies)
+                print(
+                    f"{mode:<16} {len(latencies) / elapsed:8.1f} {statistics.median(ordered) * 1000:6.0f} ms"
+                    f" {ordered[int(len(ordered) * 0.99)] * 1000:6.0f} ms"
+                )
+                if pool_line:
+                    print(f"{'':<16} {pool_line}")
+    finally:
+        server.stop_subprocess()
+
+    model_client = OpenAIChatCompletionClient(model="gpt-4o", api_key="mock", base_url="http://127.0.0.1:1", model_info=MOCK_MODEL_INFO)
+    factory = make_expert(model_client)
+    start = time.perf_counter()
+    for _ in range(200):
+        factory()
+    print(f"\nBuilding one expert instance as is: {(time.perf_counter() - start) / 200 * 1e6:.0f} us (what a warm pool saves per call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+A coordinator that needs two experts for every question, asked ``--questions``
+times (``--concurrency`` at a time), against a scripted mock model in its own
+process:
+
+* sequential     ``AgentTool`` experts with ``parallel_tool_calls=False``: the
+                 coordinator calls the chemistry expert, then the math expert
+* fan-out        ``agent_tools.IsolatedAgentTool`` experts: both are called
+                 from one coordinator message and run at the same time
+
+Each question is answered by a fresh coordinator. Reported is the latency of
+a question (one coordinator run). Finally, ``--calls`` concurrent calls are
+made on one shared ``IsolatedAgentTool``, to check that the calls stay
+isolated and that the expert's merged memory is in call order.
+
+    python src/benchmarks/agent_tool_fanout_benchmark.py --questions 40 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.tools import AgentTool
+from autogen_core import CancellationToken
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from agent_tools import IsolatedAgentTool
+from common.mock_server import MockCompletionServer, ScriptedResponder
+from model_clients import MOCK_MODEL_INFO
+
+QUESTION = "What is the molar mass of caffeine, and how many moles are in a 200 mg tablet?"
+MATH_TASK = {"task": "How many moles are in 200 mg of a compound with molar mass 194.19 g/mol?"}
+CHEMISTRY_TASK = {"task": "What is the molar mass of caffeine?"}
+EXPERT_RULES = [
+    {"match": {"system": "mathematics expert"}, "response": {"content": "About 1.03 mmol."}},
+    {"match": {"system": "chemistry expert"}, "response": {"content": "C8H10N4O2, 194.19 g/mol."}},
+]
+SCRIPTS = {
+    "sequential": [
+        *EXPERT_RULES,
+        {"match": {"system": "coordinator", "last_role": "user"},
+         "response": {"tool_calls": [{"name": "chemistry_expert", "arguments": CHEMISTRY_TASK}]}},
+        {"match": {"system": "coordinator", "last_role": "tool", "last_content": "C8H10N4O2"},
+         "response": {"tool_calls": [{"name": "math_expert", "arguments": MATH_TASK}]}},
+        {"match": {"system": "coordinator"}, "response": {"content": "194.19 g/mol, so about 1.03 mmol per tablet."}},
+    ],
+    "fan-out": [
+        *EXPERT_RULES,
+        {"match": {"system": "coordinator", "last_role": "user"},
+         "response": {"tool_calls": [
+             {"name": "chemistry_expert", "arguments": CHEMISTRY_TASK},
+             {"name": "math_expert", "arguments": MATH_TASK},
+         ]}},
+        {"match": {"system": "coordinator"}, "response": {"content": "194.19 g/mol, so about 1.03 mmol per tablet."}},
+    ],
+}
+
+
+def expert(model_client, name, system_message):
+    return lambda: AssistantAgent(name, model_client=model_client, system_message=system_message, description=f"The {name}.")
+
+
+def make_coordinator(mode, model_client):
+    experts = [
+        expert(model_client, "math_expert", "You are a mathematics expert."),
+        expert(model_client, "chemistry_expert", "You are a chemistry expert."),
+    ]
+    if mode == "sequential":
+        tools = [AgentTool(factory(), return_value_as_last_message=True) for factory in experts]
+    else:
+        tools = [IsolatedAgentTool(factory, return_value_as_last_message=True) for factory in experts]
+    return AssistantAgent(
+        "coordinator", model_client=model_client, system_message="You are a helpful assistant coordinator.",
+        tools=tools, max_tool_iterations=3,
+    )
+
+
+async def drive(url, mode, questions, concurrency):
+    model_client = OpenAIChatCompletionClient(
+        model="gpt-4o", api_key="mock", base_url=url, model_info=MOCK_MODEL_INFO,
+        parallel_tool_calls=mode != "sequential",
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await make_coordinator(mode, model_client).run(task=QUESTION)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(questions)))
+    elapsed = time.perf_counter() - start
+    await model_client.close()
+    return elapsed, latencies
+
+
+async def isolation_check(url, calls):
+    """Run ``calls`` concurrent calls on one shared tool; returns each result's message count and the merged memory's tasks."""
+    model_client = OpenAIChatCompletionClient(model="gpt-4o", api_key="mock", base_url=url, model_info=MOCK_MODEL_INFO)
+    tool = IsolatedAgentTool(expert(model_client, "math_expert", "You are a mathematics expert."))
+    results = await asyncio.gather(
+        *(tool.run_json({"task": f"question {i}"}, CancellationToken()) for i in range(calls))
+    )
+    await model_client.close()
+    state = await tool.save_state_json()
+    seen = [len(result.messages) for result in results]  # task + reply each, if no call saw another's messages
+    tasks = [message["content"] for message in state["llm_context"]["messages"] if message["type"] == "UserMessage"]
+    return seen, tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=8, help="Concurrent calls for the isolation check.")
+    parser.add_argument("--latency", default="normal:0.2,0.03", help="Mock model latency: seconds or e.g. 'normal:0.2,0.03'.")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="Resolved model mismatch")
+
+    print("=== AGENT TOOL FAN-OUT BENCHMARK ===")
+    print(f"{args.questions} two-expert questions, concurrency {args.concurrency}, mock latency {args.latency}\n")
+    print(f"{'mode':<12} {'questions/s':>12} {'p50':>9} {'p99':>9}")
+    for mode, rules in SCRIPTS.items():
+        server = MockCompletionServer(latency=args.latency, responder=ScriptedResponder(rules))
+        url = server.start_in_subprocess()
+        try:
+            elapsed, latencies = asyncio.run(drive(url, mode, args.questions, args.concurrency))
+            if mode == "fan-out":
+                seen, tasks = asyncio.run(isolation_check(url, args.calls))
+        finally:
+            server.stop_subprocess()
+        ordered = sorted(latencies)
+        print(
+            f"{mode:<12} {len(latencies) / elapsed:12.1f} {statistics.median(ordered) * 1000:6.0f} ms"
+            f" {ordered[int(len(ordered) * 0.99)] * 1000:6.0f} ms"
+        )
+
+    print(f"\n{args.calls} concurrent calls on one IsolatedAgentTool:")
+    print(f"  messages per call result: {seen} ({'isolated' if set(seen) == {2} else 'NOT isolated'})")
+    in_order = tasks == [f"question {i}" for i in range(args.calls)]
+    print(f"  expert memory after the calls: {len(tasks)} tasks, {'in call order' if in_order else 'out of order'}")
+
+
+if __name__ == "__main__":
+    main()
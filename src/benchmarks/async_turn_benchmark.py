@@ -0,0 +1,128 @@
+"""
+Throughput benchmark: blocking ``handoff.run_full_turn`` vs. the asyncio engine
+in ``async_handoff.run_full_turn``, both against the local mock completion server
+and through the shared pooled HTTP client the demos use.
+
+Throughput grows with concurrency until one of two limits is hit: the
+endpoint's ``HTTP_MAX_CONNECTIONS`` (requests in flight), or the client's
+CPU, reported per conversation. With a short ``--latency`` the CPU is the
+limit early, and more concurrency then only adds latency.
+
+    python src/benchmarks/async_turn_benchmark.py --conversations 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI, OpenAI
+
+from common.http_pool import shared_http_client
+from common.mock_server import MockCompletionServer
+import async_handoff
+import handoff
+
+USER_TURNS = [
+    "Hi, my roadrunner trap is broken.",
+    "It snaps shut before the bird arrives.",
+    "Thanks, that helps.",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_sync_conversation(turn_latencies):
+    agent, messages = handoff.triage_agent, []
+    for user in USER_TURNS:
+        messages.append({"role": "user", "content": user})
+        start = time.perf_counter()
+        response = handoff.run_full_turn(agent, messages)
+        turn_latencies.append(time.perf_counter() - start)
+        agent = response.agent
+        messages.extend(response.messages)
+
+
+async def run_async_conversation(semaphore, turn_latencies):
+    async with semaphore:
+        agent, messages = handoff.triage_agent, []
+        for user in USER_TURNS:
+            messages.append({"role": "user", "content": user})
+            start = time.perf_counter()
+            response = await async_handoff.run_full_turn(agent, messages)
+            turn_latencies.append(time.perf_counter() - start)
+            agent = response.agent
+            messages.extend(response.messages)
+
+
+def report(label, conversations, elapsed, turn_latencies, cpu):
+    print(
+        f"{label:<28} {conversations:>6} convs  {elapsed:7.2f}s  "
+        f"{conversations / elapsed:8.1f} conv/s  "
+        f"p50={statistics.median(turn_latencies) * 1000:6.1f}ms  "
+        f"p99={percentile(turn_latencies, 99) * 1000:6.1f}ms  "
+        f"cpu={cpu / conversations * 1000:5.1f}ms/conv"
+    )
+
+
+async def benchmark_async(url, conversations, concurrency):
+    # the shared pooled client the demos use; it keeps separate pools per event loop
+    async_handoff.client = AsyncOpenAI(api_key="mock", base_url=url, http_client=shared_http_client(async_client=True))
+    semaphore = asyncio.Semaphore(concurrency)
+    turn_latencies = []
+    start, cpu = time.perf_counter(), time.process_time()
+    await asyncio.gather(
+        *(run_async_conversation(semaphore, turn_latencies) for _ in range(conversations))
+    )
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    await async_handoff.client.close()
+    return elapsed, turn_latencies, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--sync-conversations", type=int, default=10,
+                        help="The blocking loop is serial, so keep this small.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock model latency in seconds.")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(latency=args.latency)
+    url = server.start_in_subprocess()
+    handoff.client = OpenAI(api_key="mock", base_url=url, http_client=shared_http_client())
+
+    print("=== SWARM TURN THROUGHPUT BENCHMARK ===")
+    print(f"Mock latency: {args.latency * 1000:.0f}ms, {len(USER_TURNS)} turns per conversation\n")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        turn_latencies = []
+        start, cpu = time.perf_counter(), time.process_time()
+        for _ in range(args.sync_conversations):
+            run_sync_conversation(turn_latencies)
+        sync_result = (time.perf_counter() - start, turn_latencies, time.process_time() - cpu)
+
+        async_results = [
+            (concurrency, asyncio.run(benchmark_async(url, args.conversations, concurrency)))
+            for concurrency in args.concurrency
+        ]
+
+    report("sync (serial)", args.sync_conversations, *sync_result)
+    for concurrency, result in async_results:
+        report(f"async (concurrency={concurrency})", args.conversations, *result)
+
+    server.stop_subprocess()
+
+
+if __name__ == "__main__":
+    main()
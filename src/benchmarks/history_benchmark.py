@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: cost of building one model request as a session's history grows.
+
+Compares the original list handling (copy the history, encode everything)
+with a windowed ``MessageStore``. Both send the agent's instructions as the
+one system message.
+
+    python src/benchmarks/history_benchmark.py --lengths 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from async_handoff import encode_chat_request
+from handoff import issues_and_repairs_agent
+from history import LastN, MessageStore, PinSystemMessages, TokenBudget
+from tool_registry import get_tool_table
+
+
+def make_history(length):
+    messages = []
+    for i in range(length // 4):
+        messages += [
+            {"role": "user", "content": f"My roadrunner trap number {i} is broken again."},
+            {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{i}", "type": "function",
+                "function": {"name": "look_up_item", "arguments": '{"search_query": "trap"}'},
+            }]},
+            {"role": "tool", "tool_call_id": f"call_{i}", "content": "item_132612938"},
+            {"role": "assistant", "content": "Have you tried oiling the spring?"},
+        ]
+    return messages
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    agent = issues_and_repairs_agent
+    tool_table = get_tool_table(agent)
+    policies = {
+        "MessageStore, KeepAll": None,
+        "MessageStore, LastN(50)": LastN(50),
+        "MessageStore, TokenBudget(2000)": PinSystemMessages(TokenBudget(2000)),
+    }
+
+    print("=== CONVERSATION HISTORY BENCHMARK ===")
+    print("Per-request build time and resident history size\n")
+    print(f"{'history':<36}" + "".join(f"{length:>14}" for length in args.lengths))
+
+    histories = {length: make_history(length) for length in args.lengths}
+
+    row = []
+    for length, messages in histories.items():
+        run = lambda: encode_chat_request(agent, messages.copy(), tool_table)
+        row.append(timeit.timeit(run, number=args.iterations) / args.iterations)
+    print(f"{'list: copy + encode all':<36}" + "".join(f"{t * 1e6:>11.1f} us" for t in row))
+
+    for label, policy in policies.items():
+        row = []
+        for length, messages in histories.items():
+            store = MessageStore(messages, policy=policy)
+            run = lambda: encode_chat_request(agent, store, tool_table)
+            row.append(timeit.timeit(run, number=args.iterations) / args.iterations)
+        print(f"{label:<36}" + "".join(f"{t * 1e6:>11.1f} us" for t in row))
+
+    print()
+    print(f"{'list of dicts (memory)':<36}" + "".join(
+        f"{measure_memory(lambda: make_history(length)) / 1024:>11.1f} KB" for length in args.lengths))
+    print(f"{'MessageStore (memory)':<36}" + "".join(
+        f"{measure_memory(lambda: MessageStore(make_history(length))) / 1024:>11.1f} KB" for length in args.lengths))
+
+
+if __name__ == "__main__":
+    main()
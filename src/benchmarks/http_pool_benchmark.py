@@ -0,0 +1,109 @@
+"""
+Per-request latency of chat completions under concurrency for different ways
+of holding HTTP connections, against the mock completion server (in its own
+process so it does not compete for the GIL):
+
+* client per request   a new ``AsyncOpenAI`` (and pool) for every request
+* per-module clients   ``--clients`` SDK clients with their own default pools,
+                       requests spread across them (one client per demo module)
+* shared pool          the same clients on ``http_pool.shared_http_client``
+* shared pool, warm    ... after ``warm_up_async`` opened ``concurrency`` connections
+
+Latencies are reported above the mock model's own ``--latency``. "first wave"
+is the median of the first ``concurrency`` requests, the ones that have to
+open connections unless the pool was warmed up.
+
+    python src/benchmarks/http_pool_benchmark.py --concurrency 1 16 64 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from common.http_pool import PooledTransport, pool_settings, warm_up_async
+from common.mock_server import MockCompletionServer
+
+MESSAGES = [{"role": "user", "content": "Is my roadrunner trap covered by the warranty?"}]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def complete(client):
+    await client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+
+async def drive(url, strategy, concurrency, requests, clients):
+    """Return the latency of each request, in the order the requests started."""
+    if strategy == "client per request":
+        pool = None
+    elif strategy == "per-module clients":
+        pool = [AsyncOpenAI(api_key="mock", base_url=url) for _ in range(clients)]
+    else:
+        # a transport of its own (not the process-wide one) so every run starts cold
+        http_client = DefaultAsyncHttpxClient(transport=PooledTransport(**pool_settings()))
+        pool = [AsyncOpenAI(api_key="mock", base_url=url, http_client=http_client) for _ in range(clients)]
+        if strategy == "shared pool, warm":
+            await warm_up_async(url, concurrency, http_client=http_client)
+
+    latencies = [0.0] * requests
+    next_request = iter(range(requests))
+
+    async def worker():
+        for i in next_request:
+            start = time.perf_counter()
+            if pool is None:
+                async with AsyncOpenAI(api_key="mock", base_url=url) as client:
+                    await complete(client)
+            else:
+                await complete(pool[i % len(pool)])
+            latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for client in {id(c): c for c in pool or []}.values():
+        await client.close()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=4, help="SDK clients the requests are spread over.")
+    parser.add_argument("--latency", default="0.02", help="Mock model latency: seconds or e.g. 'normal:0.05,0.01'.")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(latency=args.latency)
+    url = server.start_in_subprocess()
+    model_latency = statistics.mean(float(part) for part in args.latency.split(":")[-1].split(",")[:1])
+    strategies = ["client per request", "per-module clients", "shared pool", "shared pool, warm"]
+    try:
+        print("=== HTTP POOL BENCHMARK ===")
+        print(f"{args.requests} chat completions per run, mock latency {args.latency}, {args.clients} SDK clients\n")
+        print(f"{'strategy':<22} {'concurrency':>11} {'req/s':>8} {'first wave':>11} {'p50':>9} {'p99':>9}")
+        for concurrency in args.concurrency:
+            for strategy in strategies:
+                latencies, elapsed = asyncio.run(drive(url, strategy, concurrency, args.requests, args.clients))
+                overhead = [latency - model_latency for latency in latencies]
+                print(
+                    f"{strategy:<22} {concurrency:>11} {args.requests / elapsed:8.1f}"
+                    f" {statistics.median(overhead[:concurrency]) * 1000:8.2f} ms"
+                    f" {statistics.median(overhead) * 1000:6.2f} ms {percentile(overhead, 99) * 1000:6.2f} ms"
+                )
+    finally:
+        server.stop_subprocess()
+
+
+if __name__ == "__main__":
+    main()
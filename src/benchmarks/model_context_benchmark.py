@@ -0,0 +1,94 @@
+"""
+Cost of ``get_messages()`` on a token-limited model context as the history grows:
+AutoGen's ``TokenLimitedChatCompletionContext`` against
+``IncrementalTokenLimitedChatCompletionContext`` from ``autogen/model_contexts.py``.
+
+Tokens are counted by ``ReplayChatCompletionClient`` (whitespace tokens, no
+network needed). Pass ``--counter tiktoken`` to use ``OpenAIChatCompletionClient``.
+It counts with tiktoken, which is slower, so the gap grows. It needs the
+tiktoken encodings to be downloadable or cached. Once one built-in fetch takes
+longer than ``--max-seconds``, the built-in context is skipped for larger
+histories.
+
+    python src/benchmarks/model_context_benchmark.py --sizes 100 1000 5000 --token-limit 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+
+from autogen_core.model_context import TokenLimitedChatCompletionContext
+from autogen_core.models import AssistantMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from model_contexts import IncrementalTokenLimitedChatCompletionContext
+
+
+def make_model_client(counter):
+    if counter == "tiktoken":
+        from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+        return OpenAIChatCompletionClient(model="gpt-4o", api_key="mock")
+    return ReplayChatCompletionClient(["unused"])
+
+
+def history(size):
+    for i in range(size):
+        if i % 2 == 0:
+            yield UserMessage(content=f"Question {i}: what about item {i} and its {i % 7} siblings?", source="user")
+        else:
+            yield AssistantMessage(content=f"Answer {i}: " + "item details and a short explanation " * 3, source="assistant")
+
+
+async def measure(context, size, repeats):
+    start = time.perf_counter()
+    for message in history(size):
+        await context.add_message(message)
+    add_time = time.perf_counter() - start
+    fetches = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        messages = await context.get_messages()
+        fetches.append(time.perf_counter() - start)
+    return add_time / size, statistics.median(fetches), len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--token-limit", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5, help="get_messages() calls per measurement.")
+    parser.add_argument("--counter", choices=["whitespace", "tiktoken"], default="whitespace")
+    parser.add_argument("--max-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model_client = make_model_client(args.counter)
+    contexts = {
+        "TokenLimited (built-in)": TokenLimitedChatCompletionContext,
+        "IncrementalTokenLimited": IncrementalTokenLimitedChatCompletionContext,
+    }
+
+    print("=== MODEL CONTEXT BENCHMARK ===")
+    print(f"token_limit={args.token_limit}, {args.counter} token counting\n")
+    print(f"{'context':<26} {'history':>8} {'add/msg':>11} {'get_messages':>14} {'kept':>6}")
+    too_slow = set()
+    for size in args.sizes:
+        for name, cls in contexts.items():
+            if name in too_slow:
+                print(f"{name:<26} {size:>8} {'skipped':>11}")
+                continue
+            context = cls(model_client, token_limit=args.token_limit)
+            per_add, fetch, kept = asyncio.run(measure(context, size, args.repeats))
+            print(f"{name:<26} {size:>8} {per_add * 1e6:8.1f} us {fetch * 1000:11.3f} ms {kept:>6}")
+            if fetch > args.max_seconds:
+                too_slow.add(name)
+
+
+if __name__ == "__main__":
+    main()
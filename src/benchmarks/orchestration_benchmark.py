@@ -0,0 +1,324 @@
+"""
+Orchestration overhead of the same ACME customer-service conversation across
+the hand-rolled Swarm loop, AutoGen teams and the OpenAI Agents SDK.
+
+Every framework talks to the mock completion server scripted with
+``common/scripts/acme_refund.json``, so the model's answers (and tool calls)
+are identical and only the framework's own cost differs. Three measurements:
+
+* overhead   time per user turn against a zero-latency model, serial
+* memory     peak traced allocation of one conversation (tracemalloc)
+* throughput conversations/s and conversation p50/p99 at each concurrency,
+             against a model with ``--latency``
+
+    python src/benchmarks/orchestration_benchmark.py --latency normal:0.05,0.01 --concurrency 1 10 50
+"""
+import abc
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI, OpenAI
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.conditions import MaxMessageTermination, TextMessageTermination
+from autogen_agentchat.teams import RoundRobinGroupChat, SelectorGroupChat, Swarm
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+import agents as agents_sdk
+
+from common.mock_server import MockCompletionServer, ScriptedResponder
+from model_clients import MOCK_MODEL_INFO
+import async_handoff
+import handoff
+
+SCRIPT = os.path.join(SRC, "common", "scripts", "acme_refund.json")
+
+USER_TURNS = [
+    "Hi there.",
+    "My roadrunner trap is broken.",
+    "It is still broken after oiling it.",
+    "I just want a refund.",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# typed wrappers: AutoGen and the Agents SDK build tool schemas from annotations
+def look_up_item(search_query: str) -> str:
+    """Use to find item ID.
+    Search query can be a description or keywords."""
+    return handoff.look_up_item(search_query)
+
+
+def execute_refund(item_id: str, reason: str = "not provided") -> str:
+    """Refund an item. Make sure you have the item_id of the form item_..."""
+    return handoff.execute_refund(item_id, reason)
+
+
+# === frameworks ===
+# Each runner owns its model client(s) for one event loop and exposes
+# ``conversation()``, which plays USER_TURNS and returns per-turn latencies.
+
+
+class SwarmSyncRunner:
+    """The blocking loop in ``swarm/handoff.py``, on a thread per conversation."""
+
+    def __init__(self, url):
+        handoff.client = OpenAI(api_key="mock", base_url=url)
+        self.executor = ThreadPoolExecutor(max_workers=256, thread_name_prefix="swarm-sync")
+
+    def _conversation(self):
+        agent, messages, turns = handoff.triage_agent, [], []
+        for user in USER_TURNS:
+            messages.append({"role": "user", "content": user})
+            start = time.perf_counter()
+            response = handoff.run_full_turn(agent, messages)
+            turns.append(time.perf_counter() - start)
+            agent = response.agent
+            messages.extend(response.messages)
+        return turns
+
+    async def conversation(self):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._conversation)
+
+    async def close(self):
+        self.executor.shutdown()
+        handoff.client.close()
+
+
+class SwarmAsyncRunner:
+    """``swarm/async_handoff.py`` on the event loop."""
+
+    def __init__(self, url):
+        async_handoff.client = AsyncOpenAI(api_key="mock", base_url=url)
+
+    async def conversation(self):
+        agent, messages, turns = handoff.triage_agent, [], []
+        for user in USER_TURNS:
+            messages.append({"role": "user", "content": user})
+            start = time.perf_counter()
+            response = await async_handoff.run_full_turn(agent, messages)
+            turns.append(time.perf_counter() - start)
+            agent = response.agent
+            messages.extend(response.messages)
+        return turns
+
+    async def close(self):
+        await async_handoff.client.close()
+
+
+class AutogenRunner(abc.ABC):
+    """An AutoGen team, built fresh per conversation; each user turn is one ``team.run``."""
+
+    def __init__(self, url):
+        self.model_client = OpenAIChatCompletionClient(
+            model="gpt-4o", api_key="mock", base_url=url, model_info=MOCK_MODEL_INFO
+        )
+
+    def make_agents(self, handoffs):
+        triage = AssistantAgent(
+            "triage",
+            model_client=self.model_client,
+            system_message=handoff.triage_agent.instructions,
+            handoffs=["issues_and_repairs"] if handoffs else [],
+            description="Greets customers and routes them to the right department.",
+        )
+        issues_and_repairs = AssistantAgent(
+            "issues_and_repairs",
+            model_client=self.model_client,
+            system_message=handoff.issues_and_repairs_agent.instructions,
+            tools=[look_up_item, execute_refund],
+            handoffs=["triage"] if handoffs else [],
+            max_tool_iterations=5,
+            description="Handles issues, repairs and refunds.",
+        )
+        return [triage, issues_and_repairs]
+
+    @staticmethod
+    def termination(participants):
+        # any agent (not the user's task message) answering in text ends the turn
+        condition = MaxMessageTermination(30)
+        for agent in participants:
+            condition |= TextMessageTermination(agent.name)
+        return condition
+
+    @abc.abstractmethod
+    def make_team(self):
+        """A new team for one conversation."""
+
+    async def conversation(self):
+        team, turns = self.make_team(), []
+        for user in USER_TURNS:
+            start = time.perf_counter()
+            await team.run(task=user)
+            turns.append(time.perf_counter() - start)
+        return turns
+
+    async def close(self):
+        await self.model_client.close()
+
+
+class AutogenSwarmRunner(AutogenRunner):
+    def make_team(self):
+        participants = self.make_agents(handoffs=True)
+        return Swarm(participants, termination_condition=self.termination(participants))
+
+
+class AutogenSelectorRunner(AutogenRunner):
+    def make_team(self):
+        participants = self.make_agents(handoffs=False)
+        return SelectorGroupChat(
+            participants,
+            model_client=self.model_client,
+            termination_condition=self.termination(participants),
+            allow_repeated_speaker=True,  # otherwise the choice between two agents never reaches the model
+        )
+
+
+class AutogenRoundRobinRunner(AutogenRunner):
+    def make_team(self):
+        participants = self.make_agents(handoffs=False)
+        return RoundRobinGroupChat(participants, termination_condition=self.termination(participants))
+
+
+class AgentsSdkRunner:
+    """``Runner.run`` from the OpenAI Agents SDK over Chat Completions."""
+
+    def __init__(self, url):
+        self.client = AsyncOpenAI(api_key="mock", base_url=url)
+        model = agents_sdk.OpenAIChatCompletionsModel(model="gpt-4o", openai_client=self.client)
+        issues_and_repairs = agents_sdk.Agent(
+            name="Issues and Repairs Agent",
+            instructions=handoff.issues_and_repairs_agent.instructions,
+            tools=[agents_sdk.function_tool(look_up_item), agents_sdk.function_tool(execute_refund)],
+            model=model,
+        )
+        self.triage = agents_sdk.Agent(
+            name="Triage Agent",
+            instructions=handoff.triage_agent.instructions,
+            handoffs=[agents_sdk.handoff(issues_and_repairs, tool_name_override="transfer_to_issues_and_repairs")],
+            model=model,
+        )
+
+    async def conversation(self):
+        agent, history, turns = self.triage, [], []
+        for user in USER_TURNS:
+            history.append({"role": "user", "content": user})
+            start = time.perf_counter()
+            result = await agents_sdk.Runner.run(agent, history)
+            turns.append(time.perf_counter() - start)
+            agent, history = result.last_agent, result.to_input_list()
+        return turns
+
+    async def close(self):
+        await self.client.close()
+
+
+FRAMEWORKS = {
+    "swarm handoff.py (threads)": SwarmSyncRunner,
+    "swarm async_handoff.py": SwarmAsyncRunner,
+    "autogen Swarm": AutogenSwarmRunner,
+    "autogen SelectorGroupChat": AutogenSelectorRunner,
+    "autogen RoundRobinGroupChat": AutogenRoundRobinRunner,
+    "agents SDK Runner.run": AgentsSdkRunner,
+}
+
+
+# === measurements ===
+
+
+async def measure_overhead(runner_cls, url, conversations):
+    runner = runner_cls(url)
+    await runner.conversation()  # warm up connections and lazy imports
+    turns = []
+    for _ in range(conversations):
+        turns += await runner.conversation()
+
+    tracemalloc.start()
+    await runner.conversation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    await runner.close()
+    return statistics.mean(turns), peak
+
+
+async def measure_throughput(runner_cls, url, conversations, concurrency):
+    runner = runner_cls(url)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await runner.conversation()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(conversations)))
+    elapsed = time.perf_counter() - start
+    await runner.close()
+    return conversations / elapsed, statistics.median(latencies), percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frameworks", nargs="+", choices=list(FRAMEWORKS), default=list(FRAMEWORKS))
+    parser.add_argument("--latency", default="0.05", help="Mock model latency: seconds or e.g. 'normal:0.05,0.01'.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--conversations", type=int, default=100,
+                        help="Conversations per throughput run (at least the concurrency level).")
+    parser.add_argument("--overhead-conversations", type=int, default=10)
+    args = parser.parse_args()
+
+    agents_sdk.set_tracing_disabled(True)
+    # the mock echoes the requested model name, which AutoGen compares with its resolved snapshot name
+    warnings.filterwarnings("ignore", message="Resolved model mismatch")
+    responder = ScriptedResponder.load(SCRIPT)
+    instant_server = MockCompletionServer(responder=responder)
+    instant_url = instant_server.start_in_subprocess()
+    server = MockCompletionServer(latency=args.latency, responder=responder)
+    url = server.start_in_subprocess()
+
+    print("=== ORCHESTRATION OVERHEAD BENCHMARK ===")
+    print(f"ACME refund flow, {len(USER_TURNS)} user turns per conversation, mock latency {args.latency}\n")
+
+    overhead, throughput = {}, {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name in args.frameworks:
+            overhead[name] = asyncio.run(measure_overhead(FRAMEWORKS[name], instant_url, args.overhead_conversations))
+            for concurrency in args.concurrency:
+                conversations = max(args.conversations, concurrency)
+                throughput[name, concurrency] = asyncio.run(
+                    measure_throughput(FRAMEWORKS[name], url, conversations, concurrency)
+                )
+
+    server.stop_subprocess()
+    instant_server.stop_subprocess()
+
+    print(f"{'framework':<30} {'overhead/turn':>14} {'peak memory/conv':>18}")
+    for name, (per_turn, peak) in overhead.items():
+        print(f"{name:<30} {per_turn * 1000:11.2f} ms {peak / 1024:15.1f} KB")
+
+    print(f"\n{'framework':<30} {'concurrency':>11} {'conv/s':>9} {'p50':>10} {'p99':>10}")
+    for (name, concurrency), (rate, p50, p99) in throughput.items():
+        print(f"{name:<30} {concurrency:>11} {rate:9.1f} {p50 * 1000:7.0f} ms {p99 * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Speaker selection for the ``arithmetic_agent.py`` team ("turn 10 into 25"):
+the model selector against the rule fast path (``fast_selector.py``) and the
+local BFS/A* planner (``operator_planner.py``).
+
+The selector model is the mock completion server. It plays a competent but
+greedy model that doubles or halves while that doesn't overshoot, and
+otherwise steps by one. Each run stops once the target is reached, or after
+``--max-turns`` agent turns.
+
+    python src/benchmarks/planner_benchmark.py --latency 0.3 --cases 10:25 7:100 3:1000 900:5
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+import warnings
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from autogen_agentchat.conditions import FunctionalTermination, MaxMessageTermination
+from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.teams import SelectorGroupChat
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from arithmetic_agent import SELECTOR_PROMPT, make_number_agents, make_selector_rules, steps_lower_bound
+from common.mock_server import MockCompletionServer
+from fast_selector import RuleBasedSelector
+from model_clients import MOCK_MODEL_INFO
+from operator_planner import operators_of, plan, plan_selector
+
+
+def greedy_selector_responder(request):
+    """Stand-in for the selector model: read the number and target from the prompt, pick greedily."""
+    prompt = request["messages"][-1]["content"]
+    target = int(re.search(r"into (-?\d+)", prompt).group(1))
+    number = int(re.findall(r"-?\d+", prompt.rsplit("Current conversation history:", 1)[1])[-1])
+    if number < target:
+        name = "multiply_agent" if 0 < number * 2 <= target else "add_agent"
+    elif number > target:
+        name = "divide_agent" if number // 2 >= target else "subtract_agent"
+    else:
+        name = "identity_agent"
+    return {"content": name}
+
+
+def reached(target):
+    def check(messages):
+        return any(isinstance(m, TextMessage) and m.source != "user" and m.content == str(target) for m in messages)
+
+    return FunctionalTermination(check)
+
+
+async def run_case(url, mode, start, target, max_turns):
+    model_client = OpenAIChatCompletionClient(model="gpt-4o", api_key="mock", base_url=url, model_info=MOCK_MODEL_INFO)
+    agents = make_number_agents()
+    task = [
+        TextMessage(content=f"Apply the operations to turn the given number into {target}.", source="user"),
+        TextMessage(content=str(start), source="user"),
+    ]
+    termination = reached(target) | MaxMessageTermination(len(task) + max_turns)
+    begin = time.perf_counter()
+    if mode == "planner":
+        steps = plan(operators_of(agents), start, target, heuristic=steps_lower_bound(target))
+        kwargs = {"selector_func": plan_selector(steps)}
+    elif mode == "rules":
+        selector = RuleBasedSelector(agents, make_selector_rules(agents, target), allow_repeated_speaker=True)
+        kwargs = {"selector_func": selector.select, "candidate_func": selector.candidates}
+    else:
+        kwargs = {}
+    team = SelectorGroupChat(
+        agents,
+        model_client=model_client,
+        termination_condition=termination,
+        allow_repeated_speaker=True,
+        selector_prompt=SELECTOR_PROMPT,
+        **kwargs,
+    )
+    result = await team.run(task=task)
+    elapsed = time.perf_counter() - begin
+    usage = model_client.total_usage()
+    await model_client.close()
+    turns = len(result.messages) - len(task)
+    final = result.messages[-1].content
+    return turns, elapsed, usage.prompt_tokens + usage.completion_tokens, final == str(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", default=["10:25", "7:100", "3:1000", "900:5"], help="start:target pairs.")
+    parser.add_argument("--latency", default="0.3", help="Selector model latency: seconds or e.g. 'normal:0.3,0.1'.")
+    parser.add_argument("--max-turns", type=int, default=48, help="Agent turns before giving up (the demo allows 48).")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Resolved model mismatch")
+    server = MockCompletionServer(latency=args.latency, responder=greedy_selector_responder)
+    url = server.start_in_subprocess()
+
+    print("=== PLANNER BENCHMARK ===")
+    print(f"Five ArithmeticAgents in a SelectorGroupChat, selector model latency {args.latency}\n")
+    print(f"{'case':>10} {'selection':<16} {'turns':>6} {'wall':>9} {'tokens':>8} {'reached':>8}")
+    for case in args.cases:
+        start, target = map(int, case.split(":"))
+        for mode in ("model selector", "rules", "planner"):
+            turns, elapsed, tokens, ok = asyncio.run(run_case(url, mode, start, target, args.max_turns))
+            print(f"{case:>10} {mode:<16} {turns:>6} {elapsed:8.2f}s {tokens:>8} {'yes' if ok else 'no':>8}")
+
+    server.stop_subprocess()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+A burst of chat completions of mixed priority against a rate-limited mock
+server (``--rpm`` requests per minute, answering 429 with ``retry-after-ms``
+beyond that, in its own process), sent three ways:
+
+* sdk retries          straight to the server; the SDK's own retries (up to
+                       ``--max-retries``) handle the 429s
+* scheduled            through ``rate_limiter.ScheduledTransport`` with the
+                       budget configured (``RATE_LIMIT_RPM``)
+* scheduled, adopted   ... with no budget configured, learning it from the
+                       server's ``x-ratelimit-*`` headers
+
+Every request is issued at once; the mix is ``--mix`` user:selector:background.
+Reported are the 429s the server sent, requests that failed after all retries,
+how long the burst took and the median latency of each priority class.
+
+    python src/benchmarks/rate_limit_benchmark.py --requests 200 --rpm 1200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from common.http_pool import PooledTransport, pool_settings
+from common.mock_server import MockCompletionServer
+from common.rate_limiter import PRIORITY_HEADER, RateBudget, ScheduledTransport, format_rate_stats
+
+MESSAGES = [{"role": "user", "content": "Is my roadrunner trap covered by the warranty?"}]
+CLASSES = ("user", "selector", "background")
+
+
+async def drive(url, strategy, requests, mix, rpm, max_retries):
+    throttled = 0
+
+    async def count_429s(response):
+        nonlocal throttled
+        throttled += response.status_code == 429
+
+    transport = PooledTransport(**pool_settings())
+    budget = None
+    if strategy != "sdk retries":
+        budget = RateBudget(rpm=rpm if strategy == "scheduled" else 0)
+        transport = ScheduledTransport(transport, budget)
+    http_client = DefaultAsyncHttpxClient(transport=transport, event_hooks={"response": [count_429s]})
+    clients = {
+        name: AsyncOpenAI(
+            api_key="mock", base_url=url, http_client=http_client, max_retries=max_retries,
+            default_headers={PRIORITY_HEADER: name},
+        )
+        for name in CLASSES
+    }
+    kinds = [name for name, weight in zip(CLASSES, mix) for _ in range(weight)]
+    latencies = {name: [] for name in CLASSES}
+    failed = 0
+
+    async def one(i):
+        nonlocal failed
+        name = kinds[i % len(kinds)]
+        start = time.perf_counter()
+        try:
+            await clients[name].chat.completions.create(model="gpt-4o", messages=MESSAGES)
+        except openai.RateLimitError:
+            failed += 1
+            return
+        latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await transport.aclose()
+    return throttled, failed, elapsed, latencies, budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rpm", type=int, default=1200, help="The mock server's request budget.")
+    parser.add_argument("--mix", type=int, nargs=3, default=[1, 1, 2], metavar=("USER", "SELECTOR", "BACKGROUND"))
+    parser.add_argument("--max-retries", type=int, default=2, help="SDK retries per request (the SDK default is 2).")
+    parser.add_argument("--latency", default="0.05", help="Mock model latency: seconds or e.g. 'normal:0.05,0.01'.")
+    args = parser.parse_args()
+
+    print("=== RATE LIMIT BENCHMARK ===")
+    print(
+        f"{args.requests} requests at once, mix user:selector:background = {':'.join(map(str, args.mix))}, "
+        f"server limit {args.rpm} rpm, SDK max_retries={args.max_retries}\n"
+    )
+    print(f"{'strategy':<20} {'429s':>6} {'failed':>6} {'elapsed':>8} " + " ".join(f"{name + ' p50':>15}" for name in CLASSES))
+    for strategy in ("sdk retries", "scheduled", "scheduled, adopted"):
+        # a fresh server per strategy, so every run starts with a full budget
+        server = MockCompletionServer(latency=args.latency, rpm=args.rpm)
+        url = server.start_in_subprocess()
+        try:
+            throttled, failed, elapsed, latencies, budget = asyncio.run(
+                drive(url, strategy, args.requests, args.mix, args.rpm, args.max_retries)
+            )
+        finally:
+            server.stop_subprocess()
+        medians = " ".join(
+            f"{statistics.median(latencies[name]) * 1000:12.0f} ms" if latencies[name] else f"{'-':>15}" for name in CLASSES
+        )
+        print(f"{strategy:<20} {throttled:>6} {failed:>6} {elapsed:7.2f}s {medians}")
+        if budget is not None:
+            print(f"{'':<20} {format_rate_stats(budget)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Handoff turns with and without speculative execution of the handoff target.
+
+Runs ``--turns`` streamed ACME turns (``async_handoff.run_full_turn_stream``,
+scripted mock model in its own process), ``--concurrency`` at a time. Each
+turn starts at the triage agent, which hands off:
+
+* handoff         a plain ``transfer_to_issues_and_repairs`` call, so a
+                  speculated reply is committed
+* second thought  ``transfer_to_sales_agent`` followed by another transfer in
+                  the same message, so the speculated reply is discarded
+* with reason     ``transfer_with_reason(reason)``, a handoff that takes an
+                  argument, so nothing is speculated and the turn runs as usual
+
+Every turn runs with ``speculative_handoffs`` off and on. Reported per
+scenario: the time until the first token of the new agent's reply, the whole
+turn, and how many speculations were committed or discarded. The mock's
+``--latency`` is the wait before the first token and ``--token-latency`` the
+gap between streamed deltas.
+
+    python src/benchmarks/speculative_handoff_benchmark.py --turns 100 --token-latency 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI
+
+from common.mock_server import MockCompletionServer, ScriptedResponder
+from common.tracing import InMemoryCollector, install
+import async_handoff
+import handoff
+
+SCRIPT = os.path.join(SRC, "common", "scripts", "acme_refund.json")
+
+
+def transfer_with_reason(reason: str) -> handoff.Agent:
+    """Hand a refund over to issues and repairs, saying why."""
+    return handoff.issues_and_repairs_agent
+
+
+# the ACME triage agent plus a handoff tool that needs an argument
+REASONING_TRIAGE = handoff.Agent(
+    name=handoff.triage_agent.name,
+    instructions=handoff.triage_agent.instructions,
+    tools=[*handoff.triage_agent.tools, transfer_with_reason],
+)
+SCENARIOS = {
+    "handoff": (handoff.triage_agent, "My roadrunner trap is broken, I want a refund"),
+    "second thought": (handoff.triage_agent, "Actually, on second thought..."),
+    "with reason": (REASONING_TRIAGE, "Escalate this with a reason please"),
+}
+# the router names one agent, then changes its mind within the same message
+SECOND_THOUGHT = {
+    "match": {"system": "customer service bot for ACME", "last_content": "second thought"},
+    "response": {"tool_calls": [
+        {"name": "transfer_to_sales_agent", "arguments": {}},
+        {"name": "transfer_to_issues_and_repairs", "arguments": {}},
+    ]},
+}
+# the router hands off through a tool that needs an argument
+WITH_REASON = {
+    "match": {"system": "customer service bot for ACME", "last_content": "with a reason"},
+    "response": {"tool_calls": [{"name": "transfer_with_reason", "arguments": {"reason": "broken trap"}}]},
+}
+
+
+async def one_turn(semaphore, agent, user, speculate):
+    async with semaphore:
+        start = time.perf_counter()
+        first_token = None
+        async for event in async_handoff.run_full_turn_stream(
+            agent, [{"role": "user", "content": user}], speculative_handoffs=speculate
+        ):
+            if isinstance(event, async_handoff.ContentDelta) and first_token is None:
+                first_token = time.perf_counter() - start
+        return first_token, time.perf_counter() - start
+
+
+async def drive(url, agent, user, turns, concurrency, speculate):
+    async_handoff.client = AsyncOpenAI(api_key="mock", base_url=url)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(one_turn(semaphore, agent, user, speculate) for _ in range(turns)))
+    await async_handoff.client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", default="normal:0.3,0.05", help="Mock wait before the first token: seconds or e.g. 'normal:0.3,0.05'.")
+    parser.add_argument("--token-latency", default="0.02", help="Mock wait between streamed deltas, same format.")
+    args = parser.parse_args()
+
+    with open(SCRIPT, encoding="utf-8") as f:
+        rules = [SECOND_THOUGHT, WITH_REASON, *json.load(f)["rules"]]
+    server = MockCompletionServer(latency=args.latency, token_latency=args.token_latency, responder=ScriptedResponder(rules))
+    url = server.start_in_subprocess()
+    collector = install(InMemoryCollector())
+    print("=== SPECULATIVE HANDOFF BENCHMARK ===")
+    print(f"{args.turns} turns per run, concurrency {args.concurrency}, mock latency {args.latency}, token latency {args.token_latency}\n")
+    print(f"{'scenario':<16} {'speculation':<12} {'first token p50':>16} {'turn p50':>10} {'committed':>10} {'discarded':>10}")
+    try:
+        for scenario, (agent, user) in SCENARIOS.items():
+            for speculate in (False, True):
+                collector.clear()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results = asyncio.run(drive(url, agent, user, args.turns, args.concurrency, speculate))
+                outcomes = Counter(
+                    span.attributes.get("speculation.outcome") for span in collector.spans if span.name == "speculative_handoff"
+                )
+                first_tokens = [first for first, _ in results if first is not None]
+                print(
+                    f"{scenario:<16} {'on' if speculate else 'off':<12} {statistics.median(first_tokens) * 1000:13.0f} ms"
+                    f" {statistics.median(total for _, total in results) * 1000:7.0f} ms"
+                    f" {outcomes['committed']:>10} {outcomes['discarded']:>10}"
+                )
+    finally:
+        server.stop_subprocess()
+
+
+if __name__ == "__main__":
+    main()
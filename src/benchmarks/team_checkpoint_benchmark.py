@@ -0,0 +1,141 @@
+"""
+Size and speed of parking a Swarm team with ``autogen/team_checkpoint.py``,
+against saving ``team.save_state()`` as JSON (with and without zlib).
+
+The team is the four-agent customer service Swarm shape from
+``swarm_agents_demo.py``, on a ``ReplayChatCompletionClient`` so nothing calls
+a model. For each history length, a synthetic conversation is loaded into it,
+every agent's context holding the whole thread as it does in a Swarm. Save
+times include ``save_state()``. Restore times include building a fresh team and
+``load_state()``, as a server would after evicting the old one.
+
+    python src/benchmarks/team_checkpoint_benchmark.py --sizes 10 100 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "autogen"))
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.conditions import HandoffTermination, TextMentionTermination
+from autogen_agentchat.messages import HandoffMessage, TextMessage
+from autogen_agentchat.teams import Swarm
+from autogen_core.models import AssistantMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from team_checkpoint import checkpoint, restore
+
+MODEL_CLIENT = ReplayChatCompletionClient(
+    ["unused"],
+    model_info={"vision": False, "function_calling": True, "json_output": False, "family": "unknown", "structured_output": False},
+)
+AGENTS = {
+    "customer_service_rep": ["order_specialist", "inventory_specialist", "user"],
+    "order_specialist": ["customer_service_rep", "user"],
+    "inventory_specialist": ["customer_service_rep", "shipping_specialist", "user"],
+    "shipping_specialist": ["customer_service_rep", "user"],
+}
+
+
+def build_team():
+    agents = [
+        AssistantAgent(name, model_client=MODEL_CLIENT, handoffs=handoffs, system_message=f"You are the {name}.")
+        for name, handoffs in AGENTS.items()
+    ]
+    return Swarm(agents, termination_condition=HandoffTermination(target="user") | TextMentionTermination("TERMINATE"))
+
+
+def conversation_state(template, size):
+    """``template`` (a saved team state) with ``size`` messages in the thread and every agent's context."""
+    thread, context = [], []
+    for i in range(size):
+        if i % 2 == 0:
+            text = f"Customer message {i}: my order {1000 + i} has not arrived and I would like an update please."
+            thread.append(TextMessage(content=text, source="user").dump())
+            context.append(UserMessage(content=text, source="user").model_dump())
+        else:
+            text = f"Reply {i}: order {1000 + i} is in transit and should be delivered within 2-3 business days."
+            thread.append(TextMessage(content=text, source="customer_service_rep").dump())
+            context.append(AssistantMessage(content=text, source="customer_service_rep").model_dump())
+    thread.append(HandoffMessage(content="Transferred to user.", target="user", source="customer_service_rep").dump())
+
+    state = json.loads(json.dumps(template))
+    for name, agent_state in state["agent_states"].items():
+        if name in AGENTS:
+            agent_state["agent_state"]["llm_context"]["messages"] = context
+        else:
+            agent_state["message_thread"] = thread
+            agent_state["current_speaker"] = "customer_service_rep"
+    return state
+
+
+async def timed(repeats, func):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+async def measure(size, repeats):
+    """``{format: (bytes, save seconds, restore seconds)}``; both include AutoGen's own state handling."""
+    team = build_team()
+    await team.load_state(conversation_state(await team.save_state(), size))
+
+    async def save_json():
+        return json.dumps(await team.save_state()).encode()
+
+    async def save_zlib():
+        return zlib.compress(await save_json(), 1)
+
+    async def save_checkpoint():
+        return await checkpoint(team)
+
+    rows = {}
+    for label, save, load in (
+        ("json", save_json, json.loads),
+        ("json + zlib", save_zlib, lambda data: json.loads(zlib.decompress(data))),
+        ("team_checkpoint", save_checkpoint, None),
+    ):
+        data = await save()
+
+        async def restore_team():
+            # a server rebuilds the evicted team before loading its state
+            fresh = build_team()
+            if load is None:
+                await restore(fresh, data)
+            else:
+                await fresh.load_state(load(data))
+
+        rows[label] = (len(data), await timed(repeats, save), await timed(repeats, restore_team))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=== TEAM CHECKPOINT BENCHMARK ===")
+    print(f"4-agent Swarm, whole thread in every agent's context; median of {args.repeats}\n")
+    print(f"{'format':<18} {'messages':>8} {'size':>11} {'save':>11} {'restore':>11}")
+    for size in args.sizes:
+        for label, (size_bytes, save, restore_time) in asyncio.run(measure(size, args.repeats)).items():
+            print(
+                f"{label:<18} {size:>8} {size_bytes / 1024:8.1f} KB {save * 1000:8.2f} ms"
+                f" {restore_time * 1000:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
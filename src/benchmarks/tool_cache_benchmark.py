@@ -0,0 +1,70 @@
+"""
+Tool result caching: time spent in a slow, idempotent tool with and without
+``common.tool_cache.cached_tool``, for many concurrent conversations asking
+about a skewed (Zipf-like) set of cities.
+
+    python src/benchmarks/tool_cache_benchmark.py --conversations 500 --tool-latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.tool_cache import cached_tool
+
+CITIES = [f"city_{i}" for i in range(50)]
+
+
+def make_weather_tool(latency):
+    async def get_weather(city: str) -> str:
+        """Get the weather for a given city."""
+        await asyncio.sleep(latency)
+        return f"Weather in {city}: 75F, sunny"
+
+    return get_weather
+
+
+async def run(tool, conversations, calls_per_conversation, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+    plans = [rng.choices(CITIES, weights, k=calls_per_conversation) for _ in range(conversations)]
+
+    async def conversation(cities):
+        for city in cities:
+            await tool(city)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(cities) for cities in plans))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=4, help="Tool calls per conversation.")
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("=== TOOL CACHE BENCHMARK ===")
+    print(f"{args.conversations} concurrent conversations x {args.calls} get_weather calls, "
+          f"{args.tool_latency * 1000:.0f}ms per real call\n")
+
+    plain = make_weather_tool(args.tool_latency)
+    cached = cached_tool(ttl=600, maxsize=1024)(make_weather_tool(args.tool_latency))
+    uncached_time = asyncio.run(run(plain, args.conversations, args.calls, args.seed))
+    cached_time = asyncio.run(run(cached, args.conversations, args.calls, args.seed))
+
+    stats = cached.cache.stats()
+    total = args.conversations * args.calls
+    print(f"  uncached   {uncached_time:7.2f}s  {total} real calls")
+    print(f"  cached     {cached_time:7.2f}s  {stats['misses']} real calls, {stats['hits']} hits, "
+          f"{stats['coalesced']} coalesced in flight ({stats['hit_rate']:.0%} served without calling)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: cost of turning a model tool call's JSON arguments into kwargs.
+
+    python src/benchmarks/tool_decode_benchmark.py
+"""
+import argparse
+import inspect
+import json
+import os
+import sys
+import timeit
+from enum import Enum
+from typing import Literal, Optional
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+
+from pydantic import create_model
+
+from tool_registry import compile_tool
+
+
+class Reason(Enum):
+    DAMAGED = "damaged"
+    NOT_AS_DESCRIBED = "not_as_described"
+    OTHER = "other"
+
+
+def execute_refund(
+    item_id: str,
+    reason: Reason = Reason.OTHER,
+    quantity: int = 1,
+    notes: Optional[str] = None,
+    priority: Literal["normal", "urgent"] = "normal",
+    related_items: list[str] = [],
+):
+    """Refund an item."""
+    return "success"
+
+
+ARGUMENTS = json.dumps(
+    {
+        "item_id": "item_132612938",
+        "reason": "damaged",
+        "quantity": 2,
+        "notes": "Arrived with a dented spring.",
+        "priority": "urgent",
+        "related_items": ["item_1", "item_2"],
+    }
+)
+
+
+def pydantic_model_for(func):
+    fields = {
+        name: (param.annotation, ... if param.default is inspect.Parameter.empty else param.default)
+        for name, param in inspect.signature(func).parameters.items()
+    }
+    return create_model(f"{func.__name__}_args", **fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    decode = compile_tool(execute_refund).decode
+    prebuilt_model = pydantic_model_for(execute_refund)
+
+    candidates = {
+        "json.loads only (no checks)": lambda: json.loads(ARGUMENTS),
+        "compiled decoder": lambda: decode(ARGUMENTS),
+        "pydantic, prebuilt model": lambda: dict(prebuilt_model.model_validate_json(ARGUMENTS)),
+        "pydantic, model per call": lambda: dict(pydantic_model_for(execute_refund).model_validate_json(ARGUMENTS)),
+    }
+
+    print("=== TOOL ARGUMENT DECODING BENCHMARK ===")
+    print(f"execute_refund with {len(json.loads(ARGUMENTS))} typed arguments\n")
+    for label, run in candidates.items():
+        iterations = args.iterations if "per call" not in label else args.iterations // 20
+        per_call = timeit.timeit(run, number=iterations) / iterations
+        print(f"  {label:<30} {per_call * 1e6:9.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark: per-round-trip tool overhead of an agent with many tools.
+
+Compares rebuilding schemas/dispatch maps on every model call (the original loop)
+with the per-agent ``ToolTable`` cache, first for request preparation alone and
+then end-to-end against the mock completion server with zero model latency.
+
+    python src/benchmarks/tool_schema_benchmark.py --tools 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI
+
+from common.mock_server import MockCompletionServer
+from tool_registry import CompiledTool, get_tool_table
+import async_handoff
+from handoff import Agent
+
+TOOL_TEMPLATE = '''
+def lookup_{i}(query: str, limit: int = 10, include_archived: bool = False, region="us"):
+    """Look up records in catalogue {i}.
+    Query can be a description or keywords."""
+    return "record_{i}"
+'''
+
+
+def make_tools(count):
+    namespace = {}
+    for i in range(count):
+        exec(TOOL_TEMPLATE.format(i=i), namespace)
+    return [namespace[f"lookup_{i}"] for i in range(count)]
+
+
+HISTORY = [
+    {"role": "user", "content": "I need the item ID for my roadrunner trap."},
+    {"role": "assistant", "content": "Sure, let me look that up."},
+    {"role": "user", "content": "It's the spring-loaded one."},
+]
+
+
+def legacy_prepare(agent):
+    tool_schemas = [CompiledTool(tool).schema for tool in agent.tools]
+    tools = {tool.__name__: tool for tool in agent.tools}
+    body = json.dumps(
+        {
+            "model": agent.model,
+            "messages": [{"role": "system", "content": agent.instructions}] + HISTORY,
+            "tools": tool_schemas,
+        }
+    )
+    return tools, body
+
+
+def cached_prepare(agent):
+    tool_table = get_tool_table(agent)
+    return tool_table.functions, async_handoff.encode_chat_request(agent, HISTORY, tool_table)
+
+
+async def round_trips(client, agent, count, cached):
+    start = time.perf_counter()
+    for _ in range(count):
+        if cached:
+            tool_table = get_tool_table(agent)
+            await client.post(
+                "/chat/completions",
+                body=async_handoff.encode_chat_request(agent, HISTORY, tool_table),
+                cast_to=async_handoff.ChatCompletion,
+            )
+        else:
+            await client.chat.completions.create(
+                model=agent.model,
+                messages=[{"role": "system", "content": agent.instructions}] + HISTORY,
+                tools=[CompiledTool(tool).schema for tool in agent.tools],
+            )
+    return (time.perf_counter() - start) / count
+
+
+async def end_to_end(url, agent, count):
+    client = AsyncOpenAI(api_key="mock", base_url=url)
+    await round_trips(client, agent, 10, cached=True)  # open the connection first
+    legacy = await round_trips(client, agent, count, cached=False)
+    cached = await round_trips(client, agent, count, cached=True)
+    await client.close()
+    return legacy, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--round-trips", type=int, default=300)
+    args = parser.parse_args()
+
+    agent = Agent(name="Catalogue Agent", tools=make_tools(args.tools))
+
+    print("=== TOOL SCHEMA OVERHEAD BENCHMARK ===")
+    print(f"{args.tools} tools per agent\n")
+
+    legacy = timeit.timeit(lambda: legacy_prepare(agent), number=args.iterations) / args.iterations
+    cached = timeit.timeit(lambda: cached_prepare(agent), number=args.iterations) / args.iterations
+    print("Request preparation per model call:")
+    print(f"  rebuild every call   {legacy * 1e6:9.1f} us")
+    print(f"  cached ToolTable     {cached * 1e6:9.1f} us  ({legacy / cached:.1f}x faster)")
+
+    server = MockCompletionServer()
+    url = server.start_in_subprocess()
+    legacy, cached = asyncio.run(end_to_end(url, agent, args.round_trips))
+    server.stop_subprocess()
+    print("\nClient-side cost per round-trip against the mock server (0ms model latency):")
+    print(f"  SDK create + rebuild {legacy * 1e3:9.2f} ms")
+    print(f"  cached ToolTable     {cached * 1e3:9.2f} ms  ({legacy / cached:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
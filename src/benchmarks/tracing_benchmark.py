@@ -0,0 +1,112 @@
+"""
+Cost of tracing the Swarm loop, and where the time of a turn goes under load.
+
+Runs ``--conversations`` ACME refund conversations (``async_handoff.run_full_turn``,
+scripted mock model in its own process, so every turn has model requests, tool
+calls and a handoff), ``--concurrency`` at a time:
+
+* tracing off     the OpenTelemetry no-op tracer, as when no provider is installed
+* tracing on      ``common/tracing.py`` provider with an ``InMemoryCollector``
+
+alternately, ``--repeats`` times each, keeping each mode's fastest run. It then breaks the traced
+runs down by span kind and shows the trace of one turn.
+
+    python src/benchmarks/tracing_benchmark.py --conversations 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from opentelemetry import trace
+
+from common.http_pool import PooledTransport, pool_settings
+from common.mock_server import MockCompletionServer, ScriptedResponder
+from common.tracing import InMemoryCollector, TracingTransport, install
+import async_handoff
+import handoff
+
+SCRIPT = os.path.join(SRC, "common", "scripts", "acme_refund.json")
+USER_TURNS = ["I want a refund for my roadrunner trap, it broke", "yes refund please"]
+
+
+async def conversation(semaphore, turn_latencies):
+    async with semaphore:
+        agent, messages = handoff.triage_agent, []
+        for user in USER_TURNS:
+            messages.append({"role": "user", "content": user})
+            start = time.perf_counter()
+            response = await async_handoff.run_full_turn(agent, messages)
+            turn_latencies.append(time.perf_counter() - start)
+            agent = response.agent
+            messages.extend(response.messages)
+
+
+def use_tracer(tracer):
+    handoff.tracer = async_handoff.tracer = tracer
+
+
+async def drive(url, conversations, concurrency, tracer):
+    use_tracer(tracer)
+    # the shared stack's layers that matter here: tracing around a pooled transport
+    http_client = DefaultAsyncHttpxClient(transport=TracingTransport(PooledTransport(**pool_settings()), tracer))
+    async_handoff.client = AsyncOpenAI(api_key="mock", base_url=url, http_client=http_client)
+    semaphore = asyncio.Semaphore(concurrency)
+    turn_latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(semaphore, turn_latencies) for _ in range(conversations)))
+    elapsed = time.perf_counter() - start
+    await async_handoff.client.close()
+    return elapsed, turn_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per mode; the fastest is reported.")
+    parser.add_argument("--latency", default="normal:0.05,0.01", help="Mock model latency: seconds or e.g. 'normal:0.05,0.01'.")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(latency=args.latency, responder=ScriptedResponder.load(SCRIPT))
+    url = server.start_in_subprocess()
+    print("=== TRACING BENCHMARK ===")
+    print(f"{args.conversations} conversations of {len(USER_TURNS)} turns, concurrency {args.concurrency}, mock latency {args.latency}\n")
+    print(f"{'run':<14} {'turns/s':>8} {'turn p50':>10} {'turn p99':>10}")
+    collector = install(InMemoryCollector())
+    tracers = {"tracing off": trace.NoOpTracer(), "tracing on": trace.get_tracer(__name__)}
+    runs = {label: [] for label in tracers}
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            # throughput varies run to run by more than tracing costs: interleave the
+            # modes and keep each one's fastest run
+            for _ in range(args.repeats):
+                for label, tracer in tracers.items():
+                    runs[label].append(asyncio.run(drive(url, args.conversations, args.concurrency, tracer)))
+    finally:
+        server.stop_subprocess()
+    for label, results in runs.items():
+        elapsed, latencies = min(results, key=lambda run: run[0])
+        ordered = sorted(latencies)
+        print(
+            f"{label:<14} {len(latencies) / elapsed:8.1f} {statistics.median(ordered) * 1000:7.1f} ms"
+            f" {ordered[int(len(ordered) * 0.99)] * 1000:7.1f} ms"
+        )
+
+    print(f"\n{len(collector.spans)} spans recorded over {args.repeats} traced runs\n")
+    print(collector.format_summary())
+    print("\nOne turn:")
+    print(collector.format_tree())
+
+
+if __name__ == "__main__":
+    main()
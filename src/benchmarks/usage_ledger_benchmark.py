@@ -0,0 +1,131 @@
+"""
+Cost of charging every model call to the usage ledger, and what the ledger reports.
+
+Runs ``--conversations`` ACME refund conversations (``async_handoff.run_full_turn``,
+scripted mock model in its own process), ``--concurrency`` at a time, each in
+its own ``usage_scope``:
+
+* ledger off      the pooled transport alone
+* ledger on       ``usage_ledger.LedgerTransport`` in front of it
+
+alternately, ``--repeats`` times each, keeping each mode's fastest run. Then it
+times ``UsageLedger.record`` on its own from ``--threads`` threads, and prints
+the ledger's report by agent and the spend of the costliest conversations.
+
+    python src/benchmarks/usage_ledger_benchmark.py --conversations 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "swarm"))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from common.http_pool import PooledTransport, pool_settings
+from common.mock_server import MockCompletionServer, ScriptedResponder
+from common.usage_ledger import LedgerTransport, UsageLedger, usage_scope
+import async_handoff
+import handoff
+
+SCRIPT = os.path.join(SRC, "common", "scripts", "acme_refund.json")
+USER_TURNS = ["I want a refund for my roadrunner trap, it broke", "yes refund please"]
+
+
+async def conversation(index, semaphore, turn_latencies):
+    async with semaphore:
+        with usage_scope(conversation=f"refund-{index:04d}"):
+            agent, messages = handoff.triage_agent, []
+            for user in USER_TURNS:
+                messages.append({"role": "user", "content": user})
+                start = time.perf_counter()
+                response = await async_handoff.run_full_turn(agent, messages)
+                turn_latencies.append(time.perf_counter() - start)
+                agent = response.agent
+                messages.extend(response.messages)
+
+
+async def drive(url, conversations, concurrency, ledger):
+    transport = PooledTransport(**pool_settings())
+    if ledger is not None:
+        transport = LedgerTransport(transport, ledger)
+    async_handoff.client = AsyncOpenAI(api_key="mock", base_url=url, http_client=DefaultAsyncHttpxClient(transport=transport))
+    semaphore = asyncio.Semaphore(concurrency)
+    turn_latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i, semaphore, turn_latencies) for i in range(conversations)))
+    elapsed = time.perf_counter() - start
+    await async_handoff.client.close()
+    return elapsed, turn_latencies
+
+
+def record_rate(threads, per_thread):
+    """``UsageLedger.record`` calls per second with ``threads`` threads charging 8 conversations."""
+    ledger = UsageLedger()
+
+    def charge(worker):
+        for i in range(per_thread):
+            ledger.record("gpt-4o-mini", 500, 50, 0.2, conversation=f"c{i % 8}", agent=f"agent-{worker % 4}")
+
+    workers = [threading.Thread(target=charge, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per mode; the fastest is reported.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the record() micro-benchmark.")
+    parser.add_argument("--latency", default="normal:0.05,0.01", help="Mock model latency: seconds or e.g. 'normal:0.05,0.01'.")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(latency=args.latency, responder=ScriptedResponder.load(SCRIPT))
+    url = server.start_in_subprocess()
+    print("=== USAGE LEDGER BENCHMARK ===")
+    print(f"{args.conversations} conversations of {len(USER_TURNS)} turns, concurrency {args.concurrency}, mock latency {args.latency}\n")
+    print(f"{'run':<14} {'turns/s':>8} {'turn p50':>10} {'turn p99':>10}")
+    runs = {"ledger off": [], "ledger on": []}
+    ledger = None
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            # interleave the modes and keep each one's fastest run; run-to-run noise is larger than the ledger
+            for _ in range(args.repeats):
+                for label in runs:
+                    ledger = UsageLedger() if label == "ledger on" else None
+                    runs[label].append(asyncio.run(drive(url, args.conversations, args.concurrency, ledger)))
+    finally:
+        server.stop_subprocess()
+    for label, results in runs.items():
+        elapsed, latencies = min(results, key=lambda run: run[0])
+        ordered = sorted(latencies)
+        print(
+            f"{label:<14} {len(latencies) / elapsed:8.1f} {statistics.median(ordered) * 1000:7.1f} ms"
+            f" {ordered[int(len(ordered) * 0.99)] * 1000:7.1f} ms"
+        )
+
+    print(f"\nUsageLedger.record from {args.threads} threads: {record_rate(args.threads, 20_000):,.0f} calls/s")
+
+    print("\nLast run, by agent (tool time comes from tool spans, so it is absent here without tracing):")
+    print(ledger.format_report("agent", "model"))
+    print("\nCostliest conversations:")
+    conversations = sorted(ledger.aggregate("conversation").items(), key=lambda item: -item[1]["cost_usd"])
+    for (name,), group in conversations[:3]:
+        print(f"  {name}: {group['input_tokens'] + group['output_tokens']} tokens, ${group['cost_usd']:.5f}, {group['requests']} calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared helpers used by the framework demos and benchmarks under ``src/``."""
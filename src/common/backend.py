@@ -0,0 +1,92 @@
+"""
+Pick the model backend for every demo from the environment.
+
+    MODEL_BACKEND=openai   # default: api.openai.com with OPENAI_API_KEY
+    MODEL_BACKEND=azure    # Azure OpenAI with API_KEY, ENDPOINT, API_VERSION, DEPLOYMENT_NAME
+    MODEL_BACKEND=mock     # common/mock_server.py; no network or key needed
+
+With the mock backend, ``MOCK_SERVER_URL`` points at an already running server
+(``python src/common/mock_server.py --script acme.json``). If it is unset, a
+server is started in a background thread on first use and configured from
+``MOCK_LATENCY``, ``MOCK_TOKEN_LATENCY`` and ``MOCK_SCRIPT``.
+
+Every client shares one pooled HTTP transport (``common/http_pool.py``).
+``COMPLETION_CACHE=auto|record|replay`` puts every backend behind the
+completion cache in ``common/completion_cache.py``.
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
+
+from common.http_pool import shared_http_client
+from common.mock_server import MockCompletionServer, ScriptedResponder, default_responder
+
+load_dotenv()
+
+BACKENDS = ("openai", "azure", "mock")
+
+_mock_server = None
+_mock_server_lock = threading.Lock()
+
+
+def get_backend(default="openai"):
+    backend = os.getenv("MODEL_BACKEND", default).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"MODEL_BACKEND must be one of {', '.join(BACKENDS)}, got {backend!r}")
+    return backend
+
+
+def mock_server_url():
+    """URL of the mock completion server, starting a local one if none is configured."""
+    global _mock_server
+    url = os.getenv("MOCK_SERVER_URL")
+    if url:
+        return url
+    with _mock_server_lock:
+        if _mock_server is None:
+            script = os.getenv("MOCK_SCRIPT")
+            _mock_server = MockCompletionServer(
+                latency=os.getenv("MOCK_LATENCY", "0"),
+                token_latency=os.getenv("MOCK_TOKEN_LATENCY", "0"),
+                responder=ScriptedResponder.load(script) if script else default_responder,
+            )
+            _mock_server.start_in_thread()
+    return _mock_server.url
+
+
+def backend_url(backend=None):
+    """Base URL of the configured backend's endpoint, e.g. for ``http_pool.warm_up``."""
+    backend = backend or get_backend()
+    if backend == "mock":
+        return mock_server_url()
+    if backend == "azure":
+        return os.getenv("ENDPOINT")
+    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+
+def create_openai_client(async_client=False, backend=None, **kwargs):
+    """Return an OpenAI SDK client (sync or async) for the configured backend.
+
+    Extra keyword arguments are passed to the client constructor, e.g.
+    ``max_retries``. Unless ``http_client`` is given, the client uses the
+    process-wide pooled one from ``common/http_pool.py``.
+    """
+    backend = backend or get_backend()
+    if "http_client" not in kwargs:
+        kwargs["http_client"] = shared_http_client(async_client)
+    if backend == "mock":
+        cls = AsyncOpenAI if async_client else OpenAI
+        return cls(api_key="mock", base_url=mock_server_url(), **kwargs)
+    if backend == "azure":
+        cls = AsyncAzureOpenAI if async_client else AzureOpenAI
+        return cls(
+            api_key=os.getenv("API_KEY"),
+            api_version=os.getenv("API_VERSION"),
+            azure_endpoint=os.getenv("ENDPOINT"),
+            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
+            **kwargs,
+        )
+    cls = AsyncOpenAI if async_client else OpenAI
+    return cls(api_key=os.getenv("OPENAI_API_KEY"), **kwargs)
@@ -0,0 +1,218 @@
+"""
+Run thousands of scripted conversations from JSONL through any agent framework.
+
+Each input line is one conversation with an ``id`` and whatever the target
+needs (usually ``"turns"``: a list of user messages)::
+
+    {"id": "refund-0001", "turns": ["Hi", "My trap is broken", "I want a refund"]}
+
+A target is an ``async def run_conversation(record) -> result`` function. Up to
+``concurrency`` conversations run at once on a bounded pool of asyncio
+workers, and each finished conversation is appended to the output JSONL and
+flushed immediately::
+
+    {"id": "refund-0001", "status": "ok", "elapsed": 0.41, "result": {...}}
+
+Model calls made by a conversation are charged to its id in the usage ledger
+(``common/usage_ledger.py``); with ``USAGE_LEDGER=on`` each result also
+carries ``"usage": {"tokens": ..., "cost_usd": ...}``.
+
+Rerunning with the same output file skips every id already recorded as
+``ok``, so a crashed or interrupted batch resumes where it stopped and failed
+conversations are retried. With ``processes > 1`` the input is sharded by a
+stable hash of the id; every process writes its own part file, and the parts
+are merged into the output once all shards finish.
+
+Usage:
+    from common.batch_runner import run_batch
+    run_batch("conversations.jsonl", "results.jsonl", run_conversation, concurrency=64, processes=4)
+"""
+import asyncio
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import zlib
+
+from common.usage_ledger import conversation_usage, usage_scope
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def shard_of(conversation_id, shards):
+    """Stable shard index for an id (unlike ``hash()``, the same in every process)."""
+    return zlib.crc32(str(conversation_id).encode()) % shards
+
+
+def part_path(output_path, shard, shards):
+    return f"{output_path}.part{shard}-of-{shards}"
+
+
+def completed_ids(output_path):
+    """Ids recorded as ``ok`` in the output and in any part files left by a crashed sharded run."""
+    done = set()
+    for path in [output_path, *glob.glob(f"{glob.escape(output_path)}.part*")]:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the crash; that conversation simply runs again
+                if record.get("status") == "ok":
+                    done.add(record["id"])
+    return done
+
+
+async def run_conversations(records, output, run_conversation, concurrency=32):
+    """Run ``records`` with at most ``concurrency`` in flight, writing results to ``output``.
+
+    ``records`` is consumed lazily through a bounded queue, so the input can be
+    far larger than memory. Returns ``(ok, failed)`` counts.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"ok": 0, "error": 0}
+
+    async def worker():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            start = time.perf_counter()
+            try:
+                with usage_scope(conversation=record["id"]):
+                    result = {"status": "ok", "result": await run_conversation(record)}
+            except (Exception, SystemExit) as e:  # some demo tools call exit() to end a session
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            result = {"id": record["id"], **result, "elapsed": round(time.perf_counter() - start, 4)}
+            usage = conversation_usage(record["id"])
+            if usage is not None:
+                result["usage"] = usage
+            counts[result["status"]] += 1
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for record in records:
+            await queue.put(record)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return counts["ok"], counts["error"]
+
+
+def _truncate_torn_line(path):
+    """Cut a half-written last line left by a crash, so appended results start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def _run_shard(input_path, output_path, run_conversation, concurrency, shard, shards, done):
+    _truncate_torn_line(output_path)
+    records = (
+        record
+        for record in read_jsonl(input_path)
+        if record["id"] not in done and (shards == 1 or shard_of(record["id"], shards) == shard)
+    )
+    with open(output_path, "a", encoding="utf-8") as output:
+        return asyncio.run(run_conversations(records, output, run_conversation, concurrency))
+
+
+def _shard_process(input_path, output_path, run_conversation, concurrency, shard, shards, done):
+    try:
+        _run_shard(input_path, part_path(output_path, shard, shards), run_conversation, concurrency, shard, shards, done)
+    except BaseException:
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def _merge_parts(output_path):
+    _truncate_torn_line(output_path)
+    with open(output_path, "a", encoding="utf-8") as output:
+        for path in sorted(glob.glob(f"{glob.escape(output_path)}.part*")):
+            with open(path, encoding="utf-8") as part:
+                for line in part:
+                    if line.endswith("\n"):  # drop a torn last line; its conversation reruns next time
+                        output.write(line)
+            os.remove(path)
+
+
+def run_batch(input_path, output_path, run_conversation, concurrency=32, processes=1):
+    """Run every not-yet-completed conversation in ``input_path`` and return a summary dict."""
+    done = completed_ids(output_path)
+    # results from an interrupted sharded run are kept before new shards start
+    _merge_parts(output_path)
+    start = time.perf_counter()
+
+    if processes <= 1:
+        ok, failed = _run_shard(input_path, output_path, run_conversation, concurrency, 0, 1, done)
+    else:
+        workers = [
+            multiprocessing.Process(
+                target=_shard_process,
+                args=(input_path, output_path, run_conversation, concurrency, shard, processes, done),
+                name=f"batch-shard-{shard}",
+            )
+            for shard in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        parts = sorted(glob.glob(f"{glob.escape(output_path)}.part*"))
+        ok = failed = 0
+        for path in parts:
+            for record in read_jsonl(path):
+                ok += record["status"] == "ok"
+                failed += record["status"] != "ok"
+        _merge_parts(output_path)
+
+    return {
+        "skipped": len(done),
+        "ok": ok,
+        "failed": failed,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def main(run_conversation, description=None, argv=None):
+    """Command line front end; targets call this from their ``__main__`` block."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description or __doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one conversation per line.")
+    parser.add_argument("output", help="JSONL results file; appended to, and used to resume.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Conversations in flight per process.")
+    parser.add_argument("--processes", type=int, default=1, help="Shard the input across this many processes.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agents' own printing (off by default).")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        summary = run_batch(args.input, args.output, run_conversation, args.concurrency, args.processes)
+    rate = summary["ok"] / summary["elapsed"] if summary["elapsed"] else 0.0
+    print(
+        f"{summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} already done "
+        f"in {summary['elapsed']:.1f}s ({rate:.1f} conv/s) -> {args.output}"
+    )
+    return summary
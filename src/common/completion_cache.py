@@ -0,0 +1,292 @@
+"""
+Content-addressed cache of chat completions for deterministic replays.
+
+The cache sits in the HTTP layer of the OpenAI SDK (``CachingTransport``), so
+the Swarm loops, the AutoGen model clients and the Agents SDK share one store,
+and streamed replies replay byte-for-byte. A request's key covers everything
+in its body: model, messages, tools, tool_choice, sampling parameters and
+``stream``.
+
+    COMPLETION_CACHE=auto     # serve hits, call the model on misses and store them
+    COMPLETION_CACHE=record   # always call the model and (over)write the entry
+    COMPLETION_CACHE=replay   # never call the model; a miss fails the request
+    COMPLETION_CACHE_DIR=.completion_cache
+    COMPLETION_CACHE_MAX_MB=512
+
+Keys are chained over the messages (``h_i = sha256(h_{i-1} + message_i)``), and
+every recorded prefix digest is kept. A replay miss is answered with an HTTP 400
+(which the SDK raises as ``BadRequestError`` without retrying). Its message
+names the first message where the conversation left the recorded path.
+
+Entries are one JSON file each, written atomically. Once the store exceeds its
+size bound, the least recently used entries are evicted.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+
+MODES = ("off", "auto", "record", "replay")
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".completion_cache")
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def request_digests(body):
+    """Return ``(key, prefix_digests)`` for a chat completion request body.
+
+    ``prefix_digests[i]`` identifies the request parameters plus
+    ``messages[:i + 1]``. The key also covers ``stream``, because streamed and
+    plain responses are stored in different formats.
+    """
+    head = {name: value for name, value in body.items() if name != "messages"}
+    digest = hashlib.sha256(_canonical(head).encode()).digest()
+    prefixes = []
+    for message in body.get("messages", []):
+        digest = hashlib.sha256(digest + _canonical(message).encode()).digest()
+        prefixes.append(digest.hex())
+    return (prefixes[-1] if prefixes else digest.hex()), prefixes
+
+
+class CompletionStore:
+    """On-disk, size-bounded, LRU-evicted map from request key to recorded response."""
+
+    PREFIX_FILE = "prefixes.txt"
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=512 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (size, last_used)
+        self._prefixes = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self):
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    self._entries[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+                    self.total_bytes += stat.st_size
+        prefix_path = os.path.join(self.directory, self.PREFIX_FILE)
+        if os.path.exists(prefix_path):
+            with open(prefix_path, encoding="ascii") as f:
+                self._prefixes.update(line.strip() for line in f)
+
+    def get(self, key):
+        """The recorded ``{"status", "headers", "body"}`` for ``key``, or None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            size = self._entries.get(key, (0, 0))[0]
+            self._entries[key] = (size, now)
+        try:
+            os.utime(self._path(key), (now, now))  # mtime doubles as the LRU clock across runs
+        except OSError:
+            pass
+        return record
+
+    def put(self, key, prefixes, status, headers, body):
+        record = {
+            "status": status,
+            "headers": headers,
+            "body": base64.b64encode(body).decode("ascii"),
+            "created": time.time(),
+        }
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(record).encode()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            old_size = self._entries.get(key, (0, 0))[0]
+            self._entries[key] = (len(data), time.time())
+            self.total_bytes += len(data) - old_size
+            new_prefixes = [digest for digest in prefixes if digest not in self._prefixes]
+            self._prefixes.update(new_prefixes)
+            if new_prefixes:
+                with open(os.path.join(self.directory, self.PREFIX_FILE), "a", encoding="ascii") as f:
+                    f.write("".join(f"{digest}\n" for digest in new_prefixes))
+            self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._entries[key]
+            self.total_bytes -= size
+
+    def recorded_prefix_length(self, prefixes):
+        """How many leading messages of a request match some recorded request."""
+        length = 0
+        for digest in prefixes:
+            if digest not in self._prefixes:
+                break
+            length += 1
+        return length
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass a response body through while keeping a copy; store it once it is complete."""
+
+    def __init__(self, stream, on_complete):
+        self._stream = stream
+        self._chunks = []
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(self._chunks))
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(self._chunks))
+
+    def close(self):
+        self._stream.close()
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class CachingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport caching ``POST .../chat/completions`` in a ``CompletionStore``.
+
+    Wraps a sync or async transport (whichever the client uses); every other
+    request passes straight through.
+    """
+
+    def __init__(self, transport, store, mode="auto"):
+        if mode not in MODES:
+            raise ValueError(f"Completion cache mode must be one of {', '.join(MODES)}, got {mode!r}")
+        self.transport = transport
+        self.store = store
+        self.mode = mode
+
+    def _lookup(self, request):
+        if self.mode == "off" or request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return None, None, None
+        key, prefixes = request_digests(json.loads(request.content or b"{}"))
+        if self.mode == "record":
+            return key, prefixes, None
+        record = self.store.get(key)
+        if record is None and self.mode == "replay":
+            # an exception here would be retried by the SDK as a connection error
+            matched = self.store.recorded_prefix_length(prefixes)
+            message = (
+                f"Completion cache miss in replay mode: no recording of this request ({len(prefixes)} messages). "
+                f"Its first {matched} messages match a recording, so the conversation diverged at message {matched + 1}."
+            )
+            record = {
+                "status": 400,
+                "headers": {"content-type": "application/json"},
+                "body": base64.b64encode(
+                    json.dumps({"error": {"message": message, "type": "completion_cache_miss"}}).encode()
+                ).decode("ascii"),
+            }
+        return key, prefixes, record
+
+    @staticmethod
+    def _replay(request, record):
+        return httpx.Response(
+            record["status"],
+            headers={**record["headers"], "x-completion-cache": "hit"},
+            content=base64.b64decode(record["body"]),
+            request=request,
+        )
+
+    def _record(self, response, key, prefixes):
+        headers = {name: response.headers[name] for name in ("content-type",) if name in response.headers}
+
+        def store(body):
+            self.store.put(key, prefixes, response.status_code, headers, body)
+
+        response.stream = _RecordingStream(response.stream, store)
+        return response
+
+    def handle_request(self, request):
+        key, prefixes, record = self._lookup(request)
+        if record is not None:
+            return self._replay(request, record)
+        response = self.transport.handle_request(request)
+        if key is not None and response.status_code == 200:
+            response = self._record(response, key, prefixes)
+        return response
+
+    async def handle_async_request(self, request):
+        key, prefixes, record = self._lookup(request)
+        if record is not None:
+            return self._replay(request, record)
+        response = await self.transport.handle_async_request(request)
+        if key is not None and response.status_code == 200:
+            response = self._record(response, key, prefixes)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def cache_mode():
+    mode = os.getenv("COMPLETION_CACHE", "off").strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"COMPLETION_CACHE must be one of {', '.join(MODES)}, got {mode!r}")
+    return mode
+
+
+def get_store():
+    """The process-wide store for ``COMPLETION_CACHE_DIR``."""
+    directory = os.path.abspath(os.getenv("COMPLETION_CACHE_DIR", DEFAULT_DIRECTORY))
+    with _stores_lock:
+        if directory not in _stores:
+            max_bytes = int(float(os.getenv("COMPLETION_CACHE_MAX_MB", "512")) * 1024 * 1024)
+            _stores[directory] = CompletionStore(directory, max_bytes)
+        return _stores[directory]
@@ -0,0 +1,267 @@
+"""
+Persistent conversation storage: one append-only, segmented log per session.
+
+Every session (addressed by any string ID but "", "." and "..") is a directory under the
+log root. It holds:
+
+    00000000.log, 00000001.log ...   message records, one per line, appended
+    index.bin                        fixed-size entries, memory-mapped
+
+Index entry ``i`` gives message ``i``'s segment, offset and length, its role
+code and the running token total up to and including it. Reading any window
+is therefore a couple of reads, no matter how long the session is.
+Token budgets are O(log n) bisections over the mapped index. Nothing but the
+index pages the OS chooses to cache stays in memory, so an idle session
+costs almost nothing, and a restarted process picks every session up again
+by its ID:
+
+    log = ConversationLog(".conversations")
+    session = log.session("customer-42")
+    session.append(b'{"role": "user", "content": "Hi"}', role=0, tokens=9)
+    session.read_range(len(session) - 20, len(session))
+
+Records are written before their index entry, so a crash can at worst lose
+the message being appended. Pass ``sync=True`` to fsync every append (slower,
+but it survives power loss too). Each session must have a single writer at a
+time; the log is not safe for several processes appending to one session.
+"""
+import mmap
+import os
+import shutil
+import struct
+import threading
+from collections.abc import Sequence
+from urllib.parse import quote, unquote
+
+INDEX_FILE = "index.bin"
+MAGIC = b"CLOGIDX1"
+HEADER = struct.Struct("<8sQ")  # magic, message count
+ENTRY = struct.Struct("<QIIqB7x")  # offset, length, segment, cumulative tokens, role
+INITIAL_CAPACITY = 1024
+BINARY = getattr(os, "O_BINARY", 0)  # Windows would translate newlines otherwise
+
+
+class SessionLog:
+    """The on-disk messages of one session; see the module docstring."""
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, sync=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._read_fds = {}  # segment -> fd
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, INDEX_FILE)
+        self._index_fd = os.open(path, os.O_RDWR | os.O_CREAT | BINARY, 0o644)
+        if os.fstat(self._index_fd).st_size < HEADER.size:
+            os.ftruncate(self._index_fd, HEADER.size + INITIAL_CAPACITY * ENTRY.size)
+            os.write(self._index_fd, HEADER.pack(MAGIC, 0))
+        self._index = mmap.mmap(self._index_fd, 0)
+        magic, self._count = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a conversation log index")
+        self._count = min(self._count, self._capacity())
+
+        if self._count:
+            _, _, self._segment, self._tokens, _ = self._entry(self._count - 1)
+        else:
+            self._segment, self._tokens = 0, 0
+        self._write_fd = self._open_segment(self._segment)
+        self._write_offset = os.lseek(self._write_fd, 0, os.SEEK_END)
+
+    def _capacity(self):
+        return (len(self._index) - HEADER.size) // ENTRY.size
+
+    def _entry(self, index):
+        return ENTRY.unpack_from(self._index, HEADER.size + index * ENTRY.size)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{segment:08d}.log")
+
+    def _open_segment(self, segment):
+        return os.open(self._segment_path(segment), os.O_RDWR | os.O_CREAT | os.O_APPEND | BINARY, 0o644)
+
+    def _read_fd(self, segment):
+        if segment == self._segment:
+            return self._write_fd
+        fd = self._read_fds.get(segment)
+        if fd is None:
+            fd = self._read_fds[segment] = os.open(self._segment_path(segment), os.O_RDONLY | BINARY)
+        return fd
+
+    def _pread(self, segment, length, offset):
+        # os.pread is POSIX only; callers hold the lock, so seeking the shared fd is safe
+        fd = self._read_fd(segment)
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, length)
+
+    def _grow_index(self):
+        # mmap.resize is not supported everywhere (macOS), so extend the file and map it again
+        capacity = self._capacity()
+        self._index.close()
+        os.ftruncate(self._index_fd, HEADER.size + 2 * capacity * ENTRY.size)
+        self._index = mmap.mmap(self._index_fd, 0)
+
+    def append(self, data, role=0, tokens=0):
+        """Append one record (bytes without newlines); returns its index."""
+        with self._lock:
+            if self._write_offset and self._write_offset + len(data) + 1 > self.segment_bytes:
+                os.close(self._write_fd)
+                self._segment += 1
+                self._write_fd = self._open_segment(self._segment)
+                self._write_offset = 0
+            offset = self._write_offset
+            os.write(self._write_fd, data + b"\n")
+            self._write_offset += len(data) + 1
+            if self.sync:
+                os.fsync(self._write_fd)
+
+            if self._count == self._capacity():
+                self._grow_index()
+            self._tokens += tokens
+            ENTRY.pack_into(
+                self._index, HEADER.size + self._count * ENTRY.size,
+                offset, len(data), self._segment, self._tokens, role,
+            )
+            self._count += 1
+            HEADER.pack_into(self._index, 0, MAGIC, self._count)
+            if self.sync:
+                self._index.flush()
+            return self._count - 1
+
+    def __len__(self):
+        return self._count
+
+    # readers take the lock too: an append may remap the index, and reads seek shared fds
+
+    def role(self, index):
+        with self._lock:
+            return self._entry(index)[4]
+
+    def cumulative_tokens(self, index):
+        """Tokens in records ``[0, index]``."""
+        with self._lock:
+            return self._entry(index)[3]
+
+    def read(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError("session log index out of range")
+        with self._lock:
+            offset, length, segment, _, _ = self._entry(index)
+            return self._pread(segment, length, offset)
+
+    def read_range(self, start, stop):
+        """Records ``[start, stop)``, with one read per run of records in the same segment."""
+        with self._lock:
+            return self._read_range(start, stop)
+
+    def _read_range(self, start, stop):
+        start, stop, _ = slice(start, stop).indices(self._count)
+        records = []
+        index = start
+        while index < stop:
+            first_offset, _, segment, _, _ = self._entry(index)
+            run_end = index
+            while run_end + 1 < stop and self._entry(run_end + 1)[2] == segment:
+                run_end += 1
+            last_offset, last_length, _, _, _ = self._entry(run_end)
+            block = self._pread(segment, last_offset + last_length - first_offset, first_offset)
+            for i in range(index, run_end + 1):
+                offset, length, _, _, _ = self._entry(i)
+                records.append(block[offset - first_offset:offset - first_offset + length])
+            index = run_end + 1
+        return records
+
+    def close(self):
+        with self._lock:
+            self._index.flush()
+            self._index.close()
+            os.close(self._index_fd)
+            os.close(self._write_fd)
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
+
+
+class CumulativeTokens(Sequence):
+    """Tokens in records ``[:i]`` at index ``i``, read from a session's index, for ``bisect``."""
+
+    __slots__ = ("session",)
+
+    def __init__(self, session):
+        self.session = session
+
+    def __len__(self):
+        return len(self.session) + 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return self.session.cumulative_tokens(index - 1) if index else 0
+
+
+class ConversationLog:
+    """All sessions under ``root``, opened on demand and kept open until released."""
+
+    def __init__(self, root, segment_bytes=16 * 1024 * 1024, sync=False):
+        self.root = os.path.abspath(root)
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _directory(self, session_id):
+        # quote() leaves dots alone, and these would name the root or its parent
+        if session_id in ("", ".", ".."):
+            raise ValueError(f"invalid session id {session_id!r}")
+        return os.path.join(self.root, quote(session_id, safe=""))
+
+    def session(self, session_id):
+        """The ``SessionLog`` for ``session_id``, created on first use."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = SessionLog(
+                    self._directory(session_id), self.segment_bytes, self.sync
+                )
+            return session
+
+    def sessions(self):
+        """IDs of every session stored under the root."""
+        return sorted(unquote(name) for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def exists(self, session_id):
+        return os.path.exists(os.path.join(self._directory(session_id), INDEX_FILE))
+
+    def release(self, session_id):
+        """Close a session's files; it reopens on the next ``session()`` call."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def delete(self, session_id):
+        """Remove a session and all its messages."""
+        self.release(session_id)
+        shutil.rmtree(self._directory(session_id), ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def open_log(root, **kwargs):
+    """The process-wide ``ConversationLog`` for ``root``, so a session never gets two writers."""
+    root = os.path.abspath(root)
+    with _logs_lock:
+        if root not in _logs:
+            _logs[root] = ConversationLog(root, **kwargs)
+        return _logs[root]
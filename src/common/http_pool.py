@@ -0,0 +1,309 @@
+"""
+One pooled HTTP transport shared by every model client in the process.
+
+``backend.create_openai_client`` and ``autogen/model_clients.create_model_client``
+both hand the SDK ``shared_http_client()``. However many clients the demos build
+(one per module, one per agent), requests to an endpoint go through a single
+keep-alive pool, and a TLS handshake happens once per connection rather than
+once per client. The pool is tuned from the environment:
+
+    HTTP_MAX_CONNECTIONS=100    # per endpoint (scheme, host, port)
+    HTTP_MAX_KEEPALIVE=100      # idle connections kept open per endpoint
+    HTTP_KEEPALIVE_EXPIRY=60    # seconds before an idle connection is closed
+    HTTP_POOL_SHARD_SIZE=16     # connections per httpcore pool; see PooledTransport
+    HTTP2=auto                  # auto (on if the h2 package is installed) | on | off
+
+Every endpoint gets its own pools and limits, so a slow endpoint cannot use up
+the connections another needs. Async pools belong to the event loop that opened
+them. Each ``asyncio.run`` gets fresh ones, so no connection is ever used from a
+loop that has been closed. The pools of a closed loop are dropped when the next
+loop makes its first request.
+
+``warm_up``/``warm_up_async`` open connections before traffic arrives, so the
+first requests do not pay for connect and TLS:
+
+    await warm_up_async(backend_url(), connections=32)
+
+The shared clients ignore ``close()``. An SDK client closes its HTTP client when
+it is closed (AutoGen demos do so on exit), and that must not tear down the pool
+for everyone else. ``COMPLETION_CACHE`` (see ``common/completion_cache.py``)
+wraps the shared transport, so cached and live requests share the pool too.
+"""
+import asyncio
+import importlib.util
+import os
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+from common.completion_cache import CachingTransport, cache_mode, get_store
+from common.rate_limiter import ScheduledTransport, get_budget, rate_limit_enabled
+from common.tracing import TracingTransport, setup_from_env
+from common.usage_ledger import LedgerTransport, get_ledger, ledger_enabled
+
+HTTP2_MODES = ("auto", "on", "off")
+
+
+def pool_settings():
+    """``PooledTransport`` keyword arguments from the environment."""
+    http2 = os.getenv("HTTP2", "auto").strip().lower()
+    if http2 not in HTTP2_MODES:
+        raise ValueError(f"HTTP2 must be one of {', '.join(HTTP2_MODES)}, got {http2!r}")
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "100")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+        ),
+        "shard_size": int(os.getenv("HTTP_POOL_SHARD_SIZE", "16")),
+        # "on" without h2 installed fails loudly in httpx, which is what we want
+        "http2": http2 == "on" or (http2 == "auto" and importlib.util.find_spec("h2") is not None),
+    }
+
+
+class _Release(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass a response body through and tell the shard when the response is closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _OriginPool:
+    """The connection pools of one origin, filled one shard at a time."""
+
+    def __init__(self, transport_cls, limits, shard_size, **transport_kwargs):
+        shards = max(1, -(-limits.max_connections // shard_size))
+        shard_limits = httpx.Limits(
+            max_connections=-(-limits.max_connections // shards),
+            max_keepalive_connections=-(-limits.max_keepalive_connections // shards),
+            keepalive_expiry=limits.keepalive_expiry,
+        )
+        self.shard_size = shard_limits.max_connections
+        self.transports = [transport_cls(limits=shard_limits, **transport_kwargs) for _ in range(shards)]
+        self.in_flight = [0] * shards
+
+    def acquire(self):
+        """Index of the first shard with a free connection, or else the least busy one."""
+        in_flight = self.in_flight
+        for index, count in enumerate(in_flight):
+            if count < self.shard_size:
+                break
+        else:
+            index = in_flight.index(min(in_flight))
+        in_flight[index] += 1
+        return index
+
+    def release(self, index):
+        self.in_flight[index] -= 1
+
+
+class PooledTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport with connection pools per origin (and per event loop for async requests).
+
+    httpcore re-checks every connection of a pool against every other one each
+    time a request enters or leaves it, which is quadratic in the pool size.
+    Each origin's ``limits`` are therefore split over shards of ``shard_size``
+    connections. A request goes to the first shard with a free connection, so
+    connections are reused as much as with a single pool.
+    """
+
+    def __init__(self, limits=None, http2=False, shard_size=16, verify=True, cert=None, trust_env=True, **transport_kwargs):
+        self.limits = limits or httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=60)
+        self.http2 = http2
+        self.shard_size = shard_size
+        # loading the CA bundle takes tens of milliseconds, so every shard shares one context
+        ssl_context = verify if isinstance(verify, ssl.SSLContext) else httpx.create_ssl_context(verify, cert, trust_env)
+        self.transport_kwargs = {"verify": ssl_context, "trust_env": trust_env, **transport_kwargs}
+        self._lock = threading.Lock()
+        self._forget_pools()
+
+    def _forget_pools(self):
+        self._sync_pools = {}  # origin -> _OriginPool of HTTPTransport
+        # id(event loop) -> (event loop, {origin -> _OriginPool of AsyncHTTPTransport}); the connections
+        # hold their loop, so a weak reference to it would never die
+        self._async_pools = {}
+
+    @staticmethod
+    def _origin(request):
+        return request.url.scheme, request.url.host, request.url.port
+
+    def _loop_pools(self, loop):
+        entry = self._async_pools.get(id(loop))
+        if entry is not None and entry[0] is loop:
+            return entry[1]
+        with self._lock:
+            # a finished asyncio.run leaves its pools behind; they can no longer be
+            # awaited, so dropping them lets their sockets be collected
+            for key, (other, _) in list(self._async_pools.items()):
+                if other.is_closed():
+                    del self._async_pools[key]
+            return self._async_pools.setdefault(id(loop), (loop, {}))[1]
+
+    def _pool(self, pools, origin, transport_cls):
+        pool = pools.get(origin)
+        if pool is None:
+            with self._lock:
+                pool = pools.get(origin)
+                if pool is None:
+                    pool = pools[origin] = _OriginPool(
+                        transport_cls, self.limits, self.shard_size, http2=self.http2, **self.transport_kwargs
+                    )
+        return pool
+
+    def handle_request(self, request):
+        pool = self._pool(self._sync_pools, self._origin(request), httpx.HTTPTransport)
+        with self._lock:  # several threads may pick a shard at once
+            index = pool.acquire()
+        try:
+            response = pool.transports[index].handle_request(request)
+        except BaseException:
+            with self._lock:
+                pool.release(index)
+            raise
+
+        def release():
+            with self._lock:
+                pool.release(index)
+
+        response.stream = _Release(response.stream, release)
+        return response
+
+    async def handle_async_request(self, request):
+        pools = self._loop_pools(asyncio.get_running_loop())
+        pool = self._pool(pools, self._origin(request), httpx.AsyncHTTPTransport)
+        index = pool.acquire()  # only this loop's thread touches its pools
+        try:
+            response = await pool.transports[index].handle_async_request(request)
+        except BaseException:
+            pool.release(index)
+            raise
+        response.stream = _Release(response.stream, lambda: pool.release(index))
+        return response
+
+    def close(self):
+        with self._lock:
+            pools, self._sync_pools = list(self._sync_pools.values()), {}
+        for pool in pools:
+            for transport in pool.transports:
+                transport.close()
+
+    async def aclose(self):
+        """Close the running loop's async pools (those of other loops are left alone)."""
+        with self._lock:
+            _, pools = self._async_pools.pop(id(asyncio.get_running_loop()), (None, {}))
+        for pool in pools.values():
+            for transport in pool.transports:
+                await transport.aclose()
+
+
+class _SharedHttpxClient(DefaultHttpxClient):
+    def close(self):
+        pass  # shared by every SDK client; see close_shared_clients()
+
+
+class _SharedAsyncHttpxClient(DefaultAsyncHttpxClient):
+    async def aclose(self):
+        pass  # shared by every SDK client; see close_shared_clients()
+
+
+_transport = None
+_clients = {}
+_lock = threading.RLock()
+
+
+def shared_transport():
+    """The process-wide ``PooledTransport``, configured by ``pool_settings()`` on first use."""
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = PooledTransport(**pool_settings())
+        return _transport
+
+
+def shared_http_client(async_client=False):
+    """The process-wide httpx client (sync or async) on the shared transport.
+
+    With ``RATE_LIMIT=on`` requests are scheduled by ``common/rate_limiter.py``,
+    and with ``COMPLETION_CACHE`` on the cache goes in front of that, so cache
+    hits spend no budget. ``common/tracing.py`` wraps it all, so model request
+    spans cover queueing and cache hits too. With ``USAGE_LEDGER=on`` the
+    ledger (``common/usage_ledger.py``) goes outside that, to charge every
+    request and refuse those over budget before they queue.
+    """
+    with _lock:
+        if async_client not in _clients:
+            transport = shared_transport()
+            if rate_limit_enabled():
+                transport = ScheduledTransport(transport, get_budget())
+            mode = cache_mode()
+            if mode != "off":
+                transport = CachingTransport(transport, get_store(), mode)
+            setup_from_env()
+            transport = TracingTransport(transport)
+            if ledger_enabled():
+                transport = LedgerTransport(transport, get_ledger())
+            cls = _SharedAsyncHttpxClient if async_client else _SharedHttpxClient
+            _clients[async_client] = cls(transport=transport)
+        return _clients[async_client]
+
+
+def close_shared_clients():
+    """Close the shared sync pools; async pools close with their event loop's ``aclose()``."""
+    with _lock:
+        if _transport is not None:
+            _transport.close()
+
+
+def _after_fork():
+    # a forked worker must not share the parent's sockets
+    if _transport is not None:
+        _transport._forget_pools()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _warm_up_url(base_url):
+    # any cheap GET will do; the response (even a 401 or 404) leaves the connection open
+    return base_url.rstrip("/") + "/models"
+
+
+def warm_up(base_url, connections=1, http_client=None):
+    """Open ``connections`` keep-alive connections to ``base_url``'s endpoint; returns the statuses."""
+    client = http_client or shared_http_client()
+    url = _warm_up_url(base_url)
+    # the requests must overlap, or they would all reuse the first connection
+    with ThreadPoolExecutor(connections) as executor:
+        return list(executor.map(lambda _: client.get(url).status_code, range(connections)))
+
+
+async def warm_up_async(base_url, connections=1, http_client=None):
+    """Async ``warm_up`` for the running event loop's pools."""
+    client = http_client or shared_http_client(async_client=True)
+    url = _warm_up_url(base_url)
+    responses = await asyncio.gather(*(client.get(url) for _ in range(connections)))
+    return [response.status_code for response in responses]
@@ -0,0 +1,488 @@
+"""
+A tiny OpenAI-compatible chat completion server for offline benchmarking.
+
+The server speaks just enough HTTP/1.1 (with keep-alive) to answer
+``POST /v1/chat/completions`` the way the OpenAI API does, so any OpenAI
+client can be pointed at it with ``base_url=server.url``.
+
+Latencies are seconds or distribution specs (``"uniform:0.02,0.2"``,
+``"lognormal:-3,0.5"``...), drawn from a seeded generator so runs repeat.
+Replies come from a responder callable; ``ScriptedResponder`` loads them from a
+JSON rule file so tool calls and handoffs can be scripted without a model.
+
+Usage:
+    server = MockCompletionServer(latency="normal:0.05,0.01", responder=ScriptedResponder.load("acme.json"))
+    url = server.start_in_thread()
+    client = AsyncOpenAI(api_key="mock", base_url=url)
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+import zlib
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for mock usage stats."""
+    return max(1, len(text) // 4)
+
+
+def split_into_tokens(text, size=4):
+    """Chop text into small pieces so streamed replies arrive as many deltas."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def default_responder(request):
+    """Reply to the last user message with a short canned answer."""
+    last_user = next(
+        (m for m in reversed(request.get("messages", [])) if m.get("role") == "user"),
+        {"content": ""},
+    )
+    return {"content": f"Mock reply to: {last_user.get('content') or ''}"}
+
+
+HTTP_REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}
+
+LATENCY_DISTRIBUTIONS = {
+    "fixed": lambda rng, seconds: seconds,
+    "uniform": lambda rng, low, high: rng.uniform(low, high),
+    "normal": lambda rng, mean, stddev: max(0.0, rng.gauss(mean, stddev)),
+    "lognormal": lambda rng, mu, sigma: rng.lognormvariate(mu, sigma),
+    "exponential": lambda rng, mean: rng.expovariate(1 / mean),
+}
+
+
+class Latency:
+    """A latency spec as a zero-argument callable returning seconds.
+
+    ``spec`` is a number of seconds or ``"<distribution>:<args>"`` with a
+    distribution from ``LATENCY_DISTRIBUTIONS``, e.g. ``"uniform:0.01,0.1"``.
+    Plain data rather than a closure, so servers stay picklable for
+    ``start_in_subprocess``.
+    """
+
+    __slots__ = ("name", "params", "rng")
+
+    def __init__(self, spec, rng):
+        if isinstance(spec, str) and ":" in spec:
+            name, _, args = spec.partition(":")
+            self.name = name.strip()
+            if self.name not in LATENCY_DISTRIBUTIONS:
+                raise ValueError(
+                    f"Unknown latency distribution {self.name!r}; expected one of {sorted(LATENCY_DISTRIBUTIONS)}"
+                )
+            self.params = tuple(float(arg) for arg in args.split(",") if arg.strip())
+        else:
+            self.name, self.params = "fixed", (float(spec or 0),)
+        self.rng = rng
+
+    def __call__(self):
+        return LATENCY_DISTRIBUTIONS[self.name](self.rng, *self.params)
+
+
+def make_latency(spec, rng):
+    """Return ``spec`` itself if it is already a callable, else a ``Latency``."""
+    return spec if callable(spec) else Latency(spec, rng)
+
+
+class RateLimit:
+    """A per-minute budget refilled continuously, holding at most one second's worth."""
+
+    __slots__ = ("per_minute", "capacity", "level", "updated")
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute / 60)
+        self.level = self.capacity
+        self.updated = None
+
+    def take(self, amount, now):
+        """Spend ``amount``, or return the seconds until it would be available."""
+        if self.updated is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        if self.level < amount:
+            return (amount - self.level) * 60 / self.per_minute
+        self.level -= amount
+        return 0.0
+
+
+class ScriptedResponder:
+    """Answer requests from an ordered list of match/response rules.
+
+    Each rule looks like::
+
+        {"match": {"system": "Triage Agent", "last_role": "user",
+                   "last_content": "(?i)refund", "has_tool": "transfer_to_issues_and_repairs"},
+         "response": {"tool_calls": [{"name": "transfer_to_issues_and_repairs", "arguments": {}}]}}
+
+    ``system`` is a substring of the first system message, ``last_role`` the role
+    of the final message, ``last_content`` a regex searched in its content and
+    ``has_tool`` a tool name the request must offer. Omitted keys match anything;
+    the first matching rule wins and ``fallback`` answers everything else.
+    ``content_choices`` picks one reply per request by hashing the last message,
+    so the same conversation always gets the same answer.
+    """
+
+    def __init__(self, rules, fallback=default_responder):
+        self.rules = [self._compile(rule) for rule in rules]
+        self.fallback = fallback
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            script = json.load(f)
+        return cls(script["rules"] if isinstance(script, dict) else script, **kwargs)
+
+    @staticmethod
+    def _compile(rule):
+        match = dict(rule.get("match", {}))
+        if "last_content" in match:
+            match["last_content"] = re.compile(match["last_content"])
+        return match, rule["response"]
+
+    def __call__(self, request):
+        messages = request.get("messages") or [{}]
+        last = messages[-1]
+        last_content = last.get("content") if isinstance(last.get("content"), str) else json.dumps(last.get("content"))
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        tools = {tool.get("function", {}).get("name") for tool in request.get("tools") or []}
+
+        for match, response in self.rules:
+            if "system" in match and match["system"] not in system:
+                continue
+            if "last_role" in match and match["last_role"] != last.get("role"):
+                continue
+            if "last_content" in match and not match["last_content"].search(last_content or ""):
+                continue
+            if "has_tool" in match and match["has_tool"] not in tools:
+                continue
+            if "content_choices" in response:
+                choices = response["content_choices"]
+                response = {**response, "content": choices[zlib.crc32((last_content or "").encode()) % len(choices)]}
+            return response
+        return self.fallback(request)
+
+
+class MockCompletionServer:
+    """Serve canned chat completions with a configurable artificial latency.
+
+    ``latency`` is the wait before the first token; with ``stream: true`` each
+    streamed delta is then spaced by ``token_latency``. Both accept anything
+    ``make_latency`` does and are sampled from a generator seeded with ``seed``.
+
+    ``rpm``/``tpm`` enforce request and (prompt) token budgets the way the
+    OpenAI API does: a request over budget gets a 429 with ``retry-after-ms``,
+    and every response carries ``x-ratelimit-*`` headers.
+    """
+
+    def __init__(
+        self, host="127.0.0.1", port=0, latency=0.0, token_latency=0.0, responder=default_responder, seed=0,
+        rpm=0, tpm=0,
+    ):
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+        self.latency = make_latency(latency, self.rng)
+        self.token_latency = make_latency(token_latency, self.rng)
+        self.responder = responder
+        self.rate_limits = {name: RateLimit(limit) for name, limit in (("requests", rpm), ("tokens", tpm)) if limit}
+        self.request_count = 0
+        self.throttled_count = 0
+        self._ids = itertools.count(1)
+        self._server = None
+        self._connections = set()
+        self._loop = None
+        self._thread = None
+        self._process = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    # === lifecycle ===
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # keep-alive connections outlive the listening socket, so drop them explicitly
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self):
+        """Run the server on its own event loop in a daemon thread and return its URL.
+
+        Keeping the server off the caller's loop means benchmark numbers measure
+        the client side only.
+        """
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="mock-completion-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.url
+
+    def stop_thread(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def start_in_subprocess(self):
+        """Run the server in a child process and return its URL.
+
+        Unlike ``start_in_thread`` the server does not compete with the client for
+        the GIL, which matters once hundreds of requests are in flight.
+        """
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve_forever, args=(self, child_conn), name="mock-completion-server", daemon=True
+        )
+        self._process.start()
+        self.port = parent_conn.recv()
+        return self.url
+
+    def stop_subprocess(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    # === HTTP handling ===
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                await self._route(writer, method, path, body)
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _route(self, writer, method, path, body):
+        path = path.split("?", 1)[0].rstrip("/")
+        if method == "POST" and path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            headers, retry_after = self._check_rate_limits(request)
+            if retry_after:
+                self.throttled_count += 1
+                headers["retry-after-ms"] = str(int(retry_after * 1000) + 1)
+                self._write_json(writer, 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}, headers)
+            elif request.get("stream"):
+                await self._stream_completion(writer, request, headers)
+            else:
+                self._write_json(writer, 200, await self._chat_completion(request), headers)
+        elif method == "GET" and path.endswith("/models"):
+            self._write_json(writer, 200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._write_json(writer, 404, {"error": {"message": f"Unknown route {method} {path}", "type": "invalid_request_error"}})
+
+    def _check_rate_limits(self, request):
+        """``(x-ratelimit headers, seconds to wait or 0)`` for a request, spending its budget if it fits."""
+        now = time.monotonic()
+        amounts = {"requests": 1, "tokens": estimate_tokens(json.dumps(request.get("messages", [])))}
+        retry_after = 0.0
+        headers = {}
+        for name, limit in self.rate_limits.items():
+            retry_after = max(retry_after, limit.take(amounts[name], now))
+            headers[f"x-ratelimit-limit-{name}"] = str(limit.per_minute)
+            headers[f"x-ratelimit-remaining-{name}"] = str(int(limit.level))
+        return headers, retry_after
+
+    @staticmethod
+    def _write_json(writer, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        reason = HTTP_REASONS.get(status, "Error")
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"{extra}"
+            "Connection: keep-alive\r\n\r\n".encode()
+            + body
+        )
+
+    @staticmethod
+    def _write_event(writer, data):
+        # one server-sent event per HTTP chunk
+        event = f"data: {data}\n\n".encode()
+        writer.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+
+    # === completions ===
+
+    async def _reply(self, request):
+        self.request_count += 1
+        delay = self.latency()
+        if delay:
+            await asyncio.sleep(delay)
+
+        reply = self.responder(request)
+        message = {"role": "assistant", "content": reply.get("content")}
+        if reply.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{next(self._ids)}",
+                    "type": "function",
+                    "function": {
+                        "name": call["name"],
+                        "arguments": json.dumps(call.get("arguments", {})),
+                    },
+                }
+                for call in reply["tool_calls"]
+            ]
+
+        prompt_tokens = estimate_tokens(json.dumps(request.get("messages", [])))
+        completion_tokens = estimate_tokens(json.dumps(message))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return message, usage
+
+    def _envelope(self, request, object_type):
+        return {
+            "id": f"chatcmpl-mock-{next(self._ids)}",
+            "object": object_type,
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+
+    async def _chat_completion(self, request):
+        message, usage = await self._reply(request)
+        return {
+            **self._envelope(request, "chat.completion"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    async def _stream_completion(self, writer, request, headers=None):
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            + extra.encode()
+            + b"Connection: keep-alive\r\n\r\n"
+        )
+        message, usage = await self._reply(request)
+        envelope = self._envelope(request, "chat.completion.chunk")
+
+        async def send(delta, finish_reason=None):
+            chunk = {**envelope, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self._write_event(writer, json.dumps(chunk))
+            await writer.drain()
+            delay = self.token_latency()
+            if delay:
+                await asyncio.sleep(delay)
+
+        await send({"role": "assistant", "content": ""})
+        for piece in split_into_tokens(message.get("content") or ""):
+            await send({"content": piece})
+        for index, call in enumerate(message.get("tool_calls", [])):
+            await send({"tool_calls": [{
+                "index": index,
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": call["function"]["name"], "arguments": ""},
+            }]})
+            for piece in split_into_tokens(call["function"]["arguments"]):
+                await send({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        await send({}, finish_reason="tool_calls" if message.get("tool_calls") else "stop")
+
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event(writer, json.dumps({**envelope, "choices": [], "usage": usage}))
+        self._write_event(writer, "[DONE]")
+        writer.write(b"0\r\n\r\n")
+
+
+def _serve_forever(server, conn):
+    async def serve():
+        await server.start()
+        conn.send(server.port)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible completion server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="0", help="Wait before each reply: seconds or e.g. 'lognormal:-3,0.5'.")
+    parser.add_argument("--token-latency", default="0", help="Wait between streamed deltas, same format.")
+    parser.add_argument("--script", help="JSON file of ScriptedResponder rules.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for sampled latencies.")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429 (0: unlimited).")
+    parser.add_argument("--tpm", type=int, default=0, help="Prompt tokens per minute before answering 429 (0: unlimited).")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockCompletionServer(
+            args.host,
+            args.port,
+            latency=args.latency,
+            token_latency=args.token_latency,
+            responder=ScriptedResponder.load(args.script) if args.script else default_responder,
+            seed=args.seed,
+            rpm=args.rpm,
+            tpm=args.tpm,
+        )
+        print(f"Mock completion server listening on {await server.start()}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
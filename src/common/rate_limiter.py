@@ -0,0 +1,399 @@
+"""
+Client-side scheduling of chat completion requests: per-minute request and
+token budgets, priority classes and adaptive concurrency.
+
+Without coordination, every agent, selector and reflection call fires as soon
+as it is ready. Under load they all hit 429s at once, and all of them back off
+and come back together. ``ScheduledTransport`` sits in the shared HTTP stack
+(``common/http_pool.py``), so it sees every model call in the process and
+lets them go one at a time, in priority order, only when:
+
+* the request budget (``RATE_LIMIT_RPM``) and the token budget
+  (``RATE_LIMIT_TPM``) have room. Both are token buckets refilled
+  continuously. A request is charged its prompt size estimate plus
+  ``max_tokens``, and the estimate is corrected from ``usage`` once the reply
+  arrives. Budgets the server announces in ``x-ratelimit-*`` headers are
+  adopted when none are configured, and the server's ``remaining`` counts
+  are trusted over our own;
+* fewer requests are in flight than the adaptive concurrency limit. The limit
+  grows by one per window of successful replies and halves on a 429 (AIMD).
+  A burst of 429s from the same window only halves it once;
+* a ``retry-after`` from the last 429 has passed.
+
+A 429 is still returned to the SDK, whose own retry re-enters the queue, so
+retries wait their turn instead of storming the endpoint.
+
+Priorities, highest first: ``user`` (a turn someone is waiting on),
+``selector``, ``reflection``, ``background``. A request's class comes from the
+``x-request-priority`` header (see ``create_model_client(priority=...)``), else
+from ``request_priority()``, else from the request itself: a call without tools
+that answers a tool result is a reflection. Lower classes are treated as if
+they had arrived ``aging`` seconds later per class, so they are delayed under
+load but never starved.
+
+    RATE_LIMIT=on                  # off by default
+    RATE_LIMIT_RPM=500             # default 0: no request budget unless the server announces one
+    RATE_LIMIT_TPM=200000          # default 0: no token budget unless the server announces one
+    RATE_LIMIT_MAX_CONCURRENCY=64
+    RATE_LIMIT_MIN_CONCURRENCY=1
+
+Only async requests are scheduled; sync clients pass straight through.
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+import httpx
+from opentelemetry import trace
+
+USER, SELECTOR, REFLECTION, BACKGROUND = range(4)
+PRIORITIES = {"user": USER, "selector": SELECTOR, "reflection": REFLECTION, "background": BACKGROUND}
+PRIORITY_HEADER = "x-request-priority"
+DEFAULT_COMPLETION_TOKENS = 256
+
+_priority = contextvars.ContextVar("request_priority", default=None)
+
+
+def priority_of(name):
+    if isinstance(name, int):
+        return name
+    try:
+        return PRIORITIES[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Request priority must be one of {', '.join(PRIORITIES)}, got {name!r}") from None
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Schedule model calls made inside the block (and tasks started from it) at ``priority``."""
+    token = _priority.set(priority_of(priority))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """A per-minute budget refilled continuously, holding at most ``burst`` seconds' worth."""
+
+    def __init__(self, per_minute, burst=1.0):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst / 60)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until ``amount`` is available (a request larger than the bucket waits for a full one)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing * 60 / self.per_minute if missing > 0 else 0.0
+
+    def take(self, amount):
+        self.level -= amount  # may go negative: the debt delays whoever comes next
+
+    def refund(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+    def clamp(self, remaining):
+        self.level = min(self.level, remaining)
+
+
+class RateBudget:
+    """Budgets and the AIMD concurrency limit, shared by every event loop in the process."""
+
+    def __init__(self, rpm=0, tpm=0, max_concurrency=64, min_concurrency=1):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"started": 0, "throttled": 0, "decreases": 0}
+        self._lock = threading.Lock()
+
+    def try_start(self, tokens, now):
+        """Start a request if everything allows it now; else the seconds to wait (``None``: until a slot frees)."""
+        with self._lock:
+            if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+                return None
+            delay = self.paused_until - now
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    delay = max(delay, bucket.delay(amount, now))
+            if delay > 0:
+                return delay
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.take(amount)
+            self.in_flight += 1
+            self.stats["started"] += 1
+            return 0.0
+
+    def finish(self, started, charged, used=None, throttled=False, retry_after=None, headers=None):
+        """Account for a finished request that started at ``started`` and was charged ``charged`` tokens."""
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            if headers is not None:
+                self._observe(headers)
+            if throttled:
+                self.stats["throttled"] += 1
+                # the server did not count it: give the budget back
+                if self.requests is not None:
+                    self.requests.refund(1)
+                if self.tokens is not None:
+                    self.tokens.refund(charged)
+                if started >= self.last_decrease:
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self.last_decrease = now
+                    self.stats["decreases"] += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                if used is not None and self.tokens is not None:
+                    self.tokens.take(used - charged)
+
+    def _observe(self, headers):
+        for name in ("requests", "tokens"):
+            limit = headers.get(f"x-ratelimit-limit-{name}")
+            remaining = headers.get(f"x-ratelimit-remaining-{name}")
+            bucket = getattr(self, name)
+            if bucket is None and limit:
+                bucket = TokenBucket(float(limit))
+                setattr(self, name, bucket)
+            if bucket is not None and remaining:
+                bucket.clamp(float(remaining))
+
+
+class RequestScheduler:
+    """The priority queue of one event loop, admitting requests against a ``RateBudget``."""
+
+    def __init__(self, budget, aging=2.0):
+        self.budget = budget
+        self.aging = aging
+        self._waiting = []  # heap of (arrival + priority * aging, seq, future, tokens)
+        self._seq = itertools.count()
+        self._timer = None
+        self.waited = {priority: [] for priority in PRIORITIES.values()}
+
+    async def acquire(self, tokens, priority=USER):
+        """Wait for a turn; returns the start time to pass to ``RateBudget.finish``."""
+        loop = asyncio.get_running_loop()
+        arrival = time.monotonic()
+        future = loop.create_future()
+        heapq.heappush(self._waiting, (arrival + priority * self.aging, next(self._seq), future, tokens))
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(future.result(), tokens)  # admitted just as we were cancelled
+            raise
+        started = future.result()
+        self.waited[priority].append(started - arrival)
+        return started
+
+    def release(self, started, charged, **outcome):
+        self.budget.finish(started, charged, **outcome)
+        self.dispatch()
+
+    def dispatch(self):
+        """Admit waiting requests in priority order while the budget allows."""
+        while self._waiting:
+            _, _, future, tokens = self._waiting[0]
+            if future.cancelled():
+                heapq.heappop(self._waiting)
+                continue
+            now = time.monotonic()
+            delay = self.budget.try_start(tokens, now)
+            if delay:
+                self._wake_in(delay)
+                return
+            if delay is None:
+                # a slot frees on release; another event loop's release would not wake us, so poll too
+                self._wake_in(0.05)
+                return
+            heapq.heappop(self._waiting)
+            future.set_result(now)
+
+    def _wake_in(self, delay):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None:
+            if not self._timer.cancelled() and self._timer.when() <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.dispatch()
+
+
+class _ReleaseOnClose(httpx.AsyncByteStream):
+    """Pass a response body through (keeping a copy if asked); report it once the response is closed."""
+
+    def __init__(self, stream, release, keep_body=False):
+        self._stream = stream
+        self._release = release
+        self._chunks = [] if keep_body else None
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            if self._chunks is not None:
+                self._chunks.append(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                release, self._release = self._release, None
+                release(b"".join(self._chunks) if self._chunks is not None else None)
+
+
+def take_priority(request):
+    """Remove the priority header (it is not for the API) from ``request``; returns its value.
+
+    The value stays in the request's extensions for transports further in.
+    """
+    header = request.headers.pop(PRIORITY_HEADER, None)
+    if header is not None:
+        request.extensions["priority"] = header
+    return request.extensions.get("priority")
+
+
+def _retry_after(headers):
+    if "retry-after-ms" in headers:
+        return float(headers["retry-after-ms"]) / 1000
+    try:
+        return float(headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+def estimate_request(body):
+    """``(tokens to charge, inferred priority)`` for a chat completion request body."""
+    request = json.loads(body or b"{}")
+    completion = request.get("max_completion_tokens") or request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    messages = request.get("messages") or [{}]
+    reflection = not request.get("tools") and messages[-1].get("role") == "tool"
+    # ~4 characters per token over the whole body, tool schemas included
+    return len(body) // 4 + completion, REFLECTION if reflection else USER
+
+
+class ScheduledTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport that schedules ``POST .../chat/completions`` against a ``RateBudget``."""
+
+    def __init__(self, transport, budget, aging=2.0):
+        self.transport = transport
+        self.budget = budget
+        self.aging = aging
+        self._schedulers = weakref.WeakKeyDictionary()  # event loop -> RequestScheduler
+
+    def scheduler(self):
+        """The running event loop's ``RequestScheduler``."""
+        loop = asyncio.get_running_loop()
+        scheduler = self._schedulers.get(loop)
+        if scheduler is None:
+            scheduler = self._schedulers[loop] = RequestScheduler(self.budget, self.aging)
+        return scheduler
+
+    def handle_request(self, request):
+        take_priority(request)
+        return self.transport.handle_request(request)
+
+    async def handle_async_request(self, request):
+        header = take_priority(request)
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return await self.transport.handle_async_request(request)
+
+        charged, inferred = estimate_request(request.content)
+        if header is not None:
+            priority = priority_of(header)
+        elif _priority.get() is not None:
+            priority = _priority.get()
+        else:
+            priority = inferred
+        scheduler = self.scheduler()
+        arrival = time.monotonic()
+        started = await scheduler.acquire(charged, priority)
+        trace.get_current_span().set_attribute("rate_limit.queue_wait_ms", (started - arrival) * 1000)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            scheduler.release(started, charged)
+            raise
+
+        throttled = response.status_code == 429
+        headers = response.headers
+
+        def release(body):
+            used = None
+            if body:
+                try:
+                    used = (json.loads(body).get("usage") or {}).get("total_tokens")
+                except (ValueError, AttributeError):
+                    pass
+            scheduler.release(
+                started, charged, used=used, throttled=throttled,
+                retry_after=_retry_after(headers) if throttled else None, headers=headers,
+            )
+
+        # the slot is held until the body has been read (or the stream closed); plain
+        # replies are kept so their real usage can correct the token estimate
+        keep_body = response.status_code == 200 and headers.get("content-type", "").startswith("application/json")
+        response.stream = _ReleaseOnClose(response.stream, release, keep_body)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def rate_limit_enabled():
+    return os.getenv("RATE_LIMIT", "off").strip().lower() in ("on", "1", "true")
+
+
+def get_budget():
+    """The process-wide ``RateBudget``, configured from the environment on first use."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = RateBudget(
+                rpm=float(os.getenv("RATE_LIMIT_RPM", "0")),
+                tpm=float(os.getenv("RATE_LIMIT_TPM", "0")),
+                max_concurrency=int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "64")),
+                min_concurrency=int(os.getenv("RATE_LIMIT_MIN_CONCURRENCY", "1")),
+            )
+        return _budget
+
+
+def format_rate_stats(budget=None):
+    """A one-line summary of a budget's counters, for demos and benchmarks."""
+    budget = budget or get_budget()
+    return (
+        f"started={budget.stats['started']} throttled={budget.stats['throttled']} "
+        f"decreases={budget.stats['decreases']} concurrency limit={budget.limit:.1f}"
+    )
@@ -0,0 +1,213 @@
+"""
+Memoize idempotent tools (inventory lookups, weather, search...) across calls and conversations.
+
+``@cached_tool`` wraps a sync or async tool function without changing its name,
+docstring or signature, so it still works with Swarm's ``function_to_schema``
+and AutoGen's ``FunctionTool``:
+
+    @cached_tool(ttl=600, maxsize=1024)
+    async def get_weather(city: str) -> str: ...
+
+    weather_tool = cached_function_tool(get_hotel_info, "Get hotel information", ttl=3600, strict=True)
+
+Results are keyed on the canonicalized call: positional and keyword arguments
+are bound to the signature with defaults applied, so ``f("Paris")`` and
+``f(city="Paris")`` share an entry. Arguments must be JSON-serializable; pass
+``key=`` (same parameters as the tool) for others, or for looser matching such
+as case-insensitive names. Entries expire after
+``ttl`` seconds and the least recently used ones are evicted beyond
+``maxsize``. Concurrent identical calls are single-flighted: one runs the
+tool and the others wait for its result. A tool that calls itself with the
+same arguments while filling an entry runs that inner call uncached rather than
+waiting on itself. Exceptions are never cached.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+
+# every cached tool in the process, for reporting
+_caches = []
+
+
+class ToolCache:
+    """LRU + TTL storage with hit/miss metrics for one tool."""
+
+    def __init__(self, name, ttl=None, maxsize=256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # calls that waited on an identical call already in flight
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}  # key -> asyncio.Task or concurrent.futures.Future
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return ``(True, value)`` for a live entry, else ``(False, None)``. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (None if self.ttl is None else time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        calls = self.hits + self.misses + self.coalesced
+        return {
+            "tool": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.coalesced) / calls if calls else 0.0,
+        }
+
+
+def canonical_key(signature, args, kwargs):
+    """A stable, hashable key for one call of a function with ``signature``."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    try:
+        return json.dumps(bound.arguments, sort_keys=True, separators=(",", ":"))
+    except TypeError as e:
+        # repr() of an arbitrary object holds its address, so a key built from it would never hit
+        raise TypeError(f"cached tool arguments must be JSON-serializable, or pass key=: {e}") from None
+
+
+def cached_tool(ttl=None, maxsize=256, key=None):
+    """Decorator memoizing a tool function; see the module docstring.
+
+    The wrapper exposes its ``ToolCache`` as ``.cache``.
+    """
+
+    def decorate(func):
+        cache = ToolCache(func.__qualname__, ttl, maxsize)
+        _caches.append(cache)
+        signature = inspect.signature(func)
+
+        def make_key(args, kwargs):
+            if key is not None:
+                return key(*args, **kwargs)
+            return canonical_key(signature, args, kwargs)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                k = make_key(args, kwargs)
+                reentrant = False
+                with cache._lock:
+                    found, value = cache.get(k)
+                    if found:
+                        cache.hits += 1
+                        return value
+                    task = cache._in_flight.get(k)
+                    if task is not None and task is asyncio.current_task():
+                        reentrant = True  # the tool called itself while filling this entry
+                    elif task is None:
+                        cache.misses += 1
+                        task = cache._in_flight[k] = asyncio.ensure_future(_fill_async(cache, k, func, args, kwargs))
+                    else:
+                        cache.coalesced += 1
+                if reentrant:
+                    return await func(*args, **kwargs)
+                # shield: one caller giving up must not cancel the call the others are waiting on
+                return await asyncio.shield(task)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                k = make_key(args, kwargs)
+                with cache._lock:
+                    found, value = cache.get(k)
+                    if found:
+                        cache.hits += 1
+                        return value
+                    future = cache._in_flight.get(k)
+                    leader = future is None
+                    if leader:
+                        cache.misses += 1
+                        future = cache._in_flight[k] = Future()
+                        future.owner = threading.get_ident()
+                    elif future.owner == threading.get_ident():
+                        # the tool called itself while filling this entry; waiting would deadlock
+                        return func(*args, **kwargs)
+                    else:
+                        cache.coalesced += 1
+                if not leader:
+                    return future.result()
+                try:
+                    value = func(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                else:
+                    cache.put(k, value)
+                    future.set_result(value)
+                    return value
+                finally:
+                    with cache._lock:
+                        cache._in_flight.pop(k, None)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorate
+
+
+async def _fill_async(cache, key, func, args, kwargs):
+    try:
+        value = await func(*args, **kwargs)
+        cache.put(key, value)
+        return value
+    finally:
+        with cache._lock:
+            cache._in_flight.pop(key, None)
+
+
+def cached_function_tool(func, description, ttl=None, maxsize=256, key=None, **kwargs):
+    """An AutoGen ``FunctionTool`` over a cached copy of ``func``; extra kwargs go to ``FunctionTool``."""
+    from autogen_core.tools import FunctionTool  # only AutoGen callers need AutoGen
+
+    return FunctionTool(cached_tool(ttl, maxsize, key)(func), description, **kwargs)
+
+
+def cache_stats():
+    """Metrics for every cached tool in the process."""
+    return [cache.stats() for cache in _caches]
+
+
+def format_cache_stats():
+    lines = [f"{'tool':<32} {'hits':>6} {'misses':>7} {'coalesced':>10} {'hit rate':>9}"]
+    for stats in cache_stats():
+        lines.append(
+            f"{stats['tool']:<32} {stats['hits']:>6} {stats['misses']:>7} {stats['coalesced']:>10} {stats['hit_rate']:>8.0%}"
+        )
+    return "\n".join(lines)
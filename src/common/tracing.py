@@ -0,0 +1,481 @@
+"""
+Tracing of turns, model requests, tool calls and handoffs on the OpenTelemetry API.
+
+Everything is instrumented against ``opentelemetry.trace``:
+
+* the Swarm loops (``swarm/handoff.py``, ``swarm/async_handoff.py``) open a
+  ``turn`` span per ``run_full_turn``, an ``execute_tool <name>`` span per
+  tool call and a ``handoff`` span when a tool transfers to another agent;
+* AutoGen already emits ``invoke_agent <name>`` (an agent's turn) and
+  ``execute_tool <name>`` spans through the same API;
+* ``TracingTransport`` is the outermost layer of the shared HTTP stack
+  (``common/http_pool.py``) and opens a ``chat <model>`` span for every chat completion, whichever
+  framework sent it. It records the request's priority, the time spent queued
+  by the rate limiter, time to first token for streamed replies, token usage
+  and whether the completion cache answered.
+
+Spans nest through the OpenTelemetry context, so a model request made during a
+turn is a child of that turn. Without a tracer provider the API hands out
+no-op spans and tracing costs next to nothing. ``TRACE`` installs the local
+provider defined here:
+
+    TRACE=traces.jsonl     # append finished spans to a JSON lines file
+    TRACE=memory           # keep them in an in-process InMemoryCollector
+
+or in code, ``collector = install(InMemoryCollector())`` and later
+``print(collector.format_summary())``. With the OpenTelemetry SDK installed,
+its provider (and OTLP exporters) can be set instead; nothing here depends on
+this module's provider.
+
+AutoGen's agent runtime also emits a span per message it routes. They say
+little about where a turn's time goes, so the local provider makes them
+transparent: their children attach to the enclosing span.
+"""
+import contextlib
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+from opentelemetry import trace
+from opentelemetry.trace import (
+    NonRecordingSpan,
+    SpanContext,
+    SpanKind,
+    Status,
+    StatusCode,
+    TraceFlags,
+    use_span,
+)
+
+from common.rate_limiter import take_priority
+
+TRANSPARENT_TRACERS = ("autogen SingleThreadedAgentRuntime",)
+_MODEL = re.compile(rb'"model"\s*:\s*"([^"\\]*)"')  # a string value: tool schemas may have a "model" property
+
+_ids = random.Random()
+
+if hasattr(os, "register_at_fork"):
+    # forked workers must not draw the same trace and span IDs
+    os.register_at_fork(after_in_child=_ids.seed)
+
+
+class RecordedSpan(trace.Span):
+    """A span that hands itself to its provider's exporters when it ends."""
+
+    def __init__(self, provider, name, context, parent, kind, attributes, start_time):
+        self._provider = provider
+        self.name = name
+        self.context = context
+        self.parent_id = parent.span_id if parent is not None and parent.is_valid else None
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = Status(StatusCode.UNSET)
+        self.start_time = start_time or time.time_ns()
+        self.end_time = None
+
+    def get_span_context(self):
+        return self.context
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, attributes=None, timestamp=None):
+        self.events.append({"name": name, "time": timestamp or time.time_ns(), "attributes": dict(attributes or {})})
+
+    def update_name(self, name):
+        self.name = name
+
+    def is_recording(self):
+        return self.end_time is None
+
+    def set_status(self, status, description=None):
+        self.status = status if isinstance(status, Status) else Status(status, description)
+
+    def record_exception(self, exception, attributes=None, timestamp=None, escaped=False):
+        self.add_event(
+            "exception",
+            {"exception.type": type(exception).__name__, "exception.message": str(exception), **(attributes or {})},
+            timestamp,
+        )
+
+    def end(self, end_time=None):
+        if self.end_time is None:
+            self.end_time = end_time or time.time_ns()
+            self._provider.export(self)
+
+    @property
+    def duration(self):
+        """Seconds from start to end (or to now, while the span is open)."""
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": f"{self.context.trace_id:032x}",
+            "span_id": f"{self.context.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "kind": self.kind.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status.status_code.name,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class LocalTracer(trace.Tracer):
+    def __init__(self, provider, transparent=False):
+        self._provider = provider
+        self._transparent = transparent
+
+    def start_span(
+        self, name, context=None, kind=SpanKind.INTERNAL, attributes=None, links=None, start_time=None,
+        record_exception=True, set_status_on_exception=True,
+    ):
+        parent = trace.get_current_span(context).get_span_context()
+        if self._transparent:
+            return NonRecordingSpan(parent)
+        if parent.is_valid:
+            trace_id = parent.trace_id
+        else:
+            trace_id, parent = _ids.getrandbits(128), None
+        span_context = SpanContext(trace_id, _ids.getrandbits(64), is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED))
+        return RecordedSpan(self._provider, name, span_context, parent, kind, attributes, start_time)
+
+    @contextlib.contextmanager
+    def start_as_current_span(
+        self, name, context=None, kind=SpanKind.INTERNAL, attributes=None, links=None, start_time=None,
+        record_exception=True, set_status_on_exception=True, end_on_exit=True,
+    ):
+        span = self.start_span(name, context, kind, attributes, links, start_time)
+        with use_span(
+            span, end_on_exit=end_on_exit, record_exception=record_exception,
+            set_status_on_exception=set_status_on_exception,
+        ) as current:
+            yield current
+
+
+class LocalTracerProvider(trace.TracerProvider):
+    """A tracer provider that passes finished spans to ``exporters`` (callables taking a ``RecordedSpan``)."""
+
+    def __init__(self, *exporters, transparent=TRANSPARENT_TRACERS):
+        self.exporters = list(exporters)
+        self.transparent = transparent
+
+    def get_tracer(self, instrumenting_module_name, *args, **kwargs):
+        return LocalTracer(self, transparent=instrumenting_module_name in self.transparent)
+
+    def export(self, span):
+        for exporter in self.exporters:
+            exporter(span)
+
+
+class JsonlExporter:
+    """Append every finished span to ``path`` as one JSON line."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        self._file.close()
+
+
+class InMemoryCollector:
+    """Keep finished spans in memory, for demos and benchmarks to inspect."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def by_name(self):
+        """``{span name: [durations in seconds]}``, with ``chat <model>``, ``execute_tool <tool>``... grouped by kind."""
+        groups = defaultdict(list)
+        for span in self.spans:
+            groups[_group(span.name)].append(span.duration)
+        return groups
+
+    def format_summary(self):
+        """One line per kind of span: count, total, median and p95 duration."""
+        lines = [f"{'span':<28} {'count':>6} {'total':>10} {'p50':>9} {'p95':>9}"]
+        for name, durations in sorted(self.by_name().items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(durations)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"{name:<28} {len(ordered):>6} {sum(ordered) * 1000:7.0f} ms"
+                f" {statistics.median(ordered) * 1000:6.1f} ms {p95 * 1000:6.1f} ms"
+            )
+        model = [span for span in self.spans if span.name.startswith("chat ")]
+        if model:
+            lines.append(
+                f"model requests: {sum(span.attributes.get('gen_ai.usage.input_tokens', 0) for span in model)} input tokens, "
+                f"{sum(span.attributes.get('gen_ai.usage.output_tokens', 0) for span in model)} output tokens, "
+                f"{sum(span.attributes.get('rate_limit.queue_wait_ms', 0) for span in model):.0f} ms queued"
+            )
+        return "\n".join(lines)
+
+    def format_tree(self, trace_id=None):
+        """The spans of one trace (the last one to finish by default) as an indented tree with durations."""
+        spans = list(self.spans)
+        if not spans:
+            return ""
+        trace_id = trace_id if trace_id is not None else spans[-1].context.trace_id
+        children = defaultdict(list)
+        for span in spans:
+            if span.context.trace_id == trace_id:
+                children[span.parent_id].append(span)
+        ids = {span.context.span_id for group in children.values() for span in group}
+        # spans whose parent never finished (or was not recorded) are shown as roots
+        roots = [span for parent, group in children.items() if parent is None or parent not in ids for span in group]
+        lines = []
+
+        def walk(span, depth):
+            details = "".join(
+                f" {key.rsplit('.', 1)[-1]}={_short(span.attributes[key])}" for key in _TREE_ATTRIBUTES if key in span.attributes
+            )
+            lines.append(f"{'  ' * depth}{span.name:<{max(1, 40 - 2 * depth)}} {span.duration * 1000:8.1f} ms{details}")
+            for child in sorted(children[span.context.span_id], key=lambda child: child.start_time):
+                walk(child, depth + 1)
+
+        for root in sorted(roots, key=lambda span: span.start_time):
+            walk(root, 0)
+        return "\n".join(lines)
+
+
+_TREE_ATTRIBUTES = (
+    "request.priority",
+    "rate_limit.queue_wait_ms",
+    "gen_ai.response.time_to_first_token_ms",
+    "gen_ai.usage.input_tokens",
+    "gen_ai.usage.output_tokens",
+    "completion_cache.hit",
+    "handoff.to",
+)
+
+
+def _short(value):
+    return f"{value:.1f}" if isinstance(value, float) else value
+
+
+def _group(name):
+    kind, _, _ = name.partition(" ")
+    return kind if kind in ("chat", "execute_tool", "invoke_agent", "create_agent") else name
+
+
+class _TracedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass a response body through; note the first chunk and end the span with the usage once it is closed."""
+
+    def __init__(self, stream, span, started, streaming):
+        self._stream = stream
+        self._span = span
+        self._started = started
+        self._streaming = streaming
+        self._chunks = []
+
+    def _seen(self, chunk):
+        if self._streaming and not self._chunks and chunk:
+            self._span.set_attribute("gen_ai.response.time_to_first_token_ms", (time.perf_counter() - self._started) * 1000)
+        self._chunks.append(chunk)
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._seen(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._seen(chunk)
+            yield chunk
+
+    def _finish(self):
+        if self._span.is_recording():
+            _record_usage(self._span, b"".join(self._chunks), self._streaming)
+            self._span.end()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+def request_model(body):
+    """The ``model`` of a chat completion request body, without parsing the whole (ever growing) body."""
+    match = _MODEL.search(body or b"")
+    return match.group(1).decode() if match else ""
+
+
+def completion_usage(body, streaming):
+    """``(model, usage)`` of a chat completion response body; streams carry usage only if asked to."""
+    reply = None
+    try:
+        if not streaming:
+            reply = json.loads(body)
+        else:
+            # the usage (if requested) is in the last chunk that has one
+            for line in reversed(body.splitlines()):
+                if line.startswith(b"data: {") and b'"usage"' in line:
+                    reply = json.loads(line[6:])
+                    if reply.get("usage"):
+                        break
+    except ValueError:
+        return None, {}
+    if not isinstance(reply, dict):
+        return None, {}
+    return reply.get("model"), reply.get("usage") or {}
+
+
+def _record_usage(span, body, streaming):
+    model, usage = completion_usage(body, streaming)
+    if model:
+        span.set_attribute("gen_ai.response.model", model)
+    if usage.get("prompt_tokens") is not None:
+        span.set_attribute("gen_ai.usage.input_tokens", usage["prompt_tokens"])
+    if usage.get("completion_tokens") is not None:
+        span.set_attribute("gen_ai.usage.output_tokens", usage["completion_tokens"])
+
+
+class TracingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport opening a ``chat <model>`` span for each ``POST .../chat/completions``."""
+
+    def __init__(self, transport, tracer=None):
+        self.transport = transport
+        self.tracer = tracer or trace.get_tracer(__name__)
+
+    def _start(self, request):
+        """A span for a chat completion request, or None when nothing is recording."""
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return None
+        # this is the outermost layer that is always there, so the header never reaches the API
+        priority = take_priority(request)
+        span = self.tracer.start_span("chat", kind=SpanKind.CLIENT)
+        if not span.is_recording():
+            return None  # no provider installed: skip reading the body
+        model = request_model(request.content)
+        span.update_name(f"chat {model}")
+        span.set_attributes({"gen_ai.operation.name": "chat", "gen_ai.request.model": model})
+        if priority is not None:
+            span.set_attribute("request.priority", priority)
+        return span
+
+    @staticmethod
+    def _failed(span, error):
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+
+    @staticmethod
+    def _traced(response, span, started):
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 400:
+            span.set_status(Status(StatusCode.ERROR, f"HTTP {response.status_code}"))
+        if response.headers.get("x-completion-cache") == "hit":
+            span.set_attribute("completion_cache.hit", True)
+        streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+        response.stream = _TracedStream(response.stream, span, started, streaming)
+        return response
+
+    def handle_request(self, request):
+        span, started = self._start(request), time.perf_counter()
+        if span is None:
+            return self.transport.handle_request(request)
+        with use_span(span, end_on_exit=False):
+            try:
+                response = self.transport.handle_request(request)
+            except BaseException as e:
+                self._failed(span, e)
+                raise
+        return self._traced(response, span, started)
+
+    async def handle_async_request(self, request):
+        span, started = self._start(request), time.perf_counter()
+        if span is None:
+            return await self.transport.handle_async_request(request)
+        # inner transports (the rate limiter) annotate the current span
+        with use_span(span, end_on_exit=False):
+            try:
+                response = await self.transport.handle_async_request(request)
+            except BaseException as e:
+                self._failed(span, e)
+                raise
+        return self._traced(response, span, started)
+
+    def close(self):
+        self.transport.close()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+_from_env = False
+
+
+def tracing_enabled():
+    return os.getenv("TRACE", "off").strip().lower() not in ("", "off", "0", "false")
+
+
+def install(*exporters):
+    """Make a ``LocalTracerProvider`` with ``exporters`` the global tracer provider; returns the first exporter.
+
+    OpenTelemetry lets a process set its provider only once, so later calls
+    add their exporters to the installed provider.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = LocalTracerProvider()
+            trace.set_tracer_provider(_provider)
+        _provider.exporters.extend(exporters)
+    return exporters[0] if exporters else None
+
+
+def setup_from_env():
+    """Install the provider ``TRACE`` asks for, once; a no-op when ``TRACE`` is off."""
+    global _from_env
+    with _provider_lock:
+        if not tracing_enabled() or _from_env:
+            return
+        _from_env = True
+    target = os.environ["TRACE"].strip()
+    install(InMemoryCollector() if target.lower() == "memory" else JsonlExporter(target))
+
+
+def get_collector():
+    """The installed ``InMemoryCollector`` (e.g. with ``TRACE=memory``), or None."""
+    for exporter in _provider.exporters if _provider is not None else ():
+        if isinstance(exporter, InMemoryCollector):
+            return exporter
+    return None
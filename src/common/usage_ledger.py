@@ -0,0 +1,442 @@
+"""
+Cumulative token and cost ledger for every model call, with per-conversation budgets.
+
+``LedgerTransport`` sits in the shared HTTP stack (``common/http_pool.py``),
+so it sees every chat completion whichever framework sent it. It records the
+usage the API reports, the cost from ``PRICES`` and the request's latency,
+attributed to:
+
+* the conversation, from ``usage_scope(conversation=...)`` around the run
+  (``batch_runner`` opens one per record). The scope is a context variable,
+  so it follows the run into AutoGen's runtime tasks;
+* the agent, from ``usage_scope(agent=...)`` (the Swarm loops set it for each
+  request) or else the agent of the enclosing ``invoke_agent`` span, which is
+  how AutoGen agents are told apart (see ``common/tracing.py``);
+* the kind of call: ``agent``, or the request's priority class
+  (``selector``, ``reflection``, ``background``; see ``common/rate_limiter.py``).
+
+Tool calls are counted from their ``execute_tool`` spans, with their
+duration. Cache hits are counted but cost nothing.
+
+Every conversation has a budget, in tokens and/or dollars:
+
+* past the soft limit, requests for a model in ``DOWNGRADES`` are sent to the
+  cheaper model instead (OpenAI-style backends; Azure routes by deployment);
+* past the hard limit, ``check_budget()`` raises ``BudgetExceeded``. The Swarm
+  loops call it before every model request, AutoGen teams can stop cleanly
+  with ``autogen/usage_budget.BudgetTermination``, and any other request is
+  answered with an HTTP 400 (``budget_exceeded``) that the SDK does not retry.
+
+    USAGE_LEDGER=on
+    USAGE_SOFT_USD=0.50          # per conversation; also USAGE_SOFT_TOKENS
+    USAGE_HARD_USD=2.00          # per conversation; also USAGE_HARD_TOKENS
+    USAGE_EXPORT=usage.jsonl     # write the ledger at exit (.jsonl or .csv)
+
+``get_ledger().format_report("agent")`` shows which agents dominate spend and
+latency; ``export(path)`` writes one row per (conversation, agent, kind, model).
+"""
+import atexit
+import contextlib
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+import httpx
+from opentelemetry import trace
+
+from common.rate_limiter import PRIORITY_HEADER
+from common.tracing import completion_usage, install, request_model
+
+# USD per million (input, output) tokens; the longest matching prefix of the model name wins
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "o1": (15.00, 60.00),
+    "o3": (2.00, 8.00),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+}
+DOWNGRADES = {
+    "gpt-4o": "gpt-4o-mini",
+    "gpt-4.1": "gpt-4.1-mini",
+    "gpt-4.1-mini": "gpt-4.1-nano",
+    "o1": "o3-mini",
+    "o3": "o4-mini",
+}
+DEFAULT_CONVERSATION = "-"
+DIMENSIONS = ("conversation", "agent", "kind", "model")
+COUNTERS = ("requests", "cached", "input_tokens", "output_tokens", "cost_usd", "seconds")
+
+_scope = contextvars.ContextVar("usage_scope", default=(None, None))
+
+
+class BudgetExceeded(Exception):
+    """A conversation spent past its hard budget."""
+
+
+class Budget(NamedTuple):
+    """Per-conversation limits; None means no limit."""
+
+    soft_tokens: Optional[int] = None
+    hard_tokens: Optional[int] = None
+    soft_usd: Optional[float] = None
+    hard_usd: Optional[float] = None
+
+    def exceeded(self, tokens, cost, hard):
+        tokens_limit, usd_limit = (self.hard_tokens, self.hard_usd) if hard else (self.soft_tokens, self.soft_usd)
+        return (tokens_limit is not None and tokens >= tokens_limit) or (usd_limit is not None and cost >= usd_limit)
+
+
+@contextlib.contextmanager
+def usage_scope(conversation=None, agent=None):
+    """Attribute model calls made inside the block (and tasks started from it) to ``conversation``/``agent``.
+
+    Arguments left out are inherited from an enclosing scope.
+    """
+    outer_conversation, outer_agent = _scope.get()
+    token = _scope.set((conversation or outer_conversation, agent or outer_agent))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_conversation():
+    """The conversation of the enclosing ``usage_scope``, or None."""
+    return _scope.get()[0]
+
+
+def price_of(model):
+    """``(input, output)`` USD per million tokens for ``model`` (e.g. ``gpt-4o-2024-08-06``), or None."""
+    best = None
+    for name in PRICES:
+        if model.startswith(name) and (best is None or len(name) > len(best)):
+            best = name
+    return PRICES[best] if best is not None else None
+
+
+def _current_agent():
+    # AutoGen runs an agent's model calls inside its ``invoke_agent`` span
+    attributes = getattr(trace.get_current_span(), "attributes", None) or {}
+    return attributes.get("gen_ai.agent.name")
+
+
+class UsageLedger:
+    """Counters keyed by (conversation, agent, kind, model), plus per-conversation totals for budget checks."""
+
+    def __init__(self, budget=None, prices=None, downgrades=None):
+        self.budget = budget or Budget()
+        self.prices = PRICES if prices is None else prices
+        self.downgrades = DOWNGRADES if downgrades is None else downgrades
+        self._budgets = {}
+        self._rows = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0.0])  # COUNTERS
+        self._tools = defaultdict(lambda: [0, 0.0])  # (conversation, agent, tool) -> [calls, seconds]
+        self._totals = defaultdict(lambda: [0, 0.0])  # conversation -> [tokens, cost]
+        self.unpriced = set()
+        self._lock = threading.Lock()
+
+    def set_budget(self, conversation, budget):
+        """Give ``conversation`` its own budget instead of the ledger's default."""
+        self._budgets[conversation] = budget
+
+    def record(self, model, input_tokens, output_tokens, seconds, conversation=None, agent=None, kind="agent", cached=False):
+        prices = price_of(model) if not cached else (0.0, 0.0)
+        if prices is None:
+            self.unpriced.add(model)
+            prices = (0.0, 0.0)
+        cost = (input_tokens * prices[0] + output_tokens * prices[1]) / 1e6
+        conversation = conversation or DEFAULT_CONVERSATION
+        with self._lock:
+            row = self._rows[conversation, agent or "-", kind, model]
+            row[0] += 1
+            row[1] += cached
+            row[2] += input_tokens
+            row[3] += output_tokens
+            row[4] += cost
+            row[5] += seconds
+            totals = self._totals[conversation]
+            totals[0] += input_tokens + output_tokens
+            totals[1] += cost
+
+    def record_tool(self, tool, seconds, conversation=None, agent=None):
+        with self._lock:
+            row = self._tools[conversation or DEFAULT_CONVERSATION, agent or "-", tool]
+            row[0] += 1
+            row[1] += seconds
+
+    def spent(self, conversation=None):
+        """``(tokens, cost in USD)`` spent by ``conversation`` so far."""
+        tokens, cost = self._totals.get(conversation or DEFAULT_CONVERSATION, (0, 0.0))
+        return tokens, cost
+
+    def state(self, conversation=None):
+        """``"ok"``, ``"soft"`` (past the soft limit) or ``"hard"`` for ``conversation``."""
+        budget = self._budgets.get(conversation or DEFAULT_CONVERSATION, self.budget)
+        tokens, cost = self.spent(conversation)
+        if budget.exceeded(tokens, cost, hard=True):
+            return "hard"
+        if budget.exceeded(tokens, cost, hard=False):
+            return "soft"
+        return "ok"
+
+    def check(self, conversation=None):
+        """Raise ``BudgetExceeded`` if ``conversation`` is past its hard limit; returns its state otherwise."""
+        state = self.state(conversation)
+        if state == "hard":
+            tokens, cost = self.spent(conversation)
+            raise BudgetExceeded(
+                f"Conversation {conversation or DEFAULT_CONVERSATION!r} is over its hard budget "
+                f"({tokens} tokens, ${cost:.4f} spent)"
+            )
+        return state
+
+    def model_for(self, model, conversation=None):
+        """The model to call for ``conversation``: ``model``, or its downgrade past the soft limit."""
+        if self.state(conversation) == "ok":
+            return model
+        return self.downgrades.get(model, model)
+
+    def rows(self):
+        """One dict per (conversation, agent, kind, model) with its counters."""
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._rows.items()]
+        return [dict(zip(DIMENSIONS + COUNTERS, key + tuple(row))) for key, row in items]
+
+    def tool_rows(self):
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._tools.items()]
+        return [
+            {"conversation": key[0], "agent": key[1], "tool": key[2], "calls": row[0], "seconds": row[1]}
+            for key, row in items
+        ]
+
+    def aggregate(self, *dimensions):
+        """Counters summed over every dimension not in ``dimensions``, e.g. ``aggregate("agent")``."""
+        groups = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        for row in self.rows():
+            group = groups[tuple(row[name] for name in dimensions)]
+            for name in COUNTERS:
+                group[name] += row[name]
+        return dict(groups)
+
+    def format_report(self, *dimensions):
+        """A table of spend and model latency by ``dimensions`` (default: agent and kind), costliest first."""
+        dimensions = dimensions or ("agent", "kind")
+        groups = sorted(self.aggregate(*dimensions).items(), key=lambda item: (-item[1]["cost_usd"], -item[1]["seconds"]))
+        tools = defaultdict(lambda: [0, 0.0])
+        for row in self.tool_rows():
+            tools[row["tool"]][0] += row["calls"]
+            tools[row["tool"]][1] += row["seconds"]
+        labels = [" / ".join(map(str, key)) for key, _ in groups] + ["tool " + tool for tool in tools]
+        width = max([36, *map(len, labels)])
+        lines = [
+            f"{' / '.join(dimensions):<{width}} {'calls':>6} {'cached':>6} {'in tok':>9} {'out tok':>8} {'cost':>10} {'model time':>11}"
+        ]
+        for label, (_, group) in zip(labels, groups):
+            lines.append(
+                f"{label:<{width}} {group['requests']:>6} {group['cached']:>6} {group['input_tokens']:>9}"
+                f" {group['output_tokens']:>8} ${group['cost_usd']:>9.4f} {group['seconds']:>9.2f} s"
+            )
+        for tool, (calls, seconds) in sorted(tools.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{'tool ' + tool:<{width}} {calls:>6} {'':>6} {'':>9} {'':>8} {'':>10} {seconds:>9.2f} s")
+        if self.unpriced:
+            lines.append(f"(no price for {', '.join(sorted(self.unpriced))}; counted as $0)")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write ``rows()`` (and the tool rows, marked ``"kind": "tool"``) as JSON lines, or CSV for a ``.csv`` path."""
+        rows = self.rows() + [
+            {"conversation": row["conversation"], "agent": row["agent"], "kind": "tool", "model": row["tool"],
+             "requests": row["calls"], "seconds": row["seconds"]}
+            for row in self.tool_rows()
+        ]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=DIMENSIONS + COUNTERS, restval=0)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+
+    def __call__(self, span):
+        """Span exporter side: count tool calls (Swarm's and AutoGen's) from their ``execute_tool`` spans."""
+        if span.name.startswith("execute_tool "):
+            conversation, agent = _scope.get()
+            tool = span.attributes.get("gen_ai.tool.name") or span.name.partition(" ")[2]
+            agent = span.attributes.get("gen_ai.agent.name") or agent or _current_agent()
+            self.record_tool(tool, span.duration, conversation, agent)
+
+
+class _Recorded(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass a response body through, keeping a copy; report it once the response is closed."""
+
+    def __init__(self, stream, report):
+        self._stream = stream
+        self._report = report
+        self._chunks = []
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+
+    def _done(self):
+        if self._report is not None:
+            report, self._report = self._report, None
+            report(b"".join(self._chunks))
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._done()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._done()
+
+
+class LedgerTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """An httpx transport charging every ``POST .../chat/completions`` to a ``UsageLedger``."""
+
+    def __init__(self, transport, ledger):
+        self.transport = transport
+        self.ledger = ledger
+
+    def _prepare(self, request):
+        """``(request to send, or a budget refusal response, and its attribution)``."""
+        conversation, agent = _scope.get()
+        attribution = {
+            "conversation": conversation,
+            "agent": agent or _current_agent(),
+            "kind": request.headers.get(PRIORITY_HEADER) or request.extensions.get("priority") or "agent",
+        }
+        state = self.ledger.state(conversation)
+        if state == "hard":
+            try:
+                self.ledger.check(conversation)
+            except BudgetExceeded as e:
+                # an exception here would be retried by the SDK as a connection error
+                return httpx.Response(
+                    400, json={"error": {"message": str(e), "type": "budget_exceeded"}}, request=request
+                ), attribution
+        if state == "soft":
+            model = request_model(request.content)
+            cheaper = self.ledger.downgrades.get(model)
+            if cheaper:
+                body = json.loads(request.content)
+                body["model"] = cheaper
+                headers = [(name, value) for name, value in request.headers.raw if name.lower() != b"content-length"]
+                request = httpx.Request(
+                    request.method, request.url, headers=headers, json=body, extensions=request.extensions
+                )
+        return request, attribution
+
+    def _charge(self, request, response, attribution, started):
+        streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+        cached = response.headers.get("x-completion-cache") == "hit"
+
+        def report(body):
+            if response.status_code != 200:
+                return
+            model, usage = completion_usage(body, streaming)
+            self.ledger.record(
+                model or request_model(request.content),
+                usage.get("prompt_tokens") or 0,
+                usage.get("completion_tokens") or 0,
+                time.perf_counter() - started,
+                cached=cached,
+                **attribution,
+            )
+
+        response.stream = _Recorded(response.stream, report)
+        return response
+
+    def handle_request(self, request):
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return self.transport.handle_request(request)
+        started = time.perf_counter()
+        request, attribution = self._prepare(request)
+        if isinstance(request, httpx.Response):
+            return request
+        return self._charge(request, self.transport.handle_request(request), attribution, started)
+
+    async def handle_async_request(self, request):
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return await self.transport.handle_async_request(request)
+        started = time.perf_counter()
+        request, attribution = self._prepare(request)
+        if isinstance(request, httpx.Response):
+            return request
+        return self._charge(request, await self.transport.handle_async_request(request), attribution, started)
+
+    def close(self):
+        self.transport.close()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def ledger_enabled():
+    return os.getenv("USAGE_LEDGER", "off").strip().lower() in ("on", "1", "true")
+
+
+def _env_number(name, cast):
+    value = os.getenv(name, "").strip()
+    return cast(value) if value else None
+
+
+def get_ledger():
+    """The process-wide ``UsageLedger``, configured from the environment on first use."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger(
+                Budget(
+                    soft_tokens=_env_number("USAGE_SOFT_TOKENS", int),
+                    hard_tokens=_env_number("USAGE_HARD_TOKENS", int),
+                    soft_usd=_env_number("USAGE_SOFT_USD", float),
+                    hard_usd=_env_number("USAGE_HARD_USD", float),
+                )
+            )
+            # tool calls and AutoGen's agent names come from spans
+            install(_ledger)
+            export = os.getenv("USAGE_EXPORT", "").strip()
+            if export:
+                atexit.register(_ledger.export, export)
+        return _ledger
+
+
+def check_budget():
+    """``UsageLedger.check`` for the current scope's conversation; a no-op unless ``USAGE_LEDGER`` is on."""
+    if ledger_enabled():
+        return get_ledger().check(current_conversation())
+    return "ok"
+
+
+def conversation_usage(conversation):
+    """``{"tokens", "cost_usd"}`` spent by ``conversation``, or None unless ``USAGE_LEDGER`` is on."""
+    if not ledger_enabled():
+        return None
+    tokens, cost = get_ledger().spent(conversation)
+    return {"tokens": tokens, "cost_usd": round(cost, 6)}
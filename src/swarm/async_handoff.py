@@ -0,0 +1,474 @@
+from openai import AsyncStream
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.trace import StatusCode, use_span
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.backend import create_openai_client
+from common.usage_ledger import BudgetExceeded, check_budget, usage_scope
+from handoff import Agent, Response, tool_span_attributes, trace_handoff, triage_agent
+from history import MessageStore
+from tool_registry import ToolArgumentError, get_tool_table
+
+load_dotenv()
+client = create_openai_client(async_client=True)
+tracer = trace.get_tracer(__name__)  # see common/tracing.py
+
+# blocking tools (look_up_item, execute_refund, ...) run here when tool calls are parallel
+tool_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="swarm-tool")
+
+
+async def run_full_turn(agent, messages, parallel_tool_calls=False):
+    """Async twin of ``handoff.run_full_turn``.
+
+    Same ``Agent`` in, same ``Response`` out, but the model round-trip is awaited
+    so a single event loop can drive many conversations at once. With
+    ``parallel_tool_calls=True`` the tool calls of one message are dispatched
+    together instead of one after another.
+
+    ``messages`` may also be a ``history.MessageStore``: the turn's messages are
+    then appended to it in place (callers must not extend it again) and each
+    request only carries the store's current window.
+    """
+
+    with tracer.start_as_current_span("turn", attributes={"gen_ai.agent.name": agent.name}) as span:
+        current_agent = agent
+        num_init_messages = len(messages)
+        if not isinstance(messages, MessageStore):
+            messages = messages.copy()
+
+        while True:
+
+            # tool schemas and the reverse map are compiled once per agent
+            tool_table = get_tool_table(current_agent)
+
+            # === 1. get openai completion ===
+            # the body is serialized here so the agent's tool JSON is spliced in as-is
+            # instead of being re-validated and re-encoded by the SDK on every call
+            check_budget()  # raises BudgetExceeded once the conversation is over its hard budget
+            with usage_scope(agent=current_agent.name):
+                response = await client.post(
+                    "/chat/completions",
+                    body=encode_chat_request(current_agent, messages, tool_table),
+                    cast_to=ChatCompletion,
+                )
+            message = response.choices[0].message
+            messages.append(message)
+
+            if message.content:  # print agent response
+                print(f"{current_agent.name}:", message.content)
+
+            if not message.tool_calls:  # if finished handling tool calls, break
+                break
+
+            # === 2. handle tool calls ===
+
+            if parallel_tool_calls:
+                results = await execute_tool_calls(message.tool_calls, tool_table, current_agent.name)
+            else:
+                results = [
+                    await execute_tool_call(tool_call, tool_table, current_agent.name)
+                    for tool_call in message.tool_calls
+                ]
+
+            # results are in tool call order, so the last transfer wins exactly as it
+            # would if the calls had run sequentially
+            for tool_call, result in zip(message.tool_calls, results):
+                if type(result) is Agent:  # if agent transfer, update current agent
+                    current_agent = result
+                    result = (
+                        f"Transfered to {current_agent.name}. Adopt persona immediately."
+                    )
+
+                result_message = {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": result,
+                }
+                messages.append(result_message)
+
+        # ==== 3. return last agent used and new messages =====
+        span.set_attribute("swarm.final_agent", current_agent.name)
+        return Response(agent=current_agent, messages=messages[num_init_messages:])
+
+
+class ContentDelta(NamedTuple):
+    """A piece of assistant text, yielded by ``run_full_turn_stream`` as it arrives."""
+
+    agent_name: str
+    content: str
+
+
+class MessageComplete(NamedTuple):
+    """The assembled assistant message once its stream has finished."""
+
+    agent_name: str
+    message: dict
+
+
+async def run_full_turn_stream(agent, messages, speculative_handoffs=False):
+    """Streaming variant of ``run_full_turn``.
+
+    An async generator that yields ``ContentDelta`` events while the model is
+    still generating, a ``MessageComplete`` after every model message and finally
+    the same ``Response`` that ``run_full_turn`` returns. Streamed tool call
+    fragments are assembled as they come in and each call is started as soon as
+    its arguments are complete (when the next call begins or the stream ends),
+    so tools overlap with the rest of the generation.
+
+    With ``speculative_handoffs=True``, a message that opens with a call to a
+    handoff tool (one annotated ``-> Agent``) starts the target agent's first
+    completion as soon as the call's name arrives, while the rest of the
+    message is still streaming. If the message turns out to be just that
+    handoff, the target's reply is already under way. Otherwise the request is
+    cancelled and its tokens are wasted. Only handoff tools that need no
+    arguments are speculated on; they are called early to find their target,
+    so they must not have side effects.
+    """
+
+    # the span is made current only around the model request and when tool
+    # calls start, never across a yield, so it cannot leak into the consumer
+    turn = tracer.start_span("turn", attributes={"gen_ai.agent.name": agent.name})
+    speculation = None
+    try:
+        current_agent = agent
+        num_init_messages = len(messages)
+        if not isinstance(messages, MessageStore):
+            messages = messages.copy()
+
+        while True:
+
+            tool_table = get_tool_table(current_agent)
+
+            # === 1. stream openai completion ===
+            if speculation is not None:  # the handoff was confirmed and its reply is already streaming
+                stream, speculation = speculation.commit(), None
+            else:
+                check_budget()
+                with use_span(turn, end_on_exit=False), usage_scope(agent=current_agent.name):
+                    # the final chunk then carries the usage, for the trace and the usage ledger
+                    stream = await client.post(
+                        "/chat/completions",
+                        body=encode_chat_request(
+                            current_agent, messages, tool_table, stream=True, stream_options={"include_usage": True}
+                        ),
+                        cast_to=ChatCompletion,
+                        stream=True,
+                        stream_cls=AsyncStream[ChatCompletionChunk],
+                    )
+
+            content = []
+            fragments = []  # [id, name, [argument pieces]] per tool call index
+            started = []  # (tool_call, task) in call order
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+
+                    if delta.content:
+                        if speculation is not None:  # text besides the handoff: not a plain transfer
+                            speculation = speculation.discard()
+                        content.append(delta.content)
+                        yield ContentDelta(current_agent.name, delta.content)
+
+                    for piece in delta.tool_calls or ():
+                        while piece.index >= len(fragments):
+                            if fragments:  # a new call begins, so the previous one is complete
+                                started.append(_start_tool_call(fragments[-1], tool_table, current_agent.name, turn))
+                                if speculation is not None:  # more than one call
+                                    speculation = speculation.discard()
+                            elif speculative_handoffs and not content:
+                                speculation = _speculate(current_agent, messages, tool_table, piece, turn)
+                            fragments.append([piece.id, piece.function.name, []])
+                        if piece.function and piece.function.arguments:
+                            fragments[piece.index][2].append(piece.function.arguments)
+
+                if fragments:
+                    started.append(_start_tool_call(fragments[-1], tool_table, current_agent.name, turn))
+
+                message = {"role": "assistant", "content": "".join(content) or None}
+                if started:
+                    message["tool_calls"] = [tool_call.model_dump(mode="json") for tool_call, _ in started]
+                if speculation is not None:
+                    if speculation.matches(message):
+                        # the history must be exactly what the prefetched request was sent with
+                        message = speculation.message
+                    else:
+                        speculation = speculation.discard()
+                messages.append(message)
+                yield MessageComplete(current_agent.name, message)
+
+                if not started:  # if finished handling tool calls, break
+                    break
+
+                # === 2. collect tool results in call order ===
+
+                for tool_call, task in started:
+                    result = await task
+
+                    if type(result) is Agent:  # if agent transfer, update current agent
+                        current_agent = result
+                        result = (
+                            f"Transfered to {current_agent.name}. Adopt persona immediately."
+                        )
+
+                    result_message = {
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": result,
+                    }
+                    messages.append(result_message)
+            finally:
+                # a failed stream or tool, or the consumer closing the stream, must not leave tools running
+                await _cancel_unfinished(task for _, task in started)
+
+            if speculation is not None and speculation.target is not current_agent:
+                speculation = speculation.discard()
+
+        # ==== 3. return last agent used and new messages =====
+        turn.set_attribute("swarm.final_agent", current_agent.name)
+        yield Response(agent=current_agent, messages=messages[num_init_messages:])
+    finally:
+        if speculation is not None:
+            speculation.discard()
+        turn.end()
+
+
+class _Speculation:
+    """A handoff target's first completion, requested before the handoff is confirmed."""
+
+    def __init__(self, target, message, span, task, chunks):
+        self.target = target
+        self.message = message  # the handoff message the request assumed
+        self.span = span
+        self.task = task
+        self._chunks = chunks
+
+    def matches(self, message):
+        """Whether the router's finished ``message`` is the handoff this request assumed."""
+        calls = message.get("tool_calls") or ()
+        if message["content"] is not None or len(calls) != 1:
+            return False
+        expected = self.message["tool_calls"][0]
+        try:
+            arguments = json.loads(calls[0]["function"]["arguments"] or "{}")
+        except ValueError:
+            return False
+        return calls[0]["id"] == expected["id"] and calls[0]["function"]["name"] == expected["function"]["name"] and arguments == {}
+
+    def commit(self):
+        """The target's stream of chunks, as ``client.post`` would return it."""
+        self.span.set_attribute("speculation.outcome", "committed")
+        self.span.end()
+        return self._stream()
+
+    def discard(self):
+        self.task.cancel()
+        self.span.set_attribute("speculation.outcome", "discarded")
+        self.span.end()
+        return None
+
+    async def _stream(self):
+        try:
+            while (chunk := await self._chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            self.task.cancel()
+
+
+def _speculate(agent, messages, tool_table, piece, turn):
+    """Start the first completion of the agent ``piece`` (the first tool call fragment) hands off to, or None."""
+    name = piece.function.name
+    if tool_table.returns.get(name) is not Agent:
+        return None
+    tool_call = ChatCompletionMessageToolCall(id=piece.id, type="function", function=Function(name=name, arguments="{}"))
+    try:
+        # only handoffs that take no arguments can be predicted before the arguments arrive
+        func, args = tool_table.decode_arguments(tool_call)
+        target = func(**args)
+    except Exception:
+        return None  # the real call reports whatever went wrong
+    if type(target) is not Agent:
+        return None
+    try:
+        check_budget()
+    except BudgetExceeded:
+        return None  # the turn itself stops at its next request
+
+    message = {"role": "assistant", "content": None, "tool_calls": [tool_call.model_dump(mode="json")]}
+    result_message = {
+        "role": "tool",
+        "tool_call_id": piece.id,
+        "content": f"Transfered to {target.name}. Adopt persona immediately.",
+    }
+    body = encode_chat_request(
+        target, messages, get_tool_table(target), extra=(message, result_message),
+        stream=True, stream_options={"include_usage": True},
+    )
+    chunks = asyncio.Queue()
+    with use_span(turn, end_on_exit=False):
+        span = tracer.start_span("speculative_handoff", attributes={"handoff.from": agent.name, "handoff.to": target.name})
+    with use_span(span, end_on_exit=False), usage_scope(agent=target.name):
+        task = asyncio.create_task(_prefetch(body, chunks))
+    return _Speculation(target, message, span, task, chunks)
+
+
+async def _prefetch(body, chunks):
+    try:
+        stream = await client.post(
+            "/chat/completions", body=body, cast_to=ChatCompletion, stream=True, stream_cls=AsyncStream[ChatCompletionChunk]
+        )
+        try:
+            async for chunk in stream:
+                chunks.put_nowait(chunk)
+        finally:
+            await stream.close()
+    except Exception as e:  # raised to the turn if the speculation is committed
+        chunks.put_nowait(e)
+    else:
+        chunks.put_nowait(None)
+
+
+async def _cancel_unfinished(tasks):
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+
+def _start_tool_call(fragment, tool_table, agent_name, turn):
+    call_id, name, arguments = fragment
+    tool_call = ChatCompletionMessageToolCall(
+        id=call_id, type="function", function=Function(name=name, arguments="".join(arguments))
+    )
+    with use_span(turn, end_on_exit=False):  # the task's tool span is a child of the turn
+        task = asyncio.create_task(execute_tool_call(tool_call, tool_table, agent_name, executor=tool_executor))
+    return tool_call, task
+
+
+def encode_chat_request(agent, messages, tool_table, extra=(), **params):
+    # a MessageStore hands over its pre-encoded window; plain lists are encoded here
+    if isinstance(messages, MessageStore):
+        if extra:  # the window must be chosen with them in it, as it will be once they are appended
+            messages = messages.copy()
+            messages.extend(extra)
+        history = messages.window_json()
+    else:
+        history = json.dumps(messages, default=_dump_sdk_message)[1:-1]
+        if extra:  # messages not in the history (yet), e.g. a speculated handoff
+            history = ", ".join(filter(None, [history, json.dumps(list(extra))[1:-1]]))
+
+    parts = [
+        json.dumps({"model": agent.model, **params})[:-1],
+        ', "messages": [',
+        json.dumps({"role": "system", "content": agent.instructions}),
+    ]
+    if history:
+        parts += [", ", history]
+    parts.append("]")
+    if tool_table.schemas_json is not None:
+        parts += [', "tools": ', tool_table.schemas_json]
+    parts.append("}")
+    return "".join(parts).encode()
+
+
+def _dump_sdk_message(message):
+    # ChatCompletionMessage objects from earlier rounds; dumped the way the SDK does it
+    return message.model_dump(mode="json", exclude_unset=True)
+
+
+async def execute_tool_call(tool_call, tool_table, agent_name, executor=None):
+    with tracer.start_as_current_span(
+        f"execute_tool {tool_call.function.name}", attributes=tool_span_attributes(tool_call, agent_name)
+    ) as span:
+        try:
+            func, args = tool_table.decode_arguments(tool_call)
+        except ToolArgumentError as e:
+            # malformed calls never reach the tool; the model sees the error and can retry
+            print(f"{agent_name}:", f"rejected tool call: {e}")
+            span.set_status(StatusCode.ERROR, str(e))
+            return f"Error: {e}"
+
+        print(f"{agent_name}:", f"{tool_call.function.name}({args})")
+
+        if executor is not None and not inspect.iscoroutinefunction(func):
+            # keep blocking tools off the event loop
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, functools.partial(func, **args))
+        else:
+            result = func(**args)  # call corresponding function with provided arguments
+            if inspect.isawaitable(result):  # coroutine tools are awaited in place
+                result = await result
+        if type(result) is Agent:
+            trace_handoff(agent_name, result.name)
+        return result
+
+
+async def execute_tool_calls(tool_calls, tool_table, agent_name):
+    """Run all tool calls of one message concurrently.
+
+    Coroutine tools are awaited together and sync tools share ``tool_executor``;
+    results are returned in the same order as ``tool_calls``.
+    """
+    return await asyncio.gather(
+        *(
+            execute_tool_call(tool_call, tool_table, agent_name, executor=tool_executor)
+            for tool_call in tool_calls
+        )
+    )
+
+
+async def main(stream=False, session_id=None, speculate=False):
+    agent = triage_agent
+    if session_id:
+        # history lives on disk and picks up where the session left off
+        from persistent_history import PersistentMessageStore
+
+        messages = PersistentMessageStore.open(".conversations", session_id)
+    else:
+        messages = []
+
+    while True:
+        # read input off the event loop so other conversations keep moving
+        user = await asyncio.to_thread(input, "User: ")
+        messages.append({"role": "user", "content": user})
+
+        if stream:
+            speaking = False
+            async for event in run_full_turn_stream(agent, messages, speculative_handoffs=speculate):
+                if isinstance(event, ContentDelta):
+                    if not speaking:
+                        print(f"{event.agent_name}: ", end="")
+                        speaking = True
+                    print(event.content, end="", flush=True)
+                elif isinstance(event, MessageComplete):
+                    if speaking:
+                        print()
+                    speaking = False
+                else:
+                    response = event
+        else:
+            response = await run_full_turn(agent, messages, parallel_tool_calls=True)
+        agent = response.agent
+        if not isinstance(messages, MessageStore):
+            messages.extend(response.messages)
+
+
+if __name__ == "__main__":
+    session_id = sys.argv[sys.argv.index("--session") + 1] if "--session" in sys.argv else None
+    asyncio.run(main(stream="--stream" in sys.argv, session_id=session_id, speculate="--speculate" in sys.argv))
@@ -0,0 +1,34 @@
+"""
+Run scripted ACME conversations through the asyncio Swarm loop in bulk.
+
+Each input line has an ``id`` and the customer's ``turns``; the result holds
+the agent the conversation ended with and the full transcript.
+
+    python src/swarm/batch_handoff.py conversations.jsonl results.jsonl --concurrency 64 --processes 4
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common import batch_runner
+from handoff import issues_and_repairs_agent, sales_agent, triage_agent
+from history import MessageStore
+import async_handoff
+
+AGENTS = {agent.name: agent for agent in (triage_agent, sales_agent, issues_and_repairs_agent)}
+
+
+async def run_conversation(record):
+    """Play ``record["turns"]``, starting at ``record["agent"]`` (the triage agent by default)."""
+    agent = AGENTS[record.get("agent", triage_agent.name)]
+    messages = MessageStore()
+    for user in record["turns"]:
+        messages.append({"role": "user", "content": user})
+        response = await async_handoff.run_full_turn(agent, messages)
+        agent = response.agent
+    return {"agent": agent.name, "messages": messages[:]}
+
+
+if __name__ == "__main__":
+    batch_runner.main(run_conversation, description=__doc__)
@@ -1,13 +1,21 @@
-from openai import OpenAI
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from typing import Optional
-import json
 from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.trace import StatusCode
 import os
-import inspect
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.backend import create_openai_client
+from common.tool_cache import cached_tool
+from common.usage_ledger import check_budget, usage_scope
+from tool_registry import ToolArgumentError, ToolTable, get_tool_table
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = create_openai_client()
+tracer = trace.get_tracer(__name__)  # see common/tracing.py
 
 
 class Agent(BaseModel):
@@ -15,6 +23,7 @@ class Agent(BaseModel):
     model: str = "gpt-4o-mini"
     instructions: str = "You are a helpful Agent"
     tools: list = []
+    _tool_table: Optional[ToolTable] = PrivateAttr(default=None)
 
 class Response(BaseModel):
     agent: Agent
@@ -22,108 +31,85 @@ class Response(BaseModel):
 
 def run_full_turn(agent, messages):
 
-    current_agent = agent
-    num_init_messages = len(messages)
-    messages = messages.copy()
+    with tracer.start_as_current_span("turn", attributes={"gen_ai.agent.name": agent.name}) as span:
+        current_agent = agent
+        num_init_messages = len(messages)
+        messages = messages.copy()
 
-    while True:
+        while True:
+
+            # tool schemas and the reverse map are compiled once per agent
+            tool_table = get_tool_table(current_agent)
 
-        # turn python functions into tools and save a reverse map
-        tool_schemas = [function_to_schema(tool) for tool in current_agent.tools]
-        tools = {tool.__name__: tool for tool in current_agent.tools}
+            # === 1. get openai completion ===
+            check_budget()  # raises BudgetExceeded once the conversation is over its hard budget
+            with usage_scope(agent=current_agent.name):
+                response = client.chat.completions.create(
+                    model=agent.model,
+                    messages=[{"role": "system", "content": current_agent.instructions}]
+                    + messages,
+                    tools=tool_table.schemas or None,
+                )
+            message = response.choices[0].message
+            messages.append(message)
 
-        # === 1. get openai completion ===
-        response = client.chat.completions.create(
-            model=agent.model,
-            messages=[{"role": "system", "content": current_agent.instructions}]
-            + messages,
-            tools=tool_schemas or None,
-        )
-        message = response.choices[0].message
-        messages.append(message)
+            if message.content:  # print agent response
+                print(f"{current_agent.name}:", message.content)
 
-        if message.content:  # print agent response
-            print(f"{current_agent.name}:", message.content)
+            if not message.tool_calls:  # if finished handling tool calls, break
+                break
 
-        if not message.tool_calls:  # if finished handling tool calls, break
-            break
+            # === 2. handle tool calls ===
 
-        # === 2. handle tool calls ===
+            for tool_call in message.tool_calls:
+                result = execute_tool_call(tool_call, tool_table, current_agent.name)
 
-        for tool_call in message.tool_calls:
-            result = execute_tool_call(tool_call, tools, current_agent.name)
+                if type(result) is Agent:  # if agent transfer, update current agent
+                    current_agent = result
+                    result = (
+                        f"Transfered to {current_agent.name}. Adopt persona immediately."
+                    )
+
+                result_message = {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": result,
+                }
+                messages.append(result_message)
+
+        # ==== 3. return last agent used and new messages =====
+        span.set_attribute("swarm.final_agent", current_agent.name)
+        return Response(agent=current_agent, messages=messages[num_init_messages:])
 
-            if type(result) is Agent:  # if agent transfer, update current agent
-                current_agent = result
-                result = (
-                    f"Transfered to {current_agent.name}. Adopt persona immediately."
-                )
 
-            result_message = {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": result,
-            }
-            messages.append(result_message)
-
-    # ==== 3. return last agent used and new messages =====
-    return Response(agent=current_agent, messages=messages[num_init_messages:])
-
-
-def execute_tool_call(tool_call, tools, agent_name):
-    name = tool_call.function.name
-    args = json.loads(tool_call.function.arguments)
-
-    print(f"{agent_name}:", f"{name}({args})")
-
-    return tools[name](**args)  # call corresponding function with provided arguments
-
-def function_to_schema(func) -> dict:
-    type_map = {
-        str: "string",
-        int: "integer",
-        float: "number",
-        bool: "boolean",
-        list: "array",
-        dict: "object",
-        type(None): "null",
-    }
-
-    try:
-        signature = inspect.signature(func)
-    except ValueError as e:
-        raise ValueError(
-            f"Failed to get signature for function {func.__name__}: {str(e)}"
-        )
-
-    parameters = {}
-    for param in signature.parameters.values():
+def execute_tool_call(tool_call, tool_table, agent_name):
+    with tracer.start_as_current_span(
+        f"execute_tool {tool_call.function.name}", attributes=tool_span_attributes(tool_call, agent_name)
+    ) as span:
         try:
-            param_type = type_map.get(param.annotation, "string")
-        except KeyError as e:
-            raise KeyError(
-                f"Unknown type annotation {param.annotation} for parameter {param.name}: {str(e)}"
-            )
-        parameters[param.name] = {"type": param_type}
-
-    required = [
-        param.name
-        for param in signature.parameters.values()
-        if param.default == inspect._empty
-    ]
-
-    return {
-        "type": "function",
-        "function": {
-            "name": func.__name__,
-            "description": (func.__doc__ or "").strip(),
-            "parameters": {
-                "type": "object",
-                "properties": parameters,
-                "required": required,
-            },
-        },
-    }
+            func, args = tool_table.decode_arguments(tool_call)
+        except ToolArgumentError as e:
+            # malformed calls never reach the tool; the model sees the error and can retry
+            print(f"{agent_name}:", f"rejected tool call: {e}")
+            span.set_status(StatusCode.ERROR, str(e))
+            return f"Error: {e}"
+
+        print(f"{agent_name}:", f"{tool_call.function.name}({args})")
+
+        result = func(**args)  # call corresponding function with provided arguments
+        if type(result) is Agent:
+            trace_handoff(agent_name, result.name)
+        return result
+
+
+def tool_span_attributes(tool_call, agent_name):
+    return {"gen_ai.tool.name": tool_call.function.name, "gen_ai.tool.call.id": tool_call.id, "gen_ai.agent.name": agent_name}
+
+
+def trace_handoff(from_agent, to_agent):
+    # an instant span, so handoffs show up in the trace tree under the tool that made them
+    with tracer.start_as_current_span("handoff", attributes={"handoff.from": from_agent, "handoff.to": to_agent}):
+        pass
 
 
 def escalate_to_human(summary):
@@ -135,17 +121,17 @@ def escalate_to_human(summary):
     exit()
 
 
-def transfer_to_sales_agent():
+def transfer_to_sales_agent() -> Agent:
     """User for anything sales or buying related."""
     return sales_agent
 
 
-def transfer_to_issues_and_repairs():
+def transfer_to_issues_and_repairs() -> Agent:
     """User for issues, repairs, or refunds."""
     return issues_and_repairs_agent
 
 
-def transfer_back_to_triage():
+def transfer_back_to_triage() -> Agent:
     """Call this if the user brings up a topic outside of your purview,
     including escalating to human."""
     return triage_agent
@@ -196,6 +182,7 @@ sales_agent = Agent(
 )
 
 
+@cached_tool(ttl=300)  # the catalogue lookup is idempotent; repeat searches skip it
 def look_up_item(search_query):
     """Use to find item ID.
     Search query can be a description or keywords."""
@@ -229,13 +216,14 @@ issues_and_repairs_agent = Agent(
     tools=[execute_refund, look_up_item, transfer_back_to_triage],
 )
 
-agent = triage_agent
-messages = []
+if __name__ == "__main__":
+    agent = triage_agent
+    messages = []
 
-while True:
-    user = input("User: ")
-    messages.append({"role": "user", "content": user})
+    while True:
+        user = input("User: ")
+        messages.append({"role": "user", "content": user})
 
-    response = run_full_turn(agent, messages)
-    agent = response.agent
-    messages.extend(response.messages)
\ No newline at end of file
+        response = run_full_turn(agent, messages)
+        agent = response.agent
+        messages.extend(response.messages)
@@ -0,0 +1,205 @@
+"""
+Compact, append-only conversation history for the Swarm loop.
+
+``MessageStore`` keeps every message as its JSON encoding (written once, on
+append) next to small typed arrays for roles and running token totals. A
+windowing policy decides which slice of the history goes into the next model
+request, and ``window_json()`` joins just those pre-encoded messages, so building
+a request costs O(window) no matter how long the session has been running.
+
+Usage:
+    history = MessageStore(policy=PinSystemMessages(TokenBudget(3000)))
+    history.append({"role": "user", "content": "Hi"})
+    response = await async_handoff.run_full_turn(agent, history)  # appends in place
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+import json
+
+ROLES = ("user", "assistant", "tool", "system", "developer")
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+TOOL = ROLE_CODES["tool"]
+SYSTEM = ROLE_CODES["system"]
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token); pass a tokenizer for exact budgets."""
+    return len(text) // 4 + 1
+
+
+def normalize_message(message):
+    """Turn an SDK message object or dict into a plain dict without null fields."""
+    if not isinstance(message, dict):
+        # ChatCompletionMessage objects from the non-streaming loop; dumped the way the SDK does it
+        message = message.model_dump(mode="json", exclude_unset=True)
+    return {key: value for key, value in message.items() if value is not None or key == "content"}
+
+
+class MessageStore(Sequence):
+    """Append-only message history with pluggable windowing.
+
+    Indexing decodes messages lazily; slices return lists of dicts. The store
+    never rewrites or copies earlier entries.
+    """
+
+    __slots__ = ("policy", "token_counter", "_encoded", "_roles", "_cumulative_tokens", "_system_indices")
+
+    def __init__(self, messages=(), policy=None, token_counter=estimate_tokens):
+        self.policy = policy or KeepAll()
+        self.token_counter = token_counter
+        self._encoded = []
+        self._roles = array("B")
+        self._cumulative_tokens = array("q", [0])  # tokens in messages[:i] at index i
+        self._system_indices = array("l")
+        self.extend(messages)
+
+    def append(self, message):
+        message = normalize_message(message)
+        encoded = json.dumps(message)
+        role = ROLE_CODES.get(message["role"], 0)
+        if role == SYSTEM:
+            self._system_indices.append(len(self._encoded))
+        self._encoded.append(encoded)
+        self._roles.append(role)
+        self._cumulative_tokens.append(self._cumulative_tokens[-1] + self.token_counter(encoded))
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def copy(self):
+        """A store with the same messages and policy; appending to it leaves this one alone."""
+        store = MessageStore(policy=self.policy, token_counter=self.token_counter)
+        store._encoded = self._encoded.copy()
+        store._roles = self._roles[:]
+        store._cumulative_tokens = self._cumulative_tokens[:]
+        store._system_indices = self._system_indices[:]
+        return store
+
+    def __len__(self):
+        return len(self._encoded)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [json.loads(encoded) for encoded in self._encoded[index]]
+        return json.loads(self._encoded[index])
+
+    def tokens(self, start=0, stop=None):
+        """Estimated tokens in ``messages[start:stop]``, in O(1)."""
+        stop = len(self) if stop is None else stop
+        return self._cumulative_tokens[stop] - self._cumulative_tokens[start]
+
+    def align(self, start):
+        """Move ``start`` forward past tool results whose assistant call would be cut off."""
+        while start < len(self._roles) and self._roles[start] == TOOL:
+            start += 1
+        return start
+
+    def start_for_budget(self, max_tokens, stop=None):
+        """Smallest aligned start index whose window up to ``stop`` fits in ``max_tokens``."""
+        stop = len(self) if stop is None else stop
+        floor = self._cumulative_tokens[stop] - max_tokens
+        return self.align(bisect_left(self._cumulative_tokens, floor, 0, stop))
+
+    def system_indices(self, stop=None):
+        """Indices of system messages before ``stop``."""
+        if stop is None:
+            return self._system_indices
+        return self._system_indices[:bisect_left(self._system_indices, stop)]
+
+    def window(self):
+        """The view of the history the policy selects for the next request."""
+        return MessageView(self, self.policy.ranges(self))
+
+    def window_json(self):
+        """Comma-joined JSON of the current window, ready to splice into a request body."""
+        return self.window().json()
+
+
+class MessageView(Sequence):
+    """A read-only view over one or more ``(start, stop)`` ranges of a ``MessageStore``."""
+
+    __slots__ = ("store", "ranges", "_length")
+
+    def __init__(self, store, ranges):
+        self.store = store
+        self.ranges = ranges
+        self._length = sum(stop - start for start, stop in ranges)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        for start, stop in self.ranges:
+            if index < stop - start:
+                return self.store[start + index]
+            index -= stop - start
+        raise IndexError("MessageView index out of range")
+
+    def tokens(self):
+        return sum(self.store.tokens(start, stop) for start, stop in self.ranges)
+
+    def json(self):
+        encoded = self.store._encoded
+        return ", ".join(", ".join(encoded[start:stop]) for start, stop in self.ranges if stop > start)
+
+
+# === windowing policies ===
+# A policy maps a store to the ranges of messages to send; ``reserved_tokens`` is
+# budget already spent by messages another policy has pinned.
+
+
+class KeepAll:
+    """Send the whole history (the original behaviour)."""
+
+    def ranges(self, store, reserved_tokens=0):
+        return [(0, len(store))]
+
+
+class LastN:
+    """Send the last ``n`` messages, never starting on an orphaned tool result."""
+
+    def __init__(self, n):
+        self.n = n
+
+    def ranges(self, store, reserved_tokens=0):
+        return [(store.align(max(0, len(store) - self.n)), len(store))]
+
+
+class TokenBudget:
+    """Send the longest suffix of the history that fits in ``max_tokens``."""
+
+    def __init__(self, max_tokens):
+        self.max_tokens = max_tokens
+
+    def ranges(self, store, reserved_tokens=0):
+        return [(store.start_for_budget(max(0, self.max_tokens - reserved_tokens)), len(store))]
+
+
+class PinSystemMessages:
+    """Keep every system message in the history, windowing the rest with ``inner``.
+
+    System messages older than the window are sent first, in order, and their
+    tokens are taken out of the inner policy's budget; those inside the window
+    are sent (and counted) there.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def ranges(self, store, reserved_tokens=0):
+        pinned = store.system_indices()
+        while True:
+            pinned_tokens = sum(store.tokens(i, i + 1) for i in pinned)
+            (start, stop), = self.inner.ranges(store, reserved_tokens + pinned_tokens)
+            before = store.system_indices(start)
+            if len(before) == len(pinned):
+                return [(i, i + 1) for i in before] + [(start, stop)]
+            # the ones inside the window were counted twice; reserve only those before it,
+            # which can only widen the window and leave fewer of them outside
+            pinned = before
@@ -0,0 +1,88 @@
+"""
+A ``MessageStore`` whose history lives on disk in ``common/conversation_log.py``.
+
+Windowing policies, ``window_json()`` and the async loop work exactly as with
+the in-memory store. Message bytes, roles and token totals are read from the
+session's log and memory-mapped index, and only the messages in the current
+window are loaded. Sessions survive restarts:
+
+    log = ConversationLog(".conversations")
+    history = PersistentMessageStore(log.session("customer-42"), policy=PinSystemMessages(TokenBudget(3000)))
+    history.append({"role": "user", "content": "Hi"})
+    response = await async_handoff.run_full_turn(agent, history)  # appends to disk in place
+"""
+from array import array
+from collections.abc import Sequence
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.conversation_log import ConversationLog, CumulativeTokens, open_log
+from history import ROLE_CODES, SYSTEM, MessageStore, estimate_tokens, normalize_message
+
+
+class _Records(Sequence):
+    """The session's records as JSON strings (what ``MessageStore._encoded`` holds in memory)."""
+
+    __slots__ = ("session",)
+
+    def __init__(self, session):
+        self.session = session
+
+    def __len__(self):
+        return len(self.session)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.session))
+            records = self.session.read_range(start, stop)[::step] if step > 0 else [
+                self.session.read(i) for i in range(start, stop, step)
+            ]
+            return [record.decode() for record in records]
+        if index < 0:
+            index += len(self.session)
+        return self.session.read(index).decode()
+
+
+class _Roles(Sequence):
+    __slots__ = ("session",)
+
+    def __init__(self, session):
+        self.session = session
+
+    def __len__(self):
+        return len(self.session)
+
+    def __getitem__(self, index):
+        return self.session.role(index)
+
+
+class PersistentMessageStore(MessageStore):
+    """``MessageStore`` over a ``SessionLog``; see the module docstring."""
+
+    __slots__ = ("session",)
+
+    def __init__(self, session, policy=None, token_counter=estimate_tokens):
+        super().__init__(policy=policy, token_counter=token_counter)
+        self.session = session
+        self._encoded = _Records(session)
+        self._roles = _Roles(session)
+        self._cumulative_tokens = CumulativeTokens(session)
+        # system messages are few; finding them once keeps PinSystemMessages O(pinned)
+        self._system_indices = array("l", (i for i in range(len(session)) if session.role(i) == SYSTEM))
+
+    @classmethod
+    def open(cls, root, session_id, **kwargs):
+        """Open (or create) ``session_id`` in a ``ConversationLog`` at ``root``."""
+        log = root if isinstance(root, ConversationLog) else open_log(root)
+        return cls(log.session(session_id), **kwargs)
+
+    def append(self, message):
+        message = normalize_message(message)
+        encoded = json.dumps(message)
+        role = ROLE_CODES.get(message["role"], 0)
+        index = self.session.append(encoded.encode(), role, self.token_counter(encoded))
+        if role == SYSTEM:
+            self._system_indices.append(index)
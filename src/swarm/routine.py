@@ -1,12 +1,16 @@
-from openai import OpenAI
 from pydantic import BaseModel
 from typing import Optional
 import json
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.backend import create_openai_client
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = create_openai_client()
 
 import inspect
 
@@ -105,11 +109,12 @@ def run_full_turn(system_message, tools, messages):
     num_init_messages = len(messages)
     messages = messages.copy()
 
-    while True:
+    # turn python functions into tools and save a reverse map; the tools are
+    # fixed for the whole turn, so build these once rather than per round-trip
+    tool_schemas = [function_to_schema(tool) for tool in tools]
+    tools_map = {tool.__name__: tool for tool in tools}
 
-        # turn python functions into tools and save a reverse map
-        tool_schemas = [function_to_schema(tool) for tool in tools]
-        tools_map = {tool.__name__: tool for tool in tools}
+    while True:
 
         # === 1. get openai completion ===
         response = client.chat.completions.create(
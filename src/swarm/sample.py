@@ -1,10 +1,15 @@
 from swarm import Swarm, Agent
 import os
+import sys
 from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.backend import create_openai_client
+
 load_dotenv()
-client = Swarm()
+client = Swarm(client=create_openai_client())
 
 
 def transfer_to_agent_b():
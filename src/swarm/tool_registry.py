@@ -0,0 +1,318 @@
+from enum import Enum
+from typing import Annotated, Any, Literal, Union
+import inspect
+import json
+import types
+import typing
+import weakref
+
+from pydantic import BaseModel, ValidationError
+
+
+class ToolArgumentError(ValueError):
+    """The model sent arguments that do not match the tool's signature."""
+
+
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+    type(None): "null",
+}
+
+
+def _check_type(expected, name):
+    json_type = _JSON_TYPES[expected]
+
+    def check(value, path):
+        # bool is an int subclass, so compare exact types; ints are fine as numbers
+        if type(value) is expected or (expected is float and type(value) is int):
+            return value
+        raise ToolArgumentError(f"{path}: expected {json_type}, got {type(value).__name__}")
+
+    return check
+
+
+def _check_any(value, path):
+    return value
+
+
+def _compile_annotation(annotation):
+    """Return ``(json_schema, decode)`` for a parameter annotation.
+
+    ``decode(value, path)`` validates an already JSON-decoded value and converts
+    it into what the tool expects (enum members, pydantic models, ...).
+    """
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        # unannotated parameters keep the historical "string" hint but accept any JSON value
+        return {"type": "string"}, _check_any
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is Annotated:
+        schema, decode = _compile_annotation(args[0])
+        description = next((meta for meta in args[1:] if isinstance(meta, str)), None)
+        if description:
+            schema = {**schema, "description": description}
+        return schema, decode
+
+    if origin is Union or origin is types.UnionType:
+        options = [arg for arg in args if arg is not type(None)]
+        nullable = len(options) < len(args)
+        compiled = [_compile_annotation(arg) for arg in options]
+        if len(compiled) == 1:
+            schema, inner = compiled[0]
+            if nullable and isinstance(schema.get("type"), str) and "enum" not in schema and "$ref" not in schema:
+                schema = {**schema, "type": [schema["type"], "null"]}
+            elif nullable:
+                schema = {"anyOf": [schema, {"type": "null"}]}
+        else:
+            schema = {"anyOf": [schema for schema, _ in compiled] + ([{"type": "null"}] if nullable else [])}
+            inner = None
+
+        def decode_union(value, path):
+            if value is None and nullable:
+                return None
+            if inner is not None:
+                return inner(value, path)
+            for _, decode in compiled:
+                try:
+                    return decode(value, path)
+                except (ToolArgumentError, ValueError):
+                    continue
+            raise ToolArgumentError(f"{path}: {value!r} matches none of the allowed types")
+
+        return schema, decode_union
+
+    if origin is Literal:
+        allowed = frozenset(args)
+        literal_types = {_JSON_TYPES.get(type(arg), "string") for arg in args}
+        schema = {"enum": list(args)}
+        if len(literal_types) == 1:
+            schema = {"type": literal_types.pop(), **schema}
+
+        allowed_types = frozenset(type(arg) for arg in args)
+
+        def decode_literal(value, path):
+            # the type check keeps True from matching a Literal[1]
+            if type(value) in allowed_types and value in allowed:
+                return value
+            raise ToolArgumentError(f"{path}: expected one of {list(args)}, got {value!r}")
+
+        return schema, decode_literal
+
+    if origin in (list, tuple, set, frozenset) or annotation in (tuple, set, frozenset):
+        container = origin or annotation
+        homogeneous = len(args) == 1 or (len(args) == 2 and args[1] is Ellipsis)
+        item_schema, decode_item = _compile_annotation(args[0]) if homogeneous else (None, _check_any)
+
+        def decode_list(value, path):
+            if type(value) is not list:
+                raise ToolArgumentError(f"{path}: expected array, got {type(value).__name__}")
+            items = [decode_item(item, f"{path}[{i}]") for i, item in enumerate(value)]
+            return items if container is list else container(items)
+
+        schema = {"type": "array", "items": item_schema} if homogeneous else {"type": "array"}
+        return schema, decode_list
+
+    if origin is dict and args:
+        value_schema, decode_value = _compile_annotation(args[1])
+
+        def decode_dict(value, path):
+            if type(value) is not dict:
+                raise ToolArgumentError(f"{path}: expected object, got {type(value).__name__}")
+            return {key: decode_value(item, f"{path}.{key}") for key, item in value.items()}
+
+        return {"type": "object", "additionalProperties": value_schema}, decode_dict
+
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        members = {member.value: member for member in annotation}
+        value_types = {_JSON_TYPES.get(type(value), "string") for value in members}
+        schema = {"enum": list(members)}
+        if len(value_types) == 1:
+            schema = {"type": value_types.pop(), **schema}
+
+        def decode_enum(value, path):
+            try:
+                return members[value]
+            except (KeyError, TypeError):
+                raise ToolArgumentError(f"{path}: expected one of {list(members)}, got {value!r}") from None
+
+        return schema, decode_enum
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        validate = annotation.model_validate
+
+        def decode_model(value, path):
+            try:
+                return validate(value)
+            except ValidationError as e:
+                raise ToolArgumentError(f"{path}: {e.errors()[0]['msg']} ({e.error_count()} errors)") from None
+
+        return annotation.model_json_schema(), decode_model
+
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}, _check_type(annotation, annotation.__name__)
+
+    # anything else (custom classes, forward references...) falls back to a free-form string
+    return {"type": "string"}, _check_any
+
+
+class CompiledTool:
+    """A tool function plus its JSON schema and argument decoder, built once.
+
+    ``decode(arguments)`` turns the model's raw JSON arguments string into the
+    keyword arguments for ``function`` and raises ``ToolArgumentError`` when the
+    call is malformed, so nothing runs with bad input. ``returns`` is the
+    function's return annotation (None if it has none).
+    """
+
+    __slots__ = ("function", "schema", "decode", "returns")
+
+    def __init__(self, func):
+        try:
+            signature = inspect.signature(func)
+        except ValueError as e:
+            raise ValueError(
+                f"Failed to get signature for function {func.__name__}: {str(e)}"
+            )
+        try:
+            hints = typing.get_type_hints(func, include_extras=True)
+        except (TypeError, NameError):
+            hints = {}  # unresolvable string annotations fall back to the raw signature
+
+        parameters, decoders, defs = {}, {}, {}
+        for param in signature.parameters.values():
+            schema, decode = _compile_annotation(hints.get(param.name, param.annotation))
+            parameters[param.name] = _hoist_defs(schema, defs)
+            decoders[param.name] = decode
+
+        required = [
+            param.name
+            for param in signature.parameters.values()
+            if param.default is inspect.Parameter.empty
+        ]
+
+        parameters_schema = {
+            "type": "object",
+            "properties": parameters,
+            "required": required,
+        }
+        if defs:
+            parameters_schema["$defs"] = defs
+
+        self.function = func
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": func.__name__,
+                "description": (func.__doc__ or "").strip(),
+                "parameters": parameters_schema,
+            },
+        }
+        self.decode = _build_decoder(func.__name__, decoders, frozenset(required))
+        self.returns = hints.get("return", signature.return_annotation)
+        if self.returns is inspect.Signature.empty:
+            self.returns = None
+
+
+def _hoist_defs(schema, defs):
+    """Move nested pydantic ``$defs`` into ``defs``; their refs point at the parameters root."""
+    if isinstance(schema, dict):
+        defs.update(schema.pop("$defs", {}))
+        for value in schema.values():
+            _hoist_defs(value, defs)
+    elif isinstance(schema, list):
+        for value in schema:
+            _hoist_defs(value, defs)
+    return schema
+
+
+def _build_decoder(name, decoders, required):
+    items = tuple(decoders.items())
+
+    def decode(arguments):
+        try:
+            args = json.loads(arguments or "{}")
+        except ValueError as e:
+            raise ToolArgumentError(f"{name}: arguments are not valid JSON ({e})") from None
+        if type(args) is not dict:
+            raise ToolArgumentError(f"{name}: arguments must be a JSON object")
+
+        kwargs = {}
+        try:
+            for param, decode_param in items:
+                if param in args:
+                    kwargs[param] = decode_param(args[param], param)
+        except ToolArgumentError as e:
+            raise ToolArgumentError(f"{name}: {e}") from None
+        if len(kwargs) != len(args):
+            unknown = sorted(set(args) - set(decoders))
+            raise ToolArgumentError(f"{name}: unexpected arguments {unknown}")
+        if not required <= kwargs.keys():
+            missing = sorted(required - kwargs.keys())
+            raise ToolArgumentError(f"{name}: missing required arguments {missing}")
+        return kwargs
+
+    return decode
+
+
+def function_to_schema(func) -> dict:
+    return compile_tool(func).schema
+
+
+# compilation is a pure function of the tool, so share it across every agent using it
+_compiled_cache = weakref.WeakKeyDictionary()
+
+
+def compile_tool(func) -> CompiledTool:
+    try:
+        return _compiled_cache[func]
+    except KeyError:
+        compiled = _compiled_cache[func] = CompiledTool(func)
+        return compiled
+
+
+class ToolTable:
+    """Everything ``run_full_turn`` needs about an agent's tools, computed once.
+
+    ``schemas`` is what goes into ``tools=``, ``functions`` is the name -> callable
+    dispatch map, ``decoders`` maps names to argument decoders and
+    ``schemas_json`` is the pre-serialized ``schemas`` for callers that build
+    the request body themselves. ``returns`` maps names to return annotations.
+    """
+
+    __slots__ = ("key", "schemas", "functions", "decoders", "schemas_json", "returns")
+
+    def __init__(self, tools):
+        compiled = [compile_tool(tool) for tool in tools]
+        self.key = tuple(tools)
+        self.schemas = [tool.schema for tool in compiled]
+        self.functions = {tool.function.__name__: tool.function for tool in compiled}
+        self.decoders = {tool.function.__name__: tool.decode for tool in compiled}
+        self.returns = {tool.function.__name__: tool.returns for tool in compiled}
+        self.schemas_json = json.dumps(self.schemas) if self.schemas else None
+
+    def decode_arguments(self, tool_call):
+        """Return ``(function, kwargs)`` for a model tool call or raise ``ToolArgumentError``."""
+        name = tool_call.function.name
+        if name not in self.functions:
+            raise ToolArgumentError(f"Unknown tool {name!r}")
+        return self.functions[name], self.decoders[name](tool_call.function.arguments)
+
+
+def get_tool_table(agent) -> ToolTable:
+    """Return the agent's compiled ``ToolTable``, rebuilding it only when ``tools`` changed.
+
+    The table lives on the agent's ``_tool_table`` private attribute. The check
+    compares the tool functions by identity, so reassigning ``agent.tools`` or
+    mutating the list in place both invalidate it.
+    """
+    table = agent._tool_table
+    if table is None or table.key != tuple(agent.tools):
+        table = agent._tool_table = ToolTable(agent.tools)
+    return table